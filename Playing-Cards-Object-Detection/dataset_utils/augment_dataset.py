@@ -0,0 +1,193 @@
+"""
+Multiplies the data in a YOLOv8 object detection dataset with imgaug transformations; the bounding boxes are
+transformed together with their images, so nothing has to be relabeled.
+
+Image/label pairs are streamed through a process pool in bounded chunks, and every worker writes its outputs itself,
+so at most a chunk of images is in memory and the run scales with the number of cores. Every augmented copy gets its
+own seed derived from --seed, the image name and the copy number: the output does not depend on the number of
+workers or on which worker handles an image, and an interrupted run can be resumed. Images are written before their
+label files and both are renamed into place atomically, so a copy whose label file exists is complete and is skipped
+by the next run.
+
+    python augment_dataset.py --dataset ../data/real_dataset --copies 10 --seed 0
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+from multiprocessing import Pool
+
+import cv2
+import imgaug.augmenters as iaa
+import numpy as np
+from imgaug.augmentables.bbs import BoundingBox, BoundingBoxesOnImage
+
+DATASET_DIR = '../data/real_dataset'
+SPLITS = ['train']
+COPIES = 10  # Number of augmentations per image
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+TEMPORARY_SUFFIX = '.aug.tmp'
+
+_sequence = None
+
+
+def build_sequence():
+    return iaa.Sequential([
+        iaa.Crop(percent=(0, 0.1)),  # Random crops
+        iaa.Affine(scale=(0.5, 1.5)),  # Scaling
+        iaa.Multiply((0.8, 1.2)),  # Change brightness
+        iaa.LinearContrast((0.75, 1.5)),  # Change contrast
+        iaa.Affine(rotate=(-15, 15))  # Rotation
+    ])
+
+
+def init_worker():
+    global _sequence
+    # One OpenCV thread per process, the pool already uses every core
+    cv2.setNumThreads(1)
+    _sequence = build_sequence()
+
+
+def copy_seed(seed, name, copy):
+    """Seed of one augmented copy, independent of the worker and of the order images are processed in."""
+    digest = hashlib.blake2b(f'{seed}/{name}/{copy}'.encode(), digest_size=4).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def output_paths(output_dir, split, name, copy):
+    base_name = os.path.splitext(name)[0]
+    return (os.path.join(output_dir, split, 'images', f'{base_name}_aug_{copy}.jpg'),
+            os.path.join(output_dir, split, 'labels', f'{base_name}_aug_{copy}.txt'))
+
+
+def list_pairs(dataset_dir, split):
+    """(image name, image path, label path or None) of every image of a split, sorted by name."""
+    images_dir = os.path.join(dataset_dir, split, 'images')
+    labels_dir = os.path.join(dataset_dir, split, 'labels')
+    if not os.path.isdir(images_dir):
+        return []
+    pairs = []
+    with os.scandir(images_dir) as entries:
+        for entry in entries:
+            base_name, extension = os.path.splitext(entry.name)
+            if extension.lower() in IMAGE_EXTENSIONS:
+                label_path = os.path.join(labels_dir, base_name + '.txt')
+                pairs.append((entry.name, entry.path, label_path if os.path.exists(label_path) else None))
+    return sorted(pairs)
+
+
+def read_yolo_labels(label_path):
+    """(N, 5) array of class, cx, cy, w, h rows."""
+    if label_path is None:
+        return np.zeros((0, 5), dtype=np.float32)
+    labels = np.loadtxt(label_path, dtype=np.float32, ndmin=2)
+    return labels.reshape(-1, 5) if labels.size else np.zeros((0, 5), dtype=np.float32)
+
+
+def save_yolo_labels(label_path, labels):
+    with open(label_path + TEMPORARY_SUFFIX, 'w') as file:
+        file.writelines(f'{cls} {cx:.6f} {cy:.6f} {bw:.6f} {bh:.6f}\n' for cls, cx, cy, bw, bh in labels)
+    os.replace(label_path + TEMPORARY_SUFFIX, label_path)
+
+
+def save_image(image_path, image):
+    # The temporary name keeps the extension, cv2 picks the encoder from it
+    temporary_path = image_path + TEMPORARY_SUFFIX + '.jpg'
+    if not cv2.imwrite(temporary_path, image):
+        raise OSError(f'Cannot write {image_path}')
+    os.replace(temporary_path, image_path)
+
+
+def augment_image_and_labels(sequence, image, labels):
+    h, w = image.shape[:2]
+    bbs = BoundingBoxesOnImage([
+        BoundingBox(
+            x1=(cx - 0.5 * bw) * w,
+            y1=(cy - 0.5 * bh) * h,
+            x2=(cx + 0.5 * bw) * w,
+            y2=(cy + 0.5 * bh) * h,
+            label=int(cls)
+        ) for cls, cx, cy, bw, bh in labels
+    ], shape=image.shape)
+
+    # Augment image and bounding boxes
+    image_aug, bbs_aug = sequence(image=image, bounding_boxes=bbs)
+    # Boxes rotated or scaled past the border are cut at the border, boxes entirely outside are removed
+    bbs_aug = bbs_aug.remove_out_of_image().clip_out_of_image()
+
+    # Convert bounding boxes back to YOLO format
+    h, w = image_aug.shape[:2]
+    labels_aug = []
+    for bb in bbs_aug.bounding_boxes:
+        cx = (bb.x1 + bb.x2) / 2 / w
+        cy = (bb.y1 + bb.y2) / 2 / h
+        bw = (bb.x2 - bb.x1) / w
+        bh = (bb.y2 - bb.y1) / h
+        labels_aug.append((bb.label, cx, cy, bw, bh))
+
+    return image_aug, labels_aug
+
+
+def augment_pair(arguments):
+    """Write the missing augmented copies of one image; returns the number written."""
+    name, image_path, label_path, output_dir, split, copies, seed = arguments
+    missing = [copy for copy in range(copies)
+               if not os.path.exists(output_paths(output_dir, split, name, copy)[1])]
+    if not missing:
+        return 0
+
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError(f'Cannot read {image_path}')
+    labels = read_yolo_labels(label_path)
+    for copy in missing:
+        _sequence.seed_(copy_seed(seed, name, copy))
+        image_aug, labels_aug = augment_image_and_labels(_sequence, image, labels)
+        aug_img_path, aug_label_path = output_paths(output_dir, split, name, copy)
+        # The label file is written last, it marks the copy as complete
+        save_image(aug_img_path, image_aug)
+        save_yolo_labels(aug_label_path, labels_aug)
+    return len(missing)
+
+
+def augment_split(dataset_dir, output_dir, split, copies, seed, workers=None, chunk_size=64):
+    """Augment one split; returns the number of images and the number of copies written."""
+    os.makedirs(os.path.join(output_dir, split, 'images'), exist_ok=True)
+    os.makedirs(os.path.join(output_dir, split, 'labels'), exist_ok=True)
+    pairs = list_pairs(dataset_dir, split)
+    tasks = [(name, image_path, label_path, output_dir, split, copies, seed)
+             for name, image_path, label_path in pairs]
+
+    # Bounded chunks keep only a few images per worker in flight
+    step = chunk_size * (workers or os.cpu_count() or 1)
+    written = 0
+    with Pool(workers, initializer=init_worker) as pool:
+        for start in range(0, len(tasks), step):
+            chunk = tasks[start : start + step]
+            written += sum(pool.imap_unordered(augment_pair, chunk, chunksize=4))
+            print(f'{split}: {min(start + len(chunk), len(tasks))}/{len(tasks)} images')
+    return len(pairs), written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Augment a YOLOv8 dataset with imgaug.')
+    parser.add_argument('--dataset', default=DATASET_DIR)
+    parser.add_argument('--output', help="Default: the dataset directory with '_augmented' appended.")
+    parser.add_argument('--splits', nargs='+', default=SPLITS)
+    parser.add_argument('--copies', type=int, default=COPIES, help='Augmented copies per image.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help='Processes, default: one per CPU.')
+    args = parser.parse_args()
+
+    output_dir = args.output or f'{args.dataset.rstrip("/")}_augmented'
+    os.makedirs(output_dir, exist_ok=True)
+    data_yaml_path = os.path.join(args.dataset, 'data.yaml')
+    if os.path.exists(data_yaml_path) and not os.path.exists(os.path.join(output_dir, 'data.yaml')):
+        shutil.copy2(data_yaml_path, output_dir)
+
+    for split in args.splits:
+        images, written = augment_split(args.dataset, output_dir, split, args.copies, args.seed, args.workers)
+        print(f'{split}: {images} images, {written} augmented copies written, '
+              f'{images * args.copies - written} already present')
+    print('Dataset augmented successfully.')
@@ -1,61 +1,239 @@
 """
 Combines two YOLOv8 datasets into a new one. Intended to merge small dataset to a percent of the larger.
 
-The script iterates over each train, test, validation directory with subdirectory labels and images.
-Takes each content of the first dataset, copies it into the new dataset.
-Then takes N times more data from the second dataset compared to the one in the first dataset per each subdirectory.
-And copies the taken data into the new location.
+The script iterates over each train, test, validation directory with subdirectories labels and images.
+Every image/label pair of the first (real) dataset is taken, and N times as many pairs are drawn at random from the
+second (synthetic) dataset per split; N is set per split with --mix. The draw is seeded, so the same arguments always
+select the same pairs, and an image always comes with its label file.
+
+Files are hardlinked into the new dataset (or reflinked on filesystems that support it), which takes no extra disk
+space; across filesystems they are copied with a thread pool. A manifest in the output directory records the source
+of every file, so a re-run only links or copies what changed and removes files that are no longer selected.
+
+    python combine_datasets.py --mix train=10 valid=10 test=0 --seed 0
 """
 
+import argparse
+import errno
+import json
 import os
+import random
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # NOTE: Change the directories to match the desired datasets
 MULTIPLIER = 10
 PARENT_DIR = '../data'
 
-dataset1_dir = f'{PARENT_DIR}/real_dataset'
-dataset2_dir = f'{PARENT_DIR}/synthetic_dataset'
-combined_dataset_dir = f'{PARENT_DIR}/combined' # NOTE: Change the output dir if needed
+DATASET1_DIR = f'{PARENT_DIR}/real_dataset'
+DATASET2_DIR = f'{PARENT_DIR}/synthetic_dataset'
+COMBINED_DATASET_DIR = f'{PARENT_DIR}/combined'  # NOTE: Change the output dir if needed
 
 # Subfolders for train, test, val
-folders = ['train', 'test', 'valid']
-subfolders = ['images', 'labels']
+FOLDERS = ['train', 'test', 'valid']
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+MANIFEST_NAME = 'manifest.json'
+METHODS = ['auto', 'hardlink', 'reflink', 'copy']
+
+
+def list_pairs(split_dir):
+    """Image/label pairs of one split as {stem: (image path, label path or None)}.
+
+    Images without a label file are kept as background images, labels without an image are skipped.
+    """
+    images_dir = os.path.join(split_dir, 'images')
+    labels_dir = os.path.join(split_dir, 'labels')
+    if not os.path.isdir(images_dir):
+        return {}
+    labels = set()
+    if os.path.isdir(labels_dir):
+        with os.scandir(labels_dir) as entries:
+            labels = {entry.name for entry in entries if entry.name.endswith('.txt')}
+
+    pairs = {}
+    with os.scandir(images_dir) as entries:
+        for entry in entries:
+            stem, extension = os.path.splitext(entry.name)
+            if extension.lower() not in IMAGE_EXTENSIONS:
+                continue
+            label_name = stem + '.txt'
+            label_path = os.path.join(labels_dir, label_name) if label_name in labels else None
+            pairs[stem] = (entry.path, label_path)
+    return pairs
+
+
+def sample_pairs(pairs, count, seed, split):
+    """Seeded random sample of count pairs; the split name is part of the seed so splits draw independently."""
+    stems = sorted(pairs)
+    if count >= len(stems):
+        return stems
+    return sorted(random.Random(f'{seed}-{split}').sample(stems, count))
+
+
+def plan_split(split, real_dir, synthetic_dir, multiplier, seed, indexes=None):
+    """Destination path (relative to the output) -> source path of every file of one split.
+
+    indexes are the DatasetIndex of both datasets (index_dataset.py), used instead of listing the directories.
+    """
+    if indexes is None:
+        real = list_pairs(os.path.join(real_dir, split))
+        synthetic = list_pairs(os.path.join(synthetic_dir, split))
+    else:
+        real, synthetic = (index.pairs(split) for index in indexes)
+    selected = sample_pairs(synthetic, int(round(len(real) * multiplier)), seed, split)
+
+    plan, counts = {}, {'real': len(real), 'synthetic': len(selected), 'synthetic_available': len(synthetic)}
+    for source, stems in ((real, sorted(real)), (synthetic, selected)):
+        for stem in stems:
+            for subfolder, path in zip(('images', 'labels'), source[stem]):
+                if path is None:
+                    continue
+                destination = os.path.join(split, subfolder, os.path.basename(path))
+                if destination in plan:
+                    raise SystemExit(f'{destination} exists in both datasets, rename one of the files')
+                plan[destination] = path
+    return plan, counts
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {'source': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def reflink(src, dest):
+    """Copy-on-write clone of src (Linux FICLONE: btrfs, XFS); raises OSError where unsupported."""
+    import fcntl
+
+    FICLONE = 0x40049409
+    with open(src, 'rb') as src_file, open(dest, 'wb') as dest_file:
+        try:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dest_file.close()
+            os.remove(dest)
+            raise
+
+
+def materialize(src, dest, method):
+    """Put src at dest with the first method that works; returns the method used."""
+    if os.path.lexists(dest):
+        os.remove(dest)
+    if method in ('auto', 'hardlink'):
+        try:
+            os.link(src, dest)
+            return 'hardlink'
+        except OSError as e:
+            # Other errors (e.g. a missing source) are real failures, not a reason to fall back
+            if method == 'hardlink' or e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+    if method in ('auto', 'reflink') and sys.platform.startswith('linux'):
+        try:
+            reflink(src, dest)
+            return 'reflink'
+        except OSError:
+            if method == 'reflink':
+                raise
+    shutil.copy2(src, dest)
+    return 'copy'
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        return json.load(file).get('files', {})
+
+
+def write_manifest(path, config, files):
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump({'config': config, 'files': files}, file, indent=1, sort_keys=True)
+    os.replace(temporary_path, path)
+
+
+def parse_mix(values):
+    mix = {}
+    for value in values or []:
+        split, _, multiplier = value.partition('=')
+        if split not in FOLDERS or not multiplier:
+            raise SystemExit(f'Invalid --mix {value!r}, expected <split>=<multiplier> with split one of {FOLDERS}')
+        mix[split] = float(multiplier)
+    return mix
+
 
-# Create combined dataset directories
-for folder in folders:
-    for subfolder in subfolders:
-        os.makedirs(os.path.join(combined_dataset_dir,
-                    folder, subfolder), exist_ok=True)
+def combine(
+    real_dir, synthetic_dir, output_dir, mix, seed=0, method='auto', workers=16, dry_run=False, use_index=False
+):
+    indexes = None
+    if use_index:
+        from index_dataset import update_index
 
-# Function to copy files from source to destination
+        indexes = [update_index(dataset_dir)[0] for dataset_dir in (real_dir, synthetic_dir)]
+    plan, split_counts = {}, {}
+    for split in FOLDERS:
+        split_plan, split_counts[split] = plan_split(split, real_dir, synthetic_dir, mix[split], seed, indexes)
+        plan.update(split_plan)
 
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+    files, pending = {}, []
+    for destination, source in plan.items():
+        signature = source_signature(source)
+        files[destination] = signature
+        if previous.get(destination) != signature or not os.path.exists(os.path.join(output_dir, destination)):
+            pending.append(destination)
+    stale = [destination for destination in previous if destination not in plan]
 
-def copy_files(src_dir, dest_dir, num_files):
-    files = os.listdir(src_dir)
-    files.sort()
-    selected_files = files[:num_files]
-    for file in selected_files:
-        src_path = os.path.join(src_dir, file)
-        dest_path = os.path.join(dest_dir, file)
-        shutil.copy(src_path, dest_path)
+    for split, counts in split_counts.items():
+        print(f'{split}: {counts["real"]} real + {counts["synthetic"]} of {counts["synthetic_available"]} synthetic '
+              f'pairs (x{mix[split]:g})')
+    print(f'{len(pending)} files to update, {len(plan) - len(pending)} unchanged, {len(stale)} to remove')
+    if dry_run:
+        return
 
+    for split in FOLDERS:
+        for subfolder in ('images', 'labels'):
+            os.makedirs(os.path.join(output_dir, split, subfolder), exist_ok=True)
+    for destination in stale:
+        path = os.path.join(output_dir, destination)
+        if os.path.lexists(path):
+            os.remove(path)
 
-# Combine datasets
-for folder in folders:
-    for subfolder in subfolders:
-        src1 = os.path.join(dataset1_dir, folder, subfolder)
-        src2 = os.path.join(dataset2_dir, folder, subfolder)
-        dest = os.path.join(combined_dataset_dir, folder, subfolder)
+    used = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        jobs = [
+            executor.submit(materialize, plan[destination], os.path.join(output_dir, destination), method)
+            for destination in pending
+        ]
+        for job in jobs:
+            used[job.result()] = used.get(job.result(), 0) + 1
 
-        # Number of files in the first dataset
-        num_files_in_src1 = len(os.listdir(os.path.join(src1)))
+    config = {'real': os.path.abspath(real_dir), 'synthetic': os.path.abspath(synthetic_dir), 'mix': mix, 'seed': seed}
+    write_manifest(manifest_path, config, files)
+    print(', '.join(f'{count} {name}' for name, count in sorted(used.items())) or 'Nothing to update')
 
-        # Copy all files from the first dataset
-        copy_files(src1, dest, num_files_in_src1)
 
-        # Copy scaled number of files from the second dataset
-        num_files_to_copy_from_src2 = num_files_in_src1 * MULTIPLIER
-        copy_files(src2, dest, num_files_to_copy_from_src2)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Merge a real and a synthetic YOLOv8 dataset.')
+    parser.add_argument('--real', default=DATASET1_DIR, help='Dataset taken completely.')
+    parser.add_argument('--synthetic', default=DATASET2_DIR, help='Dataset sampled per split.')
+    parser.add_argument('--output', default=COMBINED_DATASET_DIR)
+    parser.add_argument('--multiplier', type=float, default=MULTIPLIER,
+                        help='Synthetic pairs per real pair for the splits not given in --mix.')
+    parser.add_argument('--mix', nargs='*', metavar='SPLIT=MULTIPLIER', help='Per-split multiplier, e.g. test=0.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--method', choices=METHODS, default='auto',
+                        help='auto tries a hardlink, then a reflink, then copies.')
+    parser.add_argument('--workers', type=int, default=16, help='Threads linking/copying files.')
+    parser.add_argument('--dry-run', action='store_true', help='Only print what would change.')
+    parser.add_argument('--use-index', action='store_true', help='List the datasets from their index_dataset.py cache.')
+    args = parser.parse_args()
 
-print("Datasets combined successfully.")
+    mix = {split: args.multiplier for split in FOLDERS}
+    mix.update(parse_mix(args.mix))
+    combine(
+        args.real, args.synthetic, args.output, mix, args.seed, args.method, args.workers, args.dry_run, args.use_index
+    )
+    if not args.dry_run:
+        print('Datasets combined successfully.')
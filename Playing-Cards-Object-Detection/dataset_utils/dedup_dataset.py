@@ -0,0 +1,206 @@
+"""
+Finds near-duplicate images across the splits of one or more YOLOv8 datasets with perceptual hashes.
+
+Every image gets a 64-bit difference hash (dHash), computed by a process pool from a reduced-resolution decode.
+Images within --radius differing bits are duplicates, found with multi-index hashing: the hash is cut into four
+16-bit chunks, and two hashes within radius r agree on at least one chunk up to r // 4 bits. Each chunk is
+looked up in a sorted table for all its variants within that many bits, so only candidates sharing a chunk are
+compared instead of all pairs. Duplicates are joined into clusters with union-find.
+
+Clusters with images in more than one split leak between train/valid/test. They are reported, and
+--assignment writes a split assignment that moves every cluster into one split (the split most of it is in).
+
+    python dedup_dataset.py --datasets ../data/real_dataset ../data/synthetic_dataset --radius 6 \\
+        --report dedup_report.json --assignment dedup_assignment.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+SPLITS = ['train', 'valid', 'test']
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def list_images(dataset_dirs):
+    """(dataset, split, image path) of every image, sorted."""
+    images = []
+    for dataset_dir in dataset_dirs:
+        for split in SPLITS:
+            images_dir = os.path.join(dataset_dir, split, 'images')
+            if not os.path.isdir(images_dir):
+                continue
+            with os.scandir(images_dir) as entries:
+                images.extend(
+                    (dataset_dir, split, entry.path) for entry in entries
+                    if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+                )
+    return sorted(images)
+
+
+def dhash(path):
+    """64-bit difference hash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its right neighbour."""
+    # A 1/4 resolution decode is much faster for large JPEGs and gives the same 9x8 thumbnail
+    image = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        return None
+    thumbnail = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming(a, b):
+    return POPCOUNT[(a ^ b).view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def chunk_flips(bits):
+    """All masks of up to bits set bits within one chunk."""
+    flips = [0]
+    for count in range(1, bits + 1):
+        for combination in itertools.combinations(range(CHUNK_BITS), count):
+            flips.append(sum(1 << bit for bit in combination))
+    return np.array(flips, dtype=np.uint64)
+
+
+def near_pairs(hashes, radius):
+    """Index pairs (i < j) of distinct hashes within radius bits, by multi-index hashing."""
+    flips = chunk_flips(radius // CHUNKS)
+    found = []
+    for chunk in range(CHUNKS):
+        keys = (hashes >> np.uint64(chunk * CHUNK_BITS)) & np.uint64((1 << CHUNK_BITS) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        for flip in flips:
+            # Every hash whose chunk equals this variant of the query chunk is a candidate
+            lo = np.searchsorted(sorted_keys, keys ^ flip, side='left')
+            hi = np.searchsorted(sorted_keys, keys ^ flip, side='right')
+            counts = hi - lo
+            if not counts.any():
+                continue
+            queries = np.repeat(np.arange(len(hashes)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            candidates = order[np.repeat(lo, counts) + offsets]
+            keep = queries < candidates
+            queries, candidates = queries[keep], candidates[keep]
+            close = hamming(hashes[queries], hashes[candidates]) <= radius
+            found.append(np.stack([queries[close], candidates[close]], axis=1))
+    if not found:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(found), axis=0)
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def find_clusters(hashes, radius):
+    """Clusters (lists of image indices, at least two) of images within radius of another member."""
+    # Identical hashes are grouped first, so the search only runs over distinct hashes
+    unique, inverse = np.unique(hashes, return_inverse=True)
+    union_find = UnionFind(len(unique))
+    for a, b in near_pairs(unique, radius).tolist():
+        union_find.union(a, b)
+
+    members = {}
+    for image, hash_index in enumerate(inverse.ravel().tolist()):
+        members.setdefault(union_find.find(hash_index), []).append(image)
+    return [cluster for cluster in members.values() if len(cluster) > 1]
+
+
+def assign_splits(clusters, images):
+    """Move every cluster into the split most of its images are in (ties: train, valid, test)."""
+    moves = []
+    for cluster in clusters:
+        splits = Counter(images[i][1] for i in cluster)
+        if len(splits) < 2:
+            continue
+        target = max(SPLITS, key=lambda split: (splits[split], -SPLITS.index(split)))
+        for i in cluster:
+            dataset_dir, split, path = images[i]
+            if split != target:
+                stem = os.path.splitext(os.path.basename(path))[0]
+                label_path = os.path.join(dataset_dir, split, 'labels', stem + '.txt')
+                moves.append({
+                    'image': path,
+                    'label': label_path if os.path.exists(label_path) else None,
+                    'from': split,
+                    'to': target,
+                })
+    return moves
+
+
+def report_clusters(clusters, images, hashes):
+    leaking = [cluster for cluster in clusters if len({images[i][1] for i in cluster}) > 1]
+    split_pairs = Counter()
+    for cluster in leaking:
+        for a, b in itertools.combinations(sorted({images[i][1] for i in cluster}, key=SPLITS.index), 2):
+            split_pairs[f'{a}/{b}'] += 1
+    print(f'{len(images)} images, {len(clusters)} duplicate clusters with '
+          f'{sum(len(cluster) for cluster in clusters)} images, {len(leaking)} spanning more than one split')
+    for pair, count in split_pairs.most_common():
+        print(f'  {pair}: {count} clusters')
+    return {
+        'images': len(images),
+        'clusters': [
+            {
+                'splits': sorted({images[i][1] for i in cluster}, key=SPLITS.index),
+                'images': [{'path': images[i][2], 'split': images[i][1], 'dhash': f'{int(hashes[i]):016x}'}
+                           for i in cluster],
+            }
+            for cluster in sorted(clusters, key=len, reverse=True)
+        ],
+        'leaking_clusters': len(leaking),
+        'split_pairs': dict(split_pairs),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find near-duplicate images across dataset splits.')
+    parser.add_argument('--datasets', nargs='+', default=['../data/real_dataset', '../data/synthetic_dataset'])
+    parser.add_argument('--radius', type=int, default=6, help='Largest Hamming distance of 64-bit dHashes.')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--report', help='Write all clusters to this JSON file.')
+    parser.add_argument('--assignment', help='Write the moves that put every cluster into one split to this file.')
+    args = parser.parse_args()
+
+    images = list_images(args.datasets)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        computed = list(executor.map(dhash, [path for _, _, path in images], chunksize=256))
+    unreadable = [images[i][2] for i, value in enumerate(computed) if value is None]
+    if unreadable:
+        print(f'Skipping {len(unreadable)} unreadable images, e.g. {unreadable[0]}')
+    images = [image for image, value in zip(images, computed) if value is not None]
+    hashes = np.array([value for value in computed if value is not None], dtype=np.uint64)
+
+    clusters = find_clusters(hashes, args.radius)
+    report = report_clusters(clusters, images, hashes)
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(report, file, indent=1)
+    if args.assignment:
+        moves = assign_splits(clusters, images)
+        with open(args.assignment, 'w') as file:
+            json.dump({'radius': args.radius, 'moves': moves}, file, indent=1)
+        print(f'{len(moves)} images to move, written to {args.assignment}')
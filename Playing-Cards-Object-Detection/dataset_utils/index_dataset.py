@@ -0,0 +1,319 @@
+"""
+Indexes a YOLOv8 dataset into a columnar cache file and prints statistics about it.
+
+The index has one row per image (split, name, image size, file mtimes and its range of boxes), one row per box
+(image row, class, x, y, w, h) and one row per label file without an image. It is stored as a NumPy .npz file in a
+local cache directory, so it can live off the network storage of the dataset. Re-indexing only stats the files and
+reads the images and labels whose mtime changed, with a process pool; all statistics are computed from the arrays.
+
+    python index_dataset.py --dataset ../data/synthetic_dataset --stats
+    python index_dataset.py --dataset ../data/combined --stats --classes mappings/hearts_only.json --split train
+
+The merge and relabel tools can take their file lists from the index with --use-index instead of walking the tree.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+SPLITS = ['train', 'valid', 'test']
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'luckboxer', 'dataset_index')
+CACHE_VERSION = 1
+# Box sizes as the square root of the box area relative to the image, like the COCO small/medium/large split
+SIZE_BINS = [0.0, 0.02, 0.05, 0.1, 0.2, 0.4, 1.01]
+
+IMAGE_COLUMNS = ['split', 'name', 'image_mtime', 'label_mtime', 'width', 'height', 'box_start', 'box_count']
+BOX_COLUMNS = ['image', 'cls', 'xywh']
+ORPHAN_COLUMNS = ['split', 'name', 'mtime']
+
+
+def default_cache_path(dataset_dir):
+    key = hashlib.sha1(os.path.abspath(dataset_dir).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f'{os.path.basename(os.path.abspath(dataset_dir))}-{key}.npz')
+
+
+def image_size(path):
+    """(width, height) from the PNG/JPEG/BMP header without decoding the image; (0, 0) if unknown."""
+    with open(path, 'rb') as file:
+        head = file.read(26)
+        if head[:8] == b'\x89PNG\r\n\x1a\n':
+            return struct.unpack('>II', head[16:24])
+        if head[:2] == b'BM':
+            width, height = struct.unpack('<ii', head[18:26])
+            return width, abs(height)
+        if head[:2] != b'\xff\xd8':
+            return 0, 0
+        file.seek(2)
+        while True:
+            marker = file.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return 0, 0
+            if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                continue
+            (length,) = struct.unpack('>H', file.read(2))
+            # SOF markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) are not frames
+            if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>xHH', file.read(5))
+                return width, height
+            file.seek(length - 2, os.SEEK_CUR)
+
+
+def read_boxes(label_path):
+    """(N, 5) float32 class, x, y, w, h; polygon labels keep their first four coordinates."""
+    with open(label_path, 'rb') as file:
+        rows = [line.split()[:5] for line in file.read().splitlines() if line.strip()]
+    rows = [row for row in rows if len(row) == 5]
+    return np.array(rows, dtype=np.float32).reshape(-1, 5)
+
+
+def index_sample(arguments):
+    image_path, label_path = arguments
+    width, height = image_size(image_path)
+    boxes = read_boxes(label_path) if label_path else np.zeros((0, 5), dtype=np.float32)
+    return width, height, boxes
+
+
+def scan_split(dataset_dir, split):
+    """Stat pass over one split: {stem: (image name, mtime)} and {stem: label mtime}."""
+    images, labels = {}, {}
+    for subfolder, target in (('images', images), ('labels', labels)):
+        directory = os.path.join(dataset_dir, split, subfolder)
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                stem, extension = os.path.splitext(entry.name)
+                if subfolder == 'images' and extension.lower() in IMAGE_EXTENSIONS:
+                    target[stem] = (entry.name, entry.stat().st_mtime_ns)
+                elif subfolder == 'labels' and extension == '.txt':
+                    target[stem] = entry.stat().st_mtime_ns
+    return images, labels
+
+
+class DatasetIndex:
+    """Columnar index of a dataset: images, boxes and orphaned labels as dicts of NumPy arrays."""
+
+    def __init__(self, dataset_dir, images, boxes, orphans):
+        self.dataset_dir = dataset_dir
+        self.images = images
+        self.boxes = boxes
+        self.orphans = orphans
+
+    @classmethod
+    def empty(cls, dataset_dir):
+        images = {
+            'split': np.zeros(0, dtype=np.uint8), 'name': np.zeros(0, dtype='U1'),
+            'image_mtime': np.zeros(0, dtype=np.int64), 'label_mtime': np.zeros(0, dtype=np.int64),
+            'width': np.zeros(0, dtype=np.int32), 'height': np.zeros(0, dtype=np.int32),
+            'box_start': np.zeros(0, dtype=np.int64), 'box_count': np.zeros(0, dtype=np.int32),
+        }
+        boxes = {
+            'image': np.zeros(0, dtype=np.int32), 'cls': np.zeros(0, dtype=np.int16),
+            'xywh': np.zeros((0, 4), dtype=np.float32),
+        }
+        orphans = {'split': np.zeros(0, dtype=np.uint8), 'name': np.zeros(0, dtype='U1'),
+                   'mtime': np.zeros(0, dtype=np.int64)}
+        return cls(dataset_dir, images, boxes, orphans)
+
+    @classmethod
+    def load(cls, path, dataset_dir):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != CACHE_VERSION:
+                return cls.empty(dataset_dir)
+            images = {column: data[f'images_{column}'] for column in IMAGE_COLUMNS}
+            boxes = {column: data[f'boxes_{column}'] for column in BOX_COLUMNS}
+            orphans = {column: data[f'orphans_{column}'] for column in ORPHAN_COLUMNS}
+        return cls(dataset_dir, images, boxes, orphans)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {'version': np.array(CACHE_VERSION)}
+        for prefix, table in (('images', self.images), ('boxes', self.boxes), ('orphans', self.orphans)):
+            arrays.update({f'{prefix}_{column}': values for column, values in table.items()})
+        temporary_path = path + '.tmp.npz'
+        np.savez(temporary_path, **arrays)
+        os.replace(temporary_path, path)
+
+    def __len__(self):
+        return len(self.images['name'])
+
+    def image_rows(self, split=None):
+        if split is None:
+            return np.arange(len(self))
+        return np.flatnonzero(self.images['split'] == SPLITS.index(split))
+
+    def box_rows(self, split=None):
+        if split is None:
+            return np.arange(len(self.boxes['cls']))
+        return np.flatnonzero(self.images['split'][self.boxes['image']] == SPLITS.index(split))
+
+    def class_counts(self, split=None, minlength=0):
+        return np.bincount(self.boxes['cls'][self.box_rows(split)].astype(np.int64), minlength=minlength)
+
+    def pairs(self, split):
+        """{stem: (image path, label path or None)} of a split, like combine_datasets.list_pairs."""
+        pairs = {}
+        for row in self.image_rows(split):
+            name = str(self.images['name'][row])
+            stem = os.path.splitext(name)[0]
+            label_path = None
+            if self.images['label_mtime'][row] >= 0:
+                label_path = os.path.join(self.dataset_dir, split, 'labels', stem + '.txt')
+            pairs[stem] = (os.path.join(self.dataset_dir, split, 'images', name), label_path)
+        return pairs
+
+    def label_files(self, classes=None):
+        """Label files (relative to the dataset) of images with labels, or only of those with a box of classes."""
+        rows = np.flatnonzero(self.images['label_mtime'] >= 0)
+        if classes is not None:
+            selected = np.isin(self.boxes['cls'], np.asarray(list(classes), dtype=np.int16))
+            rows = np.intersect1d(rows, np.unique(self.boxes['image'][selected]))
+        return sorted(
+            os.path.join(SPLITS[self.images['split'][row]], 'labels',
+                         os.path.splitext(str(self.images['name'][row]))[0] + '.txt')
+            for row in rows
+        )
+
+
+def update_index(dataset_dir, cache_path=None, workers=None):
+    """Bring the cached index of a dataset up to date; returns it and the number of re-read images."""
+    cache_path = cache_path or default_cache_path(dataset_dir)
+    if os.path.exists(cache_path):
+        index = DatasetIndex.load(cache_path, dataset_dir)
+    else:
+        index = DatasetIndex.empty(dataset_dir)
+    keys = zip(index.images['split'].tolist(), index.images['name'].tolist())
+    previous = {key: row for row, key in enumerate(keys)}
+
+    rows, to_read, orphans = [], [], []
+    for split_index, split in enumerate(SPLITS):
+        images, labels = scan_split(dataset_dir, split)
+        for stem, mtime in sorted(labels.items()):
+            if stem not in images:
+                orphans.append((split_index, stem + '.txt', mtime))
+        for stem, (name, image_mtime) in sorted(images.items()):
+            label_mtime = labels.get(stem, -1)
+            row = previous.get((split_index, name))
+            if (row is not None and index.images['image_mtime'][row] == image_mtime
+                    and index.images['label_mtime'][row] == label_mtime):
+                rows.append((split_index, name, image_mtime, label_mtime, row))
+            else:
+                rows.append((split_index, name, image_mtime, label_mtime, None))
+                label_path = os.path.join(dataset_dir, split, 'labels', stem + '.txt') if label_mtime >= 0 else None
+                to_read.append((os.path.join(dataset_dir, split, 'images', name), label_path))
+
+    read = []
+    if to_read:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            read = list(executor.map(index_sample, to_read, chunksize=256))
+
+    columns = {column: [] for column in IMAGE_COLUMNS}
+    box_images, box_arrays = [], []
+    box_start, read_iter = 0, iter(read)
+    for new_row, (split_index, name, image_mtime, label_mtime, old_row) in enumerate(rows):
+        if old_row is None:
+            width, height, boxes = next(read_iter)
+        else:
+            width, height = index.images['width'][old_row], index.images['height'][old_row]
+            start = index.images['box_start'][old_row]
+            old = slice(start, start + index.images['box_count'][old_row])
+            boxes = np.column_stack([index.boxes['cls'][old].astype(np.float32), index.boxes['xywh'][old]])
+        for column, value in zip(IMAGE_COLUMNS, (split_index, name, image_mtime, label_mtime, width, height,
+                                                 box_start, len(boxes))):
+            columns[column].append(value)
+        box_images.append(np.full(len(boxes), new_row, dtype=np.int32))
+        box_arrays.append(boxes)
+        box_start += len(boxes)
+
+    images = {
+        'split': np.array(columns['split'], dtype=np.uint8), 'name': np.array(columns['name'], dtype=str),
+        'image_mtime': np.array(columns['image_mtime'], dtype=np.int64),
+        'label_mtime': np.array(columns['label_mtime'], dtype=np.int64),
+        'width': np.array(columns['width'], dtype=np.int32), 'height': np.array(columns['height'], dtype=np.int32),
+        'box_start': np.array(columns['box_start'], dtype=np.int64),
+        'box_count': np.array(columns['box_count'], dtype=np.int32),
+    }
+    all_boxes = np.concatenate(box_arrays) if box_arrays else np.zeros((0, 5), dtype=np.float32)
+    boxes = {
+        'image': np.concatenate(box_images) if box_images else np.zeros(0, dtype=np.int32),
+        'cls': all_boxes[:, 0].astype(np.int16),
+        'xywh': np.ascontiguousarray(all_boxes[:, 1:], dtype=np.float32),
+    }
+    orphan_columns = list(zip(*orphans)) or [(), (), ()]
+    orphan_table = {
+        'split': np.array(orphan_columns[0], dtype=np.uint8), 'name': np.array(orphan_columns[1], dtype=str),
+        'mtime': np.array(orphan_columns[2], dtype=np.int64),
+    }
+    index = DatasetIndex(dataset_dir, images, boxes, orphan_table)
+    index.save(cache_path)
+    return index, len(to_read)
+
+
+def print_stats(index, split=None, class_names=None):
+    rows = index.image_rows(split)
+    box_rows = index.box_rows(split)
+    has_label = index.images['label_mtime'][rows] >= 0
+    empty = index.images['box_count'][rows] == 0
+    orphans = index.orphans['split'] == SPLITS.index(split) if split else np.ones(len(index.orphans['name']), bool)
+    print(f'{len(rows)} images, {len(box_rows)} boxes, {int((~has_label).sum())} images without a label file, '
+          f'{int((has_label & empty).sum())} with an empty label file, {int(orphans.sum())} labels without an image')
+
+    width, height = index.images['width'][rows], index.images['height'][rows]
+    if len(rows):
+        sizes, counts = np.unique(np.stack([width, height], axis=1), axis=0, return_counts=True)
+        common = np.argsort(-counts)[:3]
+        print('Image sizes: ' + ', '.join(f'{w}x{h} ({c})' for (w, h), c in zip(sizes[common], counts[common])))
+
+    counts = index.class_counts(split, minlength=len(class_names or []))
+    print(f'{"class":>6} {"boxes":>8} {"share":>7}')
+    for cls in np.argsort(-counts):
+        if counts[cls] == 0:
+            continue
+        name = class_names[cls] if class_names and cls < len(class_names) else str(cls)
+        print(f'{name:>6} {counts[cls]:>8} {counts[cls] / max(1, counts.sum()):>7.2%}')
+    if class_names:
+        missing = [name for cls, name in enumerate(class_names) if cls >= len(counts) or counts[cls] == 0]
+        if missing:
+            print(f'Classes without boxes: {missing}')
+
+    if len(box_rows):
+        xywh = index.boxes['xywh'][box_rows]
+        relative_size = np.sqrt(np.clip(xywh[:, 2] * xywh[:, 3], 0, None))
+        histogram, _ = np.histogram(relative_size, bins=SIZE_BINS)
+        print('Box size (sqrt of the relative area): ' + ', '.join(
+            f'{low:.0%}-{high:.0%}: {count}' for low, high, count in zip(SIZE_BINS, SIZE_BINS[1:], histogram)
+        ))
+        box_width = xywh[:, 2] * index.images['width'][index.boxes['image'][box_rows]]
+        box_height = xywh[:, 3] * index.images['height'][index.boxes['image'][box_rows]]
+        for label, values in (('width', box_width), ('height', box_height)):
+            p5, p50, p95 = np.percentile(values, [5, 50, 95])
+            print(f'Box {label} in pixels: p5 {p5:.0f}, median {p50:.0f}, p95 {p95:.0f}')
+
+
+def load_class_names(mapping_path):
+    """Class names from a relabel mapping file (the old classes, as in the dataset) or a plain JSON list."""
+    with open(mapping_path, 'r') as file:
+        names = json.load(file)
+    return names['old_class_names'] if isinstance(names, dict) else names
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Index a YOLOv8 dataset and print statistics.')
+    parser.add_argument('--dataset', default='../data/synthetic_dataset')
+    parser.add_argument('--cache', help=f'Index file, default: one per dataset in {CACHE_DIR}')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--stats', action='store_true')
+    parser.add_argument('--split', choices=SPLITS, help='Statistics of one split only.')
+    parser.add_argument('--classes', help='Class names: a relabel mapping file or a JSON list.')
+    args = parser.parse_args()
+
+    index, read = update_index(args.dataset, args.cache, args.workers)
+    print(f'Indexed {len(index)} images, {read} read again')
+    if args.stats:
+        print_stats(index, args.split, load_class_names(args.classes) if args.classes else None)
@@ -0,0 +1,325 @@
+"""
+Packs a YOLOv8 dataset into a few large shard files and reads them back through a memory map.
+
+Thousands of small image and label files are slow to open and stat on network storage. A shard holds many samples
+in one file:
+    header    magic, version, flags, sample count and the offsets of the sections below
+    images    the encoded image files as they are (JPEG/PNG), or with --resize decoded and resized raw uint8 HWC
+              pixels, every image starting on a 64-byte boundary
+    index     one row per sample: image offset and size, height and width (raw images only),
+              first label row and label count
+    labels    all boxes of the shard as one contiguous float32 (N, 5) array: class, x, y, w, h (YOLO format)
+    metadata  JSON with the sample names, the image format and the data.yaml of the dataset
+
+The reader maps the whole file, so images and labels are zero-copy slices of the map and only the pages that are
+used are read.
+
+    python pack_dataset.py --dataset ../data/real_dataset --output ../data/packed/real_dataset
+    python pack_dataset.py --dataset ../data/synthetic_dataset --output ../data/packed/synthetic_640 --resize 640
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import struct
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+SPLITS = ['train', 'valid', 'test']
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+SHARD_SUFFIX = '.lbpack'
+
+MAGIC = b'LBPK'
+VERSION = 1
+FLAG_RAW = 1
+ALIGNMENT = 64
+# magic, version, flags, count, index offset, labels offset, label rows, metadata offset, metadata size
+HEADER = struct.Struct('<4sIIIQQQQQ')
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'), ('size', '<u8'), ('height', '<u4'), ('width', '<u4'),
+    ('label_start', '<u4'), ('label_count', '<u4'),
+])
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def list_samples(split_dir):
+    """(name, image path, label path or None) of every image of a split, sorted by name."""
+    images_dir = os.path.join(split_dir, 'images')
+    labels_dir = os.path.join(split_dir, 'labels')
+    if not os.path.isdir(images_dir):
+        return []
+    samples = []
+    with os.scandir(images_dir) as entries:
+        for entry in entries:
+            stem, extension = os.path.splitext(entry.name)
+            if extension.lower() in IMAGE_EXTENSIONS:
+                label_path = os.path.join(labels_dir, stem + '.txt')
+                samples.append((entry.name, entry.path, label_path if os.path.exists(label_path) else None))
+    return sorted(samples)
+
+
+def read_labels(label_path):
+    if label_path is None:
+        return np.zeros((0, 5), dtype=np.float32)
+    labels = np.loadtxt(label_path, dtype=np.float32, ndmin=2)
+    return labels.reshape(-1, 5) if labels.size else np.zeros((0, 5), dtype=np.float32)
+
+
+def load_sample(arguments):
+    """Image bytes, height, width and labels of one sample; with resize the image is decoded and resized."""
+    image_path, label_path, resize = arguments
+    labels = read_labels(label_path)
+    if resize is None:
+        with open(image_path, 'rb') as file:
+            return file.read(), 0, 0, labels
+
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError(f'Cannot read {image_path}')
+    scale = resize / max(image.shape[:2])
+    if scale < 1:
+        # YOLO labels are normalized, so they stay valid for the resized image
+        image = cv2.resize(image, (round(image.shape[1] * scale), round(image.shape[0] * scale)),
+                           interpolation=cv2.INTER_AREA)
+    return np.ascontiguousarray(image).tobytes(), image.shape[0], image.shape[1], labels
+
+
+class ShardWriter:
+    """Streams samples into one shard file; the shard appears under its name only once it is closed."""
+
+    def __init__(self, path, raw, metadata):
+        self.path = path
+        self.raw = raw
+        self.metadata = metadata
+        self.names, self.rows, self.label_arrays = [], [], []
+        self.label_rows = 0
+        self.offset = _aligned(HEADER.size)
+        self.file = open(path + '.tmp', 'wb')
+        self.file.write(bytes(self.offset))
+
+    def add(self, name, data, height, width, labels):
+        self.file.seek(self.offset)
+        self.file.write(data)
+        self.names.append(name)
+        self.rows.append((self.offset, len(data), height, width, self.label_rows, len(labels)))
+        self.label_rows += len(labels)
+        self.label_arrays.append(labels)
+        self.offset = _aligned(self.offset + len(data))
+
+    def close(self):
+        index = np.array(self.rows, dtype=INDEX_DTYPE)
+        labels = np.concatenate(self.label_arrays).astype('<f4')
+        metadata = json.dumps(dict(self.metadata, names=self.names)).encode()
+
+        index_offset = self.offset
+        labels_offset = _aligned(index_offset + index.nbytes)
+        metadata_offset = labels_offset + labels.nbytes
+        self.file.seek(index_offset)
+        self.file.write(index.tobytes())
+        self.file.seek(labels_offset)
+        self.file.write(labels.tobytes())
+        self.file.write(metadata)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, FLAG_RAW if self.raw else 0, len(index), index_offset,
+                                    labels_offset, self.label_rows, metadata_offset, len(metadata)))
+        self.file.close()
+        os.replace(self.path + '.tmp', self.path)
+
+
+def pack_split(dataset_dir, output_dir, split, shard_size_mb, resize, workers, data_yaml):
+    """Pack one split into shards of about shard_size_mb each; returns the number of shards."""
+    samples = list_samples(os.path.join(dataset_dir, split))
+    # Shards of an earlier packing would otherwise be read as part of this one
+    for name in os.listdir(output_dir):
+        if name.startswith(f'{split}-') and name.endswith(SHARD_SUFFIX):
+            os.remove(os.path.join(output_dir, name))
+    metadata = {'split': split, 'format': 'raw_bgr' if resize else 'encoded', 'resize': resize, 'data_yaml': data_yaml}
+    # Decoding and resizing is CPU-bound, plain reads are I/O-bound
+    executor_class = ProcessPoolExecutor if resize else ThreadPoolExecutor
+    shard_limit = shard_size_mb * 1024 * 1024
+
+    shards, writer = 0, None
+    with executor_class(max_workers=workers) as executor:
+        # Bounded chunks keep at most a few hundred loaded samples in memory
+        for start in range(0, len(samples), 256):
+            chunk = samples[start : start + 256]
+            arguments = [(image_path, label_path, resize) for _, image_path, label_path in chunk]
+            for (name, _, _), loaded in zip(chunk, executor.map(load_sample, arguments)):
+                if writer is None:
+                    path = os.path.join(output_dir, f'{split}-{shards:05d}{SHARD_SUFFIX}')
+                    writer = ShardWriter(path, resize is not None, metadata)
+                    shards += 1
+                writer.add(name, *loaded)
+                if writer.offset >= shard_limit:
+                    writer.close()
+                    writer = None
+    if writer is not None:
+        writer.close()
+    return shards
+
+
+class PackedShard:
+    """Memory-mapped shard; images and labels are views of the map, nothing is copied or read up front."""
+
+    def __init__(self, path):
+        self.path = path
+        self.buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        (magic, version, flags, count, index_offset, labels_offset, label_rows, metadata_offset,
+         metadata_size) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} dataset shard')
+        self.raw = bool(flags & FLAG_RAW)
+        self.index = np.frombuffer(self.buffer, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        self.labels = np.frombuffer(self.buffer, dtype='<f4', count=label_rows * 5, offset=labels_offset)
+        self.labels = self.labels.reshape(label_rows, 5)
+        self.metadata = json.loads(bytes(self.buffer[metadata_offset : metadata_offset + metadata_size]))
+        self.names = self.metadata['names']
+
+    def __len__(self):
+        return len(self.index)
+
+    def image_bytes(self, i):
+        """The stored image of sample i: encoded file bytes or raw pixels, as a view of the map."""
+        row = self.index[i]
+        return self.buffer[int(row['offset']) : int(row['offset']) + int(row['size'])]
+
+    def image(self, i):
+        """Sample i as a BGR uint8 image; raw shards return a zero-copy (H, W, 3) view."""
+        row = self.index[i]
+        data = self.image_bytes(i)
+        if self.raw:
+            return data.reshape(int(row['height']), int(row['width']), 3)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+    def labels_of(self, i):
+        """(N, 5) float32 view of the boxes of sample i: class, x, y, w, h."""
+        row = self.index[i]
+        start = int(row['label_start'])
+        return self.labels[start : start + int(row['label_count'])]
+
+
+class PackedDataset:
+    """All shards of one split of a packed dataset, indexed like one list of (image, labels) samples."""
+
+    def __init__(self, packed_dir, split):
+        paths = sorted(
+            os.path.join(packed_dir, name) for name in os.listdir(packed_dir)
+            if name.startswith(f'{split}-') and name.endswith(SHARD_SUFFIX)
+        )
+        self.shards = [PackedShard(path) for path in paths]
+        self._starts = list(np.cumsum([0] + [len(shard) for shard in self.shards[:-1]]))
+        self._length = sum(len(shard) for shard in self.shards)
+
+    def __len__(self):
+        return self._length
+
+    def _locate(self, i):
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        shard_index = bisect.bisect_right(self._starts, i) - 1
+        return self.shards[shard_index], i - self._starts[shard_index]
+
+    def __getitem__(self, i):
+        shard, local = self._locate(i)
+        return shard.image(local), shard.labels_of(local)
+
+    def name(self, i):
+        shard, local = self._locate(i)
+        return shard.names[local]
+
+    @property
+    def data_yaml(self):
+        return self.shards[0].metadata.get('data_yaml') if self.shards else None
+
+    def materialize(self, target_dir, workers=16):
+        """Write the split back as images/ and labels/ files, e.g. onto a local disk for a file-based trainer.
+
+        Encoded images are written as stored, raw images as BMP, which needs no compression.
+        """
+        images_dir = os.path.join(target_dir, 'images')
+        labels_dir = os.path.join(target_dir, 'labels')
+        os.makedirs(images_dir, exist_ok=True)
+        os.makedirs(labels_dir, exist_ok=True)
+
+        def write(shard, local):
+            stem, extension = os.path.splitext(shard.names[local])
+            if shard.raw:
+                cv2.imwrite(os.path.join(images_dir, stem + '.bmp'), shard.image(local))
+            else:
+                with open(os.path.join(images_dir, stem + extension), 'wb') as file:
+                    file.write(shard.image_bytes(local))
+            labels = shard.labels_of(local)
+            with open(os.path.join(labels_dir, stem + '.txt'), 'w') as file:
+                file.writelines(f'{int(row[0])} {row[1]:.6f} {row[2]:.6f} {row[3]:.6f} {row[4]:.6f}\n'
+                                for row in labels)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for job in [executor.submit(write, shard, local) for shard in self.shards for local in range(len(shard))]:
+                job.result()
+
+
+def materialize_packed_dataset(packed_dir, local_root, splits=SPLITS, val_split='valid'):
+    """Unpack splits of a packed dataset under local_root and write a data.yaml for them; returns the yaml path.
+
+    The target directory is keyed by the packed directory and the splits and emptied first, so no file of an
+    earlier unpack (e.g. the .bmp images of a --resize packing) ends up in the dataset. val_split is the split
+    the yaml names as 'val', e.g. 'test' for the test set evaluation of val.py.
+    """
+    import yaml
+
+    packed_dir = os.path.abspath(packed_dir)
+    key = hashlib.sha1(json.dumps([packed_dir, list(splits)]).encode()).hexdigest()[:12]
+    local_dir = os.path.join(local_root, f'{os.path.basename(packed_dir)}-{key}')
+    shutil.rmtree(local_dir, ignore_errors=True)
+
+    config = None
+    for split in splits:
+        dataset = PackedDataset(packed_dir, split)
+        if len(dataset) == 0:
+            continue
+        dataset.materialize(os.path.join(local_dir, split))
+        if config is None and dataset.data_yaml:
+            config = yaml.safe_load(dataset.data_yaml)
+        print(f'Unpacked {len(dataset)} {split} samples')
+
+    config = dict(config or {}, path=local_dir)
+    for config_key, split in (('train', 'train'), ('val', val_split), ('test', 'test')):
+        if os.path.isdir(os.path.join(local_dir, split)):
+            config[config_key] = f'{split}/images'
+        else:
+            config.pop(config_key, None)
+    os.makedirs(local_dir, exist_ok=True)
+    configuration_path = os.path.join(local_dir, 'data.yaml')
+    with open(configuration_path, 'w') as file:
+        yaml.safe_dump(config, file)
+    return configuration_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pack a YOLOv8 dataset into memory-mappable shards.')
+    parser.add_argument('--dataset', default='../data/real_dataset')
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--splits', nargs='+', default=SPLITS)
+    parser.add_argument('--shard-size-mb', type=int, default=1024, help='Approximate size of one shard.')
+    parser.add_argument('--resize', type=int, help='Store decoded images resized to this longest side.')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    data_yaml_path = os.path.join(args.dataset, 'data.yaml')
+    data_yaml = None
+    if os.path.exists(data_yaml_path):
+        with open(data_yaml_path, 'r') as file:
+            data_yaml = file.read()
+    for split in args.splits:
+        shards = pack_split(args.dataset, args.output, split, args.shard_size_mb, args.resize, args.workers, data_yaml)
+        print(f'{split}: {shards} shards')
+    print('Dataset packed successfully.')
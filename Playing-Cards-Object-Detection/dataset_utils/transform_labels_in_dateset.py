@@ -1,56 +1,220 @@
 """
 Script that relabels dataset in YOLOv8 format based on new specified classes.
-If some of the old labels do not exist in the current dataset, remove any detected objects of these class in the labels files.
+If some of the old classes do not exist in the new classes, their objects are removed from the label files.
+
+The classes come from a mapping file with the old and the new class names in order, see mappings/hearts_only.json.
+Label files are processed in shards by a process pool and replaced atomically (temporary file + rename), so a crash
+never leaves a half-written file. A manifest in the dataset directory records the hash of every file before and after
+relabeling: running the command again skips files that are already relabeled, and a run interrupted halfway is
+finished by the next one without mapping any file twice.
+
+    python transform_labels_in_dateset.py --mapping mappings/hearts_only.json --dry-run
+    python transform_labels_in_dateset.py --mapping mappings/hearts_only.json --pattern '*.rf.*'
 """
 
+import argparse
+import fnmatch
+import hashlib
+import json
 import os
+from collections import Counter
+from multiprocessing import Pool
 
-# Old class names
-old_class_names = [
-    '10c', '10d', '10h', '10s', '2c', '2d', '2h', '2s', '3c', '3d', '3h', '3s',
-    '4c', '4d', '4h', '4s', '5c', '5d', '5h', '5s', '6c', '6d', '6h', '6s',
-    '7c', '7d', '7h', '7s', '8c', '8d', '8h', '8s', '9c', '9d', '9h', '9s',
-    'Ac', 'Ad', 'Ah', 'As', 'Jc', 'Jd', 'Jh', 'Js', 'Kc', 'Kd', 'Kh', 'Ks',
-    'Qc', 'Qd', 'Qh', 'Qs'
-]
+import numpy as np
 
-# New class names
-new_class_names = ['10h', '2h', '3h', '4h', '5h',
-                   '6h', '7h', '8h', '9h', 'Ah', 'Jh', 'Kh', 'Qh']
+# Directories
+DATASET_BASE_DIR = '../data/combined'  # NOTE: Change the output dir if needed
+SUBDIRS = ['train', 'test', 'valid']
+MANIFEST_NAME = 'relabel_manifest.json'
+TEMPORARY_SUFFIX = '.relabel.tmp'
 
-# Create a mapping from old to new class indices
-old_to_new_class_index = {old_class_names.index(
-    name): new_class_names.index(name) for name in new_class_names}
 
-# Directories
-dataset_base_dir = '../data/combined'  # NOTE: Change the output dir if needed
-subdirs = ['train', 'test', 'valid']
+def load_mapping(mapping_path):
+    """Old class index -> new class index for every old class kept, and both name lists."""
+    with open(mapping_path, 'r') as file:
+        mapping = json.load(file)
+    old_class_names, new_class_names = mapping['old_class_names'], mapping['new_class_names']
+    missing = [name for name in new_class_names if name not in old_class_names]
+    if missing:
+        raise SystemExit(f'New classes missing from the old classes: {missing}')
+    old_to_new_class_index = {old_class_names.index(name): new_class_names.index(name) for name in new_class_names}
+    return old_to_new_class_index, old_class_names, new_class_names
+
+
+def mapping_digest(old_to_new_class_index):
+    return hashlib.sha1(json.dumps(sorted(old_to_new_class_index.items())).encode()).hexdigest()
+
 
+def file_digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
 
-def transform_labels(label_path, old_to_new_class_index):
-    with open(label_path, 'r') as file:
-        lines = file.readlines()
 
+def list_label_files(dataset_dir, pattern):
+    """Label files (relative to the dataset) whose name matches the pattern."""
+    label_files = []
+    for subdir in SUBDIRS:
+        label_dir = os.path.join(dataset_dir, subdir, 'labels')
+        for root, _, files in os.walk(label_dir):
+            for file in files:
+                if file.endswith('.txt') and fnmatch.fnmatch(file, pattern):
+                    label_files.append(os.path.relpath(os.path.join(root, file), dataset_dir))
+    return sorted(label_files)
+
+
+def transform_labels(data, old_to_new_class_index, kept, remapped, dropped):
+    """Relabel the content of one label file; counts boxes per old class index."""
     new_labels = []
-    for line in lines:
-        parts = line.strip().split()
+    for line in data.splitlines():
+        parts = line.split(maxsplit=1)
+        if not parts:
+            continue
         old_class_index = int(parts[0])
-        if old_class_index in old_to_new_class_index:
-            new_class_index = old_to_new_class_index[old_class_index]
-            new_labels.append(f"{new_class_index} {' '.join(parts[1:])}\n")
+        new_class_index = old_to_new_class_index.get(old_class_index)
+        if new_class_index is None:
+            dropped[old_class_index] += 1
+            continue
+        (kept if new_class_index == old_class_index else remapped)[old_class_index] += 1
+        new_labels.append(b'%d %s\n' % (new_class_index, parts[1] if len(parts) > 1 else b''))
+    return b''.join(new_labels)
+
+
+def process_shard(arguments):
+    """Relabel a shard of files into temporary files next to them; nothing is renamed yet.
+
+    Returns the manifest entries of the shard, the files that have a temporary file to rename, and the box counts.
+    """
+    dataset_dir, label_files, done, old_to_new_class_index, dry_run = arguments
+    kept, remapped, dropped = Counter(), Counter(), Counter()
+    entries, pending = {}, []
+    for label_file in label_files:
+        path = os.path.join(dataset_dir, label_file)
+        with open(path, 'rb') as file:
+            data = file.read()
+        digest = file_digest(data)
+        if done.get(label_file) == digest:
+            # Already relabeled by an earlier run with this mapping
+            entries[label_file] = (None, digest)
+            continue
+
+        new_data = transform_labels(data, old_to_new_class_index, kept, remapped, dropped)
+        entries[label_file] = (digest, file_digest(new_data))
+        if dry_run or new_data == data:
+            continue
+        with open(path + TEMPORARY_SUFFIX, 'wb') as file:
+            file.write(new_data)
+        pending.append(label_file)
+    return entries, pending, kept, remapped, dropped
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def write_manifest(path, manifest):
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump(manifest, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def print_summary(old_class_names, new_class_names, old_to_new_class_index, kept, remapped, dropped):
+    print(f'{"class":>6} {"kept":>8} {"remapped":>9} {"dropped":>8}  new index')
+    for old_class_index in sorted(set(kept) | set(remapped) | set(dropped)):
+        name = old_class_names[old_class_index] if old_class_index < len(old_class_names) else str(old_class_index)
+        new_class_index = old_to_new_class_index.get(old_class_index)
+        target = '-' if new_class_index is None else f'{old_class_index} -> {new_class_index}'
+        print(f'{name:>6} {kept[old_class_index]:>8} {remapped[old_class_index]:>9} {dropped[old_class_index]:>8}  '
+              f'{target}')
+    print(f'{"total":>6} {sum(kept.values()):>8} {sum(remapped.values()):>9} {sum(dropped.values()):>8}')
+    print(f'New classes ({len(new_class_names)}): {new_class_names}')
+
+
+def indexed_label_files(dataset_dir, pattern, old_to_new_class_index):
+    """Label files with a box whose class is remapped or dropped, from the index_dataset.py cache."""
+    from index_dataset import update_index
+
+    index, _ = update_index(dataset_dir)
+    unchanged = {old for old, new in old_to_new_class_index.items() if old == new}
+    changing = set(np.unique(index.boxes['cls']).tolist()) - unchanged
+    return [
+        label_file for label_file in index.label_files(changing)
+        if fnmatch.fnmatch(os.path.basename(label_file), pattern)
+    ]
+
+
+def relabel(dataset_dir, mapping_path, pattern='*', dry_run=False, workers=None, shard_size=2000, use_index=False):
+    old_to_new_class_index, old_class_names, new_class_names = load_mapping(mapping_path)
+    digest = mapping_digest(old_to_new_class_index)
+
+    manifest_path = os.path.join(dataset_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    done = {}
+    if manifest is not None:
+        if manifest['mapping'] == digest:
+            done = {label_file: entry[1] for label_file, entry in manifest['files'].items()}
+        elif not manifest['complete']:
+            raise SystemExit('An earlier relabeling with a different mapping did not finish, run it again first')
+
+    if use_index:
+        label_files = indexed_label_files(dataset_dir, pattern, old_to_new_class_index)
+    else:
+        label_files = list_label_files(dataset_dir, pattern)
+    shards = []
+    for start in range(0, len(label_files), shard_size):
+        shard = label_files[start : start + shard_size]
+        shard_done = {label_file: done[label_file] for label_file in shard if label_file in done}
+        shards.append((dataset_dir, shard, shard_done, old_to_new_class_index, dry_run))
+
+    entries, pending = {}, []
+    kept, remapped, dropped = Counter(), Counter(), Counter()
+    with Pool(workers) as pool:
+        for shard_entries, shard_pending, shard_kept, shard_remapped, shard_dropped in pool.imap_unordered(
+            process_shard, shards
+        ):
+            entries.update(shard_entries)
+            pending.extend(shard_pending)
+            kept.update(shard_kept)
+            remapped.update(shard_remapped)
+            dropped.update(shard_dropped)
+
+    skipped = sum(1 for entry in entries.values() if entry[0] is None)
+    print(f'{len(label_files)} label files, {skipped} already relabeled, {len(pending)} to rewrite')
+    print_summary(old_class_names, new_class_names, old_to_new_class_index, kept, remapped, dropped)
+    if dry_run:
+        return
 
-    with open(label_path, 'w') as file:
-        file.writelines(new_labels)
+    # Files outside this run (another pattern, or not selected by the index) keep their entries,
+    # skipped files keep the source hash of the run that relabeled them
+    files = dict(manifest['files']) if done else {}
+    files.update({
+        label_file: manifest['files'][label_file] if entry[0] is None else entry
+        for label_file, entry in entries.items()
+    })
+    # Record the expected result before the first rename, so an interrupted run is recognized and finished
+    write_manifest(manifest_path, {'mapping': digest, 'complete': False, 'files': files})
+    for label_file in pending:
+        path = os.path.join(dataset_dir, label_file)
+        os.replace(path + TEMPORARY_SUFFIX, path)
+    write_manifest(manifest_path, {'mapping': digest, 'complete': True, 'files': files})
 
 
-# Iterate through all subdirectories and transform labels
-for subdir in subdirs:
-    label_dir = os.path.join(dataset_base_dir, subdir, 'labels')
-    for root, _, files in os.walk(label_dir):
-        for file in files:
-            if file.endswith('.txt') and '.rf.' in file:  # NOTE specific for dataset
-                print(file)
-                label_path = os.path.join(root, file)
-                transform_labels(label_path, old_to_new_class_index)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Relabel a YOLOv8 dataset with a class mapping file.')
+    parser.add_argument('--dataset', default=DATASET_BASE_DIR)
+    parser.add_argument('--mapping', required=True, help='JSON file with old_class_names and new_class_names.')
+    parser.add_argument('--pattern', default='*', help="Only relabel matching file names, e.g. '*.rf.*'.")
+    parser.add_argument('--dry-run', action='store_true', help='Only count the boxes kept, remapped and dropped.')
+    parser.add_argument('--workers', type=int, help='Processes, default: one per CPU.')
+    parser.add_argument('--shard-size', type=int, default=2000, help='Label files per task.')
+    parser.add_argument('--use-index', action='store_true',
+                        help='Only process files with classes that change, found in the index_dataset.py cache.')
+    args = parser.parse_args()
 
-print("Labels transformed successfully.")
+    relabel(args.dataset, args.mapping, args.pattern, args.dry_run, args.workers, args.shard_size, args.use_index)
+    if not args.dry_run:
+        print('Labels transformed successfully.')
@@ -0,0 +1,311 @@
+"""
+Golden-output parity suite and benchmark for the YOLOv8 decoder in utils/yolo_decode.py.
+
+The golden file holds synthetic raw outputs (stored sparsely, every other value is 0) together with the
+detections they must decode to. Expected detections come from a line-by-line Python port of decodeYolo in
+OnnxCardDetector.swift and are cross-checked against the vectorized decoder when the file is generated,
+so the same file can be used to check the mobile decoder. Cases with "agnostic": false use per-class NMS,
+which only the Python decoder implements; they are skipped when checking a mobile dump.
+
+    python demo_application/decode_parity.py generate
+    python demo_application/decode_parity.py check [--detections mobile_detections.json]
+    python demo_application/decode_parity.py bench
+"""
+
+import argparse
+import json
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.yolo_decode import decode_yolo
+
+project_root = Path(__file__).resolve().parents[1]
+DEFAULT_GOLDEN = project_root.parent / "mobile_app" / "card_detector" / "ios" / "RunnerTests" / "yolo_decode_golden.json"
+
+NUM_CLASSES = 52
+NUM_ANCHORS = 8400
+INPUT_SIZE = 640
+BOX_TOLERANCE = 1e-3
+SCORE_TOLERANCE = 1e-5
+
+
+def reference_decode(values, shape, num_classes, conf_threshold, iou_threshold, max_detections, agnostic=True):
+    """Scalar port of decodeYolo + class-agnostic NMS from OnnxCardDetector.swift, kept deliberately literal.
+
+    With agnostic=False only boxes of the same class suppress each other.
+    """
+    d1, d2 = shape[1], shape[2]
+    if d1 in (4 + num_classes, 5 + num_classes):
+        channels, num_pred, channel_major, has_objectness = d1, d2, True, d1 == 5 + num_classes
+    elif d2 in (4 + num_classes, 5 + num_classes):
+        channels, num_pred, channel_major, has_objectness = d2, d1, False, d2 == 5 + num_classes
+    else:
+        return []
+
+    def prob(raw):
+        if 0 <= raw <= 1:
+            return raw
+        return 1 / (1 + math.exp(-raw))
+
+    candidates = []
+    for i in range(num_pred):
+
+        def v(c):
+            return values[i + c * num_pred] if channel_major else values[c + i * channels]
+
+        x, y, w, h = v(0), v(1), v(2), v(3)
+        if w <= 0 or h <= 0:
+            continue
+        obj = prob(v(4)) if has_objectness else 1.0
+        cls_offset = 5 if has_objectness else 4
+
+        best_score, best_class = 0.0, -1
+        for c in range(num_classes):
+            s = prob(v(cls_offset + c)) * obj
+            if s > best_score:
+                best_score, best_class = s, c
+        if best_class < 0 or best_score < conf_threshold:
+            continue
+        candidates.append(((x - w / 2, y - h / 2, x + w / 2, y + h / 2), best_score, best_class))
+
+    def iou(a, b):
+        inter_w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+        inter_h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+        inter = inter_w * inter_h
+        area_a = (a[2] - a[0]) * (a[3] - a[1])
+        area_b = (b[2] - b[0]) * (b[3] - b[1])
+        return inter / max(1e-6, area_a + area_b - inter)
+
+    candidates.sort(key=lambda candidate: candidate[1], reverse=True)
+    selected = []
+    for candidate in candidates:
+        if all(
+            iou(candidate[0], kept[0]) <= iou_threshold or (not agnostic and kept[2] != candidate[2])
+            for kept in selected
+        ):
+            selected.append(candidate)
+            if len(selected) >= max_detections:
+                break
+    return [[*box, score, cls] for box, score, cls in selected]
+
+
+def _logit(p):
+    return math.log(p / (1 - p))
+
+
+def make_case(
+    name, seed, num_objects, noise, channel_major=True, logits=False, objectness=False, agnostic=True, stacked=0
+):
+    """Build a synthetic raw output with clustered overlapping boxes, plus low-score noise anchors.
+
+    stacked adds that many clusters of near-identical boxes with different classes, e.g. two cards on top of
+    each other: agnostic NMS keeps one box of a cluster, per-class NMS one box per class.
+    """
+    rng = np.random.default_rng(seed)
+    channels = NUM_CLASSES + (5 if objectness else 4)
+    class_offset = 5 if objectness else 4
+    output = np.zeros((channels, NUM_ANCHORS), dtype=np.float32)
+    anchors = rng.permutation(NUM_ANCHORS)
+    next_anchor = 0
+
+    def place(box, scores_by_class, obj):
+        nonlocal next_anchor
+        anchor = anchors[next_anchor]
+        next_anchor += 1
+        output[:4, anchor] = box
+        for cls, score in scores_by_class.items():
+            output[class_offset + cls, anchor] = _logit(score) if logits else score
+        if objectness:
+            output[4, anchor] = _logit(obj) if logits else obj
+
+    for _ in range(num_objects):
+        cx, cy = rng.uniform(40, INPUT_SIZE - 40, size=2)
+        w, h = rng.uniform(20, 120, size=2)
+        cls = int(rng.integers(NUM_CLASSES))
+        for _ in range(int(rng.integers(2, 6))):
+            jitter = rng.normal(0, 4, size=4)
+            box = [cx + jitter[0], cy + jitter[1], max(1.0, w + jitter[2]), max(1.0, h + jitter[3])]
+            # Neighbouring anchors sometimes disagree on the class, which matters for per-class NMS
+            other = int(rng.integers(NUM_CLASSES)) if rng.random() < 0.3 else cls
+            scores = {other: float(rng.uniform(0.3, 0.95))}
+            scores[int(rng.integers(NUM_CLASSES))] = float(rng.uniform(0.01, 0.2))
+            place(box, scores, float(rng.uniform(0.6, 1.0)))
+
+    for _ in range(stacked):
+        cx, cy = rng.uniform(60, INPUT_SIZE - 60, size=2)
+        w, h = rng.uniform(40, 120, size=2)
+        for cls in rng.choice(NUM_CLASSES, size=int(rng.integers(2, 4)), replace=False):
+            jitter = rng.normal(0, 2, size=4)
+            box = [cx + jitter[0], cy + jitter[1], w + jitter[2], h + jitter[3]]
+            place(box, {int(cls): float(rng.uniform(0.3, 0.95))}, float(rng.uniform(0.6, 1.0)))
+
+    for _ in range(noise):
+        box = [*rng.uniform(0, INPUT_SIZE, size=2), *rng.uniform(-5, 60, size=2)]
+        place(box, {int(rng.integers(NUM_CLASSES)): float(rng.uniform(0.001, 0.025))}, float(rng.uniform(0.1, 1.0)))
+
+    if not channel_major:
+        output = np.ascontiguousarray(output.T)
+    rows, cols = np.nonzero(output)
+    return {
+        "name": name,
+        "shape": [1, *output.shape],
+        "entries": [[int(r), int(c), float(output[r, c])] for r, c in zip(rows, cols)],
+        "num_classes": NUM_CLASSES,
+        "conf_threshold": 0.02,
+        "iou_threshold": 0.45,
+        "max_detections": 50,
+        "agnostic": agnostic,
+    }
+
+
+def dense_output(case):
+    output = np.zeros(case["shape"], dtype=np.float32)
+    for row, col, value in case["entries"]:
+        output[0, row, col] = value
+    return output
+
+
+def vectorized_decode(case):
+    boxes, scores, class_ids = decode_yolo(
+        dense_output(case),
+        num_classes=case["num_classes"],
+        conf_threshold=case["conf_threshold"],
+        iou_threshold=case["iou_threshold"],
+        max_detections=case["max_detections"],
+        agnostic=case.get("agnostic", True),
+    )
+    return [[*map(float, box), float(score), int(cls)] for box, score, cls in zip(boxes, scores, class_ids)]
+
+
+def compare(expected, actual):
+    """Return a list of human readable mismatches between two detection lists."""
+    if len(expected) != len(actual):
+        return [f"expected {len(expected)} detections, got {len(actual)}"]
+    errors = []
+    for i, (e, a) in enumerate(zip(expected, actual)):
+        if int(e[5]) != int(a[5]):
+            errors.append(f"#{i}: class {int(a[5])} != {int(e[5])}")
+        if abs(e[4] - a[4]) > SCORE_TOLERANCE:
+            errors.append(f"#{i}: score {a[4]:.6f} != {e[4]:.6f}")
+        if max(abs(x - y) for x, y in zip(e[:4], a[:4])) > BOX_TOLERANCE:
+            errors.append(f"#{i}: box {a[:4]} != {e[:4]}")
+    return errors
+
+
+def generate(args):
+    cases = [
+        make_case("channel_major", 1, num_objects=8, noise=100),
+        make_case("crowded", 2, num_objects=40, noise=600),
+        make_case("anchor_major", 3, num_objects=8, noise=100, channel_major=False),
+        make_case("logits", 4, num_objects=8, noise=100, logits=True),
+        make_case("objectness", 5, num_objects=8, noise=100, objectness=True),
+        make_case("empty", 6, num_objects=0, noise=0),
+        make_case("stacked", 7, num_objects=4, noise=100, stacked=6),
+        make_case("per_class", 1, num_objects=8, noise=100, agnostic=False),
+        make_case("per_class_crowded", 2, num_objects=40, noise=600, agnostic=False),
+        make_case("per_class_stacked", 7, num_objects=4, noise=100, agnostic=False, stacked=6),
+        make_case("per_class_objectness", 5, num_objects=8, noise=100, logits=True, objectness=True, agnostic=False),
+    ]
+    for case in cases:
+        values = dense_output(case)[0].reshape(-1).tolist()
+        case["expected"] = reference_decode(
+            values,
+            case["shape"],
+            case["num_classes"],
+            case["conf_threshold"],
+            case["iou_threshold"],
+            case["max_detections"],
+            case["agnostic"],
+        )
+        errors = compare(case["expected"], vectorized_decode(case))
+        if errors:
+            raise SystemExit(f"Vectorized decoder disagrees with the reference on {case['name']}: {errors[:5]}")
+        print(f"{case['name']}: {len(case['expected'])} detections")
+
+    # The stacked clusters must decode differently with and without per-class NMS, or they test nothing
+    expected = {case["name"]: case["expected"] for case in cases}
+    if len(expected["per_class_stacked"]) <= len(expected["stacked"]):
+        raise SystemExit("per_class_stacked keeps no more boxes than stacked, per-class NMS is not exercised")
+
+    Path(args.golden).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.golden, "w") as file:
+        json.dump({"cases": cases}, file)
+    print(f"Golden outputs written to {args.golden}")
+
+
+def check(args):
+    with open(args.golden) as file:
+        cases = json.load(file)["cases"]
+    mobile = None
+    if args.detections:
+        with open(args.detections) as file:
+            mobile = json.load(file)
+
+    failures = 0
+    for case in cases:
+        if mobile is not None and not case.get("agnostic", True):
+            # The iOS decoder only has class-agnostic NMS
+            print(f"{case['name']}: skipped (per-class NMS)")
+            continue
+        # The mobile dump maps case name -> [[x1, y1, x2, y2, score, class], ...]
+        actual = mobile.get(case["name"], []) if mobile is not None else vectorized_decode(case)
+        errors = compare(case["expected"], actual)
+        status = "ok" if not errors else "FAIL"
+        print(f"{case['name']}: {status}")
+        for error in errors[:10]:
+            print(f"  {error}")
+        failures += bool(errors)
+    if failures:
+        raise SystemExit(f"{failures} of {len(cases)} cases differ from the golden outputs")
+
+
+def bench(args):
+    rng = np.random.default_rng(0)
+    output = np.zeros((1, 4 + NUM_CLASSES, NUM_ANCHORS), dtype=np.float32)
+    # Every anchor predicts a box; class scores mostly low like a real model, with a few confident cards.
+    output[0, :2] = rng.uniform(0, INPUT_SIZE, size=(2, NUM_ANCHORS))
+    output[0, 2:4] = rng.uniform(10, 120, size=(2, NUM_ANCHORS))
+    output[0, 4:] = rng.uniform(0, 0.02, size=(NUM_CLASSES, NUM_ANCHORS))
+    confident = rng.choice(NUM_ANCHORS, size=args.candidates, replace=False)
+    output[0, 4 + rng.integers(NUM_CLASSES, size=args.candidates), confident] = rng.uniform(0.3, 0.95, args.candidates)
+
+    for agnostic in (True, False):
+        for _ in range(10):
+            decode_yolo(output, NUM_CLASSES, args.conf, agnostic=agnostic)
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            decode_yolo(output, NUM_CLASSES, args.conf, agnostic=agnostic)
+            timings.append((time.perf_counter() - start) * 1000)
+        p50, p99 = np.percentile(timings, [50, 99])
+        mode = "agnostic" if agnostic else "per-class"
+        print(f"decode+NMS ({mode}, {args.candidates} candidates): p50 {p50:.3f} ms, p99 {p99:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="YOLOv8 decoder parity suite and benchmark.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Regenerate the golden outputs.")
+    generate_parser.add_argument("--golden", default=str(DEFAULT_GOLDEN))
+    generate_parser.set_defaults(func=generate)
+
+    check_parser = subparsers.add_parser("check", help="Check a decoder against the golden outputs.")
+    check_parser.add_argument("--golden", default=str(DEFAULT_GOLDEN))
+    check_parser.add_argument(
+        "--detections",
+        help="JSON dump of another decoder (e.g. the iOS one) to check instead of utils/yolo_decode.py.",
+    )
+    check_parser.set_defaults(func=check)
+
+    bench_parser = subparsers.add_parser("bench", help="Time decode + NMS on a realistic 8400-anchor output.")
+    bench_parser.add_argument("--iterations", type=int, default=500)
+    bench_parser.add_argument("--candidates", type=int, default=60)
+    bench_parser.add_argument("--conf", type=float, default=0.25)
+    bench_parser.set_defaults(func=bench)
+
+    args = parser.parse_args()
+    args.func(args)
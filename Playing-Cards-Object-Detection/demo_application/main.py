@@ -1,15 +1,36 @@
 import streamlit as st
 import cv2
-from utils.game_logic import Game, GameMode
-from utils.card_game_detector import CardGameDetector
-from utils.constants import MODEL_PATH, CLASS_NAMES
+from utils.game_logic import CardSet, GameMode, MODE_INDEX
+from utils.game_journal import get_game_store
+from utils.detector_registry import get_detector
+from utils.snapshot_aggregator import SnapshotAggregator
+from utils.inference_backends import load_labels
+from utils.constants import (
+    MODEL_PATH,
+    CLASS_NAMES,
+    SNAPSHOT_FRAMES,
+    SNAPSHOT_FRAME_SPACING,
+    SNAPSHOT_BATCH_SIZE,
+    SNAPSHOT_MIN_EVIDENCE,
+    SNAPSHOT_ROIS,
+    SNAPSHOT_AUTO_ROI,
+    DETECTOR_BACKEND,
+    ONNX_MODEL_PATH,
+    ONNX_LABELS_PATH,
+    ONNX_INTRA_OP_THREADS,
+    ONNX_INTER_OP_THREADS,
+    GAME_JOURNAL_DIR,
+    GAME_SNAPSHOT_EVERY,
+)
 from utils.text_constants import Texts
 
 
 def initialize_session_state():
     """Initialize Streamlit session state variables."""
     if "game" not in st.session_state:
-        st.session_state.game = Game()
+        # Games are journaled per table (?table=<id>), so a restart continues where the table left off
+        table_id = st.query_params.get("table", "default")
+        st.session_state.game = get_game_store(GAME_JOURNAL_DIR, snapshot_every=GAME_SNAPSHOT_EVERY).get(table_id)
     if "cards_team_a" not in st.session_state:
         st.session_state.cards_team_a = []
     if "cards_team_b" not in st.session_state:
@@ -17,9 +38,12 @@ def initialize_session_state():
     if "team_a_last10" not in st.session_state:
         st.session_state.team_a_last10 = False
     if "current_game_mode_index" not in st.session_state:
-        st.session_state.current_game_mode_index = 0
+        st.session_state.current_game_mode_index = MODE_INDEX[st.session_state.game.game_mode]
     if "language" not in st.session_state:
         st.session_state.language = "en"
+    if "last_snapshot_frame" not in st.session_state:
+        st.session_state.last_snapshot_frame = None
+        st.session_state.last_snapshot_detections = None
     if "texts" not in st.session_state:
         st.session_state.texts = Texts(language=st.session_state.language)
 
@@ -42,6 +66,19 @@ def display_team_scores():
     st.table(table_data)
 
 
+def load_detector():
+    """Get the process-wide detector for the configured backend."""
+    if DETECTOR_BACKEND == "onnx":
+        return get_detector(
+            ONNX_MODEL_PATH,
+            load_labels(ONNX_LABELS_PATH),
+            backend="onnx",
+            intra_op_threads=ONNX_INTRA_OP_THREADS,
+            inter_op_threads=ONNX_INTER_OP_THREADS,
+        )
+    return get_detector(MODEL_PATH, CLASS_NAMES)
+
+
 def capture_cards(detector):
     """Capture cards using the webcam and process detections."""
     texts = st.session_state.texts
@@ -50,18 +87,25 @@ def capture_cards(detector):
     cap.set(3, 640)
     cap.set(4, 480)
 
-    frame_placeholder = st.empty()
-    detected_classes = []
-    for _ in range(10):
-        ret, frame = cap.read()
-        if ret:
-            frame_placeholder.image(frame, channels="BGR")
-            detected_classes.extend(detector.capture_a_frame(cap))
+    aggregator = SnapshotAggregator(min_evidence=SNAPSHOT_MIN_EVIDENCE, max_frames=SNAPSHOT_FRAMES)
+    reference = st.session_state.last_snapshot_frame if SNAPSHOT_AUTO_ROI else None
+    # Only the 32 Belot cards can be on the table, the model's 2-6 classes are never decoded
+    belot_classes = detector.classes_for_cards(CardSet.full_deck())
+    _, _, last_frame, last_detections = detector.capture_snapshot(
+        cap,
+        aggregator,
+        SNAPSHOT_BATCH_SIZE,
+        SNAPSHOT_FRAME_SPACING,
+        SNAPSHOT_ROIS,
+        reference,
+        belot_classes,
+        st.session_state.last_snapshot_detections,
+    )
     cap.release()
-    frame_placeholder.empty()
+    st.session_state.last_snapshot_frame = last_frame
+    st.session_state.last_snapshot_detections = last_detections
 
-    detections = detector.aggregate_detections(detected_classes)
-    detected_cards = st.session_state.game.sort_cards(detector.parse_cards(detections))
+    detected_cards = st.session_state.game.sort_cards(detector.cards_of_classes(aggregator.accepted_classes()))
 
     if detected_cards:
         st.success(texts.get("cards_detected"))
@@ -95,7 +139,8 @@ def handle_game_mode_change(mode_choice):
 def main():
     initialize_session_state()
     texts = st.session_state.texts
-    detector = CardGameDetector(MODEL_PATH, CLASS_NAMES)
+    # Loaded once per process and shared by every session, so reruns don't reload the model.
+    detector = load_detector()
 
     st.set_page_config(page_title=texts.get("page_title"), layout="wide")
     st.title(texts.get("title"))
@@ -129,6 +174,9 @@ def main():
         st.write(
             ", ".join(str(card) for card in st.session_state.cards_team_b) if st.session_state.cards_team_b else ""
         )
+        # The snapshot is taken right before a rerun, its last frame is shown on the next render
+        if st.session_state.last_snapshot_frame is not None:
+            st.image(st.session_state.last_snapshot_frame, channels="BGR")
 
         sub_col1, sub_col2 = st.columns(2)
         with sub_col1:
@@ -170,15 +218,20 @@ def main():
 
         with sub_col1:
             if st.button(texts.get("update_scores")):
-                st.session_state.game.add_current_round_points(
-                    taken_cards=st.session_state.cards_team_a,
-                    team_index=0,
-                    has_taken_last=st.session_state.team_a_last10,
-                    bonuses_points=team_a_bonus,
-                    enemy_bonuses_points=team_b_bonus,
-                )
-                st.success(texts.get("scores_updated"))
-                st.rerun()
+                try:
+                    st.session_state.game.add_current_round_points(
+                        taken_cards=st.session_state.cards_team_a,
+                        team_index=0,
+                        has_taken_last=st.session_state.team_a_last10,
+                        bonuses_points=team_a_bonus,
+                        enemy_bonuses_points=team_b_bonus,
+                        other_cards=st.session_state.cards_team_b,
+                    )
+                except ValueError as e:
+                    st.error(f"{texts.get('invalid_round')} {e}")
+                else:
+                    st.success(texts.get("scores_updated"))
+                    st.rerun()
         with sub_col2:
             if st.button(texts.get("revert_last_round")):
                 st.session_state.game.revert_last_round()
@@ -187,7 +240,7 @@ def main():
 
         with sub_col3:
             if st.button(texts.get("start_new_game")):
-                st.session_state.game = Game()
+                st.session_state.game.start_new_game()
                 st.session_state.cards_team_a = []
                 st.session_state.cards_team_b = []
                 st.session_state.team_a_last10 = False
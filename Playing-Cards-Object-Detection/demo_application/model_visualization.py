@@ -3,8 +3,13 @@
 
 import math
 import sys
-from ultralytics import YOLO
+import time
 import cv2
+from utils.constants import BELOT_CLASS_NAMES
+from utils.inference_backends import create_backend, load_labels
+from utils.pipeline import CaptureThread, InferenceThread, PipelineStats, draw_hud
+from utils.roi import RoiDetector, draw_rois, parse_roi
+from utils.tracker import DetectionScheduler
 
 # Change to 'tuned' to use it as the default one
 DEFAULT_MODEL = "synthetic"
@@ -78,17 +83,73 @@ configuration_dict = {
         "model_path": str(project_root / "final_models" / "yolov8m_tuned.pt"),
         "class_names": ["10h", "2h", "3h", "4h", "5h", "6h", "7h", "8h", "9h", "Ah", "Jh", "Kh", "Qh"],
     },
+    # 32 cards of the Belot deck (7 to A), the "belot" preset of model_utils/train.py
+    "belot": {
+        "model_path": str(project_root / "final_models" / "yolov8m_belot.pt"),
+        "class_names": BELOT_CLASS_NAMES,
+    },
 }
 
 print("Loading application...")
 
 parser = argparse.ArgumentParser(description="Real-time playing card detection demo.")
-parser.add_argument("model", nargs="?", default=DEFAULT_MODEL, help="Model preset (synthetic|tuned)")
+parser.add_argument("model", nargs="?", default=DEFAULT_MODEL, help="Model preset (synthetic|tuned|belot)")
 parser.add_argument(
     "--source",
     default="0",
     help="Video source: camera index (e.g. 0) or path to a video file.",
 )
+parser.add_argument(
+    "--backend",
+    choices=["ultralytics", "onnx"],
+    default="ultralytics",
+    help="Inference backend. 'onnx' runs the exported model with onnxruntime on CPU, without torch.",
+)
+parser.add_argument(
+    "--onnx-model",
+    default=str(project_root.parent / "mobile_app" / "card_detector" / "assets" / "model.onnx"),
+    help="ONNX model used by the onnx backend.",
+)
+parser.add_argument(
+    "--labels",
+    default=str(project_root.parent / "mobile_app" / "card_detector" / "assets" / "model_labels.txt"),
+    help="Label file matching the ONNX model's class order.",
+)
+parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads (0 = automatic).")
+parser.add_argument(
+    "--pipeline",
+    action="store_true",
+    help="Run capture, inference and rendering on separate threads and show a latency/FPS overlay.",
+)
+parser.add_argument(
+    "--detect-every",
+    type=int,
+    default=1,
+    help="Run the detector every N frames and track cards in between (1 = detect on every frame).",
+)
+parser.add_argument(
+    "--motion-threshold",
+    type=float,
+    default=6.0,
+    help="Scene change score (mean grayscale difference, 0-255) that forces a detection before it is due.",
+)
+parser.add_argument(
+    "--roi",
+    action="append",
+    type=parse_roi,
+    default=[],
+    help="Detect only inside this x1,y1,x2,y2 region (pixels); repeat for several regions.",
+)
+parser.add_argument(
+    "--auto-roi",
+    action="store_true",
+    help="Only detect again where the frame changed since the last detection (inside --roi regions if given).",
+)
+parser.add_argument(
+    "--frame-size",
+    default="640x480",
+    help="Requested camera resolution WIDTHxHEIGHT, e.g. 1920x1080 to detect small cards with --roi/--auto-roi.",
+)
 args = parser.parse_args()
 
 configuration_model = args.model
@@ -100,8 +161,12 @@ if configuration_model not in configuration_dict.keys():
 current_config = configuration_dict.get(configuration_model)
 
 # Load the model and class names
-model = YOLO(current_config["model_path"])
-classNames = current_config["class_names"]
+if args.backend == "onnx":
+    classNames = load_labels(args.labels)
+    model = create_backend("onnx", args.onnx_model, classNames, intra_op_threads=args.threads)
+else:
+    classNames = current_config["class_names"]
+    model = create_backend("ultralytics", current_config["model_path"], classNames)
 
 def _parse_source(value: str):
     value = value.strip()
@@ -118,8 +183,9 @@ def _open_capture(source):
 
 source = _parse_source(args.source)
 cap = _open_capture(source)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+frame_width, frame_height = (int(v) for v in args.frame_size.lower().split("x"))
+cap.set(cv2.CAP_PROP_FRAME_WIDTH, frame_width)
+cap.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_height)
 
 if not cap.isOpened():
     msg = f"Could not open video source={args.source!r}."
@@ -188,9 +254,73 @@ card_values = {
     "Qs": 10,
 }
 
-window_title = f"Playing Cards Detection - Model: {configuration_model}"
+window_title = f"Playing Cards Detection - Model: {configuration_model} ({args.backend})"
 
-try:
+roi_detector = None
+if args.roi or args.auto_roi:
+    roi_detector = RoiDetector(model.predict, rois=args.roi, auto=args.auto_roi)
+
+
+def detect_frame(img):
+    if roi_detector is not None:
+        return roi_detector.process(img)
+    return model.predict([img])[0]
+
+
+scheduler = None
+if args.detect_every > 1:
+    scheduler = DetectionScheduler(detect_frame, detect_every=args.detect_every, motion_threshold=args.motion_threshold)
+
+
+def predict_frame(img):
+    if scheduler is not None:
+        return scheduler.process(img)
+    return detect_frame(img)
+
+
+def draw_detections(img, detections, show_confidence, verbose=True):
+    """Draw boxes and labels on the frame and return the total card value."""
+    total_score = 0
+
+    # Coordinates
+    for detection in detections:
+        # Bounding box
+        x1, y1, x2, y2 = (int(v) for v in detection.box)  # Convert to int values
+
+        # Put box in cam
+        cv2.rectangle(img, (x1, y1), (x2, y2), (255, 0, 255), 3)
+
+        # Confidence
+        confidence = math.ceil((detection.confidence * 100)) / 100
+
+        # Class name
+        class_name = detection.class_name
+        if verbose:
+            print("Confidence --->", confidence)
+            print("Class name -->", class_name)
+
+        # Add card value to total score, label files may use upper case suits (e.g. "10C")
+        total_score += card_values.get(class_name[:-1].upper() + class_name[-1].lower(), 0)
+
+        # Object details
+        org = [x1, y1]
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        fontScale = 1
+        color = (255, 0, 0)
+        thickness = 2
+        display_text = class_name if not show_confidence else f"{class_name} {confidence}"
+        if detection.track_id is not None:
+            display_text = f"#{detection.track_id} {display_text}"
+        cv2.putText(img, display_text, org, font, fontScale, color, thickness)
+
+    # Display total score on the screen
+    score_text = f"Total Score: {total_score}"
+    cv2.putText(img, score_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    return total_score
+
+
+def run_sequential():
+    global SHOW_CONFIDENCE
     consecutive_failures = 0
     while True:
         success, img = cap.read()
@@ -206,46 +336,10 @@ try:
             continue
         consecutive_failures = 0
 
-        results = model(img, stream=True, verbose=False)
-
-        total_score = 0
-
-        # Coordinates
-        for r in results:
-            boxes = r.boxes
-
-            for box in boxes:
-                # Bounding box
-                x1, y1, x2, y2 = box.xyxy[0]
-                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)  # Convert to int values
-
-                # Put box in cam
-                cv2.rectangle(img, (x1, y1), (x2, y2), (255, 0, 255), 3)
-
-                # Confidence
-                confidence = math.ceil((box.conf[0] * 100)) / 100
-                print("Confidence --->", confidence)
-
-                # Class name
-                cls = int(box.cls[0])
-                class_name = classNames[cls]
-                print("Class name -->", class_name)
-
-                # Add card value to total score
-                total_score += card_values.get(class_name, 0)
-
-                # Object details
-                org = [x1, y1]
-                font = cv2.FONT_HERSHEY_SIMPLEX
-                fontScale = 1
-                color = (255, 0, 0)
-                thickness = 2
-                display_text = class_name if not SHOW_CONFIDENCE else f"{class_name} {confidence}"
-                cv2.putText(img, display_text, org, font, fontScale, color, thickness)
-
-        # Display total score on the screen
-        score_text = f"Total Score: {total_score}"
-        cv2.putText(img, score_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        detections = predict_frame(img)
+        if roi_detector is not None:
+            draw_rois(img, roi_detector.last_regions)
+        draw_detections(img, detections, SHOW_CONFIDENCE)
 
         cv2.imshow(window_title, img)
         key = cv2.waitKey(1) & 0xFF
@@ -253,6 +347,60 @@ try:
             break
         if key == ord("s"):
             SHOW_CONFIDENCE = not SHOW_CONFIDENCE
+
+
+def run_pipelined():
+    """Capture, inference and rendering on separate stages, throughput bounded by inference alone."""
+    global SHOW_CONFIDENCE
+    # Keep the driver from buffering old frames; the capture thread already keeps only the newest one.
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    file_fps = cap.get(cv2.CAP_PROP_FPS) if isinstance(source, str) else 0
+    capture = CaptureThread(cap, frame_interval=1 / file_fps if file_fps > 0 else 0.0)
+    inference = InferenceThread(capture.frames, predict_frame)
+    stats = PipelineStats()
+    capture.start()
+    inference.start()
+
+    try:
+        seen = 0
+        while not capture.stopped.is_set():
+            seen, result = inference.results.get(after=seen, timeout=0.1)
+            if result is not None:
+                start = time.perf_counter()
+                # Boxes are drawn on the exact frame they were computed for, never on a newer one.
+                img = result.frame.image
+                draw_detections(img, result.detections, SHOW_CONFIDENCE, verbose=False)
+                hud_lines = stats.lines()
+                if scheduler is not None:
+                    hud_lines.append(f"detector runs: {scheduler.detection_ratio:.0%} of frames")
+                if roi_detector is not None:
+                    hud_lines.append(
+                        f"roi: {roi_detector.roi_frames} crop / {roi_detector.full_frames} full / "
+                        f"{roi_detector.skipped_frames} skipped"
+                    )
+                draw_hud(img, hud_lines)
+                cv2.imshow(window_title, img)
+                stats.record(result, (time.perf_counter() - start) * 1000)
+
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord("q"):
+                break
+            if key == ord("s"):
+                SHOW_CONFIDENCE = not SHOW_CONFIDENCE
+    finally:
+        capture.stop()
+        inference.stop()
+        capture.join(timeout=2)
+        inference.join(timeout=2)
+    if capture.error:
+        raise SystemExit(capture.error)
+
+
+try:
+    if args.pipeline:
+        run_pipelined()
+    else:
+        run_sequential()
 finally:
     cap.release()
     cv2.destroyAllWindows()
@@ -0,0 +1,423 @@
+"""
+Multi-table scoring service: one shared detector, one game per table, over a small local HTTP API.
+
+Tables push camera frames (JPEG/PNG bodies). Frames from different tables that arrive within --max-delay-ms of
+each other are merged into one batched inference, so the detector runs fewer and larger batches as more
+tables are active. Every table has its own snapshot aggregator and Game (journaled with --journal-dir).
+
+    POST /tables/<id>/frame   image body -> {"detections", "done", "cards", "frames"}; a finished snapshot
+                              becomes the table's taken cards
+    POST /tables/<id>/round   {"team_index", "has_taken_last", "bonuses", "enemy_bonuses", "game_mode"}
+                              scores the taken cards like the Streamlit app
+    POST /tables/<id>/revert  reverts the last round
+    GET  /tables/<id>         scores and taken cards
+    GET  /stats               per-table latency, batch sizes and throughput
+
+    python demo_application/scoring_service.py serve --backend onnx --port 8765
+    python demo_application/scoring_service.py simulate --source recording.mp4 --tables 16 --fps 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+from utils.constants import (
+    CLASS_NAMES,
+    MODEL_PATH,
+    ONNX_LABELS_PATH,
+    ONNX_MODEL_PATH,
+    SNAPSHOT_FRAMES,
+    SNAPSHOT_MIN_EVIDENCE,
+)
+from utils.detector_registry import get_detector
+from utils.game_journal import get_game_store
+from utils.game_logic import Game, GameMode
+from utils.inference_backends import load_labels
+from utils.pipeline import RollingAverage
+from utils.snapshot_aggregator import SnapshotAggregator
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class MicroBatcher:
+    """Collects frames submitted within max_delay of the first one and detects them in one batch."""
+
+    def __init__(self, detect_batch, max_batch=16, max_delay=0.005):
+        self.detect_batch = detect_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.frames = 0
+        # Inference runs off the event loop on one thread; the detector serializes calls anyway
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._queue = asyncio.Queue()
+        self._worker = None
+
+    def start(self):
+        self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, frame):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((frame, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            frames = [frame for frame, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.detect_batch, frames)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.frames += len(frames)
+            for (_, future), detections in zip(batch, results):
+                if not future.done():
+                    future.set_result(detections)
+
+    @property
+    def average_batch(self):
+        return self.frames / self.batches if self.batches else 0.0
+
+
+class Table:
+    def __init__(self, table_id, game):
+        self.table_id = table_id
+        self.game = game
+        self.aggregator = SnapshotAggregator(min_evidence=SNAPSHOT_MIN_EVIDENCE, max_frames=SNAPSHOT_FRAMES)
+        self.taken_cards = []
+        self.frames = 0
+        self.latency_ms = RollingAverage()
+        self.latencies = []
+
+    def record_latency(self, milliseconds, keep=1000):
+        self.latency_ms.add(milliseconds)
+        self.latencies.append(milliseconds)
+        if len(self.latencies) > 2 * keep:
+            del self.latencies[:-keep]
+
+    def state(self):
+        return {
+            "table": self.table_id,
+            "game_mode": self.game.game_mode.value,
+            "round": self.game.get_round(),
+            "scores": [self.game.get_team_belotscore_history(0), self.game.get_team_belotscore_history(1)],
+            "taken_cards": [str(card) for card in self.taken_cards],
+        }
+
+
+class ScoringService:
+    def __init__(self, detector, batcher, journal_dir=None):
+        self.detector = detector
+        self.batcher = batcher
+        self.store = get_game_store(journal_dir) if journal_dir else None
+        self.tables = {}
+        self.started = time.perf_counter()
+        # Decoding releases the GIL, so a few threads keep JPEG decoding off the event loop
+        self._decoder = ThreadPoolExecutor(max_workers=4, thread_name_prefix="decode")
+
+    def table(self, table_id):
+        if table_id not in self.tables:
+            game = self.store.get(table_id) if self.store else Game()
+            self.tables[table_id] = Table(table_id, game)
+        return self.tables[table_id]
+
+    async def add_frame(self, table, body):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        frame = await loop.run_in_executor(self._decoder, cv2.imdecode, np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return 400, {"error": "Body is not a decodable image"}
+
+        detections = await self.batcher.submit(frame)
+        table.frames += 1
+        done = table.aggregator.add_frame(detections)
+        response = {
+            "detections": [
+                {"class_name": d.class_name, "confidence": round(d.confidence, 4), "box": [round(v, 1) for v in d.box]}
+                for d in detections
+            ],
+            "done": done,
+            "frames": table.aggregator.frames,
+            "cards": table.aggregator.cards(),
+        }
+        if done:
+            taken_cards = self.detector.cards_of_classes(table.aggregator.accepted_classes())
+            table.taken_cards = table.game.sort_cards(taken_cards)
+            table.aggregator = SnapshotAggregator(min_evidence=SNAPSHOT_MIN_EVIDENCE, max_frames=SNAPSHOT_FRAMES)
+        table.record_latency((time.perf_counter() - start) * 1000)
+        return 200, response
+
+    def score_round(self, table, options):
+        if not isinstance(options, dict):
+            return 400, {"error": "Body must be a JSON object"}
+        team_index = options.get("team_index", 0)
+        if team_index not in (0, 1):
+            return 400, {"error": f"team_index must be 0 or 1, got {team_index!r}"}
+        if "game_mode" in options:
+            table.game.change_gamemode(GameMode(options["game_mode"]))
+        table.game.add_current_round_points(
+            table.taken_cards,
+            team_index=int(team_index),
+            has_taken_last=bool(options.get("has_taken_last", False)),
+            bonuses_points=int(options.get("bonuses", 0)),
+            enemy_bonuses_points=int(options.get("enemy_bonuses", 0)),
+        )
+        table.taken_cards = []
+        return 200, table.state()
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        total_frames = sum(table.frames for table in self.tables.values())
+        tables = {}
+        for table_id, table in self.tables.items():
+            p50, p95 = np.percentile(table.latencies, [50, 95]) if table.latencies else (0.0, 0.0)
+            tables[table_id] = {"frames": table.frames, "latency_p50_ms": p50, "latency_p95_ms": p95}
+        return {
+            "tables": tables,
+            "frames": total_frames,
+            "throughput_fps": total_frames / elapsed if elapsed > 0 else 0.0,
+            "batches": self.batcher.batches,
+            "average_batch": self.batcher.average_batch,
+        }
+
+    async def route(self, method, path, body):
+        parts = [part for part in urlsplit(path).path.split("/") if part]
+        if method == "GET" and parts == ["stats"]:
+            return 200, self.stats()
+        if len(parts) < 2 or parts[0] != "tables":
+            return 404, {"error": f"Unknown path {path}"}
+
+        table = self.table(parts[1])
+        action = parts[2] if len(parts) > 2 else None
+        if method == "GET" and action is None:
+            return 200, table.state()
+        if method == "POST" and action == "frame":
+            return await self.add_frame(table, body)
+        if method == "POST" and action == "round":
+            return self.score_round(table, json.loads(body or b"{}"))
+        if method == "POST" and action == "revert":
+            table.game.revert_last_round()
+            return 200, table.state()
+        return 404, {"error": f"Unknown action {method} {path}"}
+
+    async def handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive, enough for local clients and the simulator."""
+        try:
+            while True:
+                try:
+                    head = await read_request_head(reader)
+                except (ValueError, asyncio.LimitOverrunError) as e:
+                    status, payload, close = 400, {"error": f"Bad request: {e}"}, True
+                else:
+                    if head is None:
+                        break
+                    method, path, headers, length = head
+                    close = headers.get("connection", "").lower() == "close"
+                    if length > MAX_BODY_BYTES:
+                        # The body is never read, the connection can't be reused after it
+                        status, payload, close = 413, {"error": "Body too large"}, True
+                    else:
+                        body = await reader.readexactly(length) if length else b""
+                        try:
+                            status, payload = await self.route(method, path, body)
+                        except (ValueError, KeyError) as e:
+                            status, payload = 400, {"error": str(e)}
+                        except Exception as e:
+                            # A failing detector or game update must not drop the connection without a response
+                            traceback.print_exc()
+                            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                data = json.dumps(payload, default=float).encode()
+                connection = "Connection: close\r\n" if close else ""
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n{connection}\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def read_request_head(reader):
+    """(method, path, headers, content length) of the next request, None at the end of the stream.
+
+    Raises ValueError for a malformed request line or Content-Length, and for a line over the reader's limit.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").split(" ", 2)
+    if len(parts) != 3:
+        raise ValueError(f"Malformed request line {request_line[:100]!r}")
+    method, path, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length < 0:
+        raise ValueError(f"Negative Content-Length {length}")
+    return method, path, headers, length
+
+
+def load_service_detector(args):
+    if args.backend == "onnx":
+        labels = load_labels(args.labels) if args.labels else None
+        return get_detector(args.model or ONNX_MODEL_PATH, labels, backend="onnx", intra_op_threads=args.threads)
+    return get_detector(args.model or MODEL_PATH, CLASS_NAMES)
+
+
+async def serve(args):
+    detector = load_service_detector(args)
+    batcher = MicroBatcher(detector.detect_batch, max_batch=args.max_batch, max_delay=args.max_delay_ms / 1000)
+    service = ScoringService(detector, batcher, args.journal_dir)
+    batcher.start()
+    server = await asyncio.start_server(service.handle_connection, args.host, args.port)
+    print(f"Scoring service listening on http://{args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def http_request(reader, writer, method, path, body=b"", content_type="application/json"):
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def load_encoded_frames(source, max_frames):
+    """JPEG-encode recorded frames once, so the simulator only measures the service."""
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    frames = []
+    while len(frames) < max_frames:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+    cap.release()
+    if not frames:
+        raise SystemExit(f"No frames could be read from {source!r}")
+    return frames
+
+
+async def simulate_table(args, table_id, frames, offset):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    latencies = []
+    interval = 1 / args.fps if args.fps > 0 else 0.0
+    # Spread the tables' first frames over one interval, like independent cameras
+    await asyncio.sleep(interval * offset)
+    next_frame_at = time.perf_counter()
+    for i in range(args.frames):
+        start = time.perf_counter()
+        status, response = await http_request(
+            reader, writer, "POST", f"/tables/{table_id}/frame", frames[i % len(frames)], "image/jpeg"
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        if status != 200:
+            print(f"{table_id}: {response}")
+        elif response["done"] and args.score_rounds:
+            await http_request(reader, writer, "POST", f"/tables/{table_id}/round", b'{"has_taken_last": true}')
+        if interval:
+            next_frame_at += interval
+            await asyncio.sleep(max(0.0, next_frame_at - time.perf_counter()))
+    writer.close()
+    return latencies
+
+
+async def simulate(args):
+    frames = load_encoded_frames(args.source, args.max_frames)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(simulate_table(args, f"sim{i}", frames, i / args.tables) for i in range(args.tables))
+    )
+    elapsed = time.perf_counter() - start
+
+    for i, latencies in enumerate(results):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"sim{i}: {len(latencies)} frames, p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms")
+    all_latencies = np.concatenate(results)
+    print(
+        f"{args.tables} tables: {len(all_latencies) / elapsed:.1f} frames/s, "
+        f"p50 {np.percentile(all_latencies, 50):.1f} ms, p95 {np.percentile(all_latencies, 95):.1f} ms"
+    )
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, stats = await http_request(reader, writer, "GET", "/stats")
+    writer.close()
+    print(f"Service: {stats['batches']} batches, {stats['average_batch']:.2f} frames per batch on average")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-table scoring service with cross-table batching.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the service.")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--backend", choices=["ultralytics", "onnx"], default="ultralytics")
+    serve_parser.add_argument("--model", help="Model file (default: MODEL_PATH or ONNX_MODEL_PATH from constants).")
+    serve_parser.add_argument("--labels", default=ONNX_LABELS_PATH, help="Label file of the ONNX model.")
+    serve_parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads, 0 = default.")
+    serve_parser.add_argument("--max-batch", type=int, default=16)
+    serve_parser.add_argument("--max-delay-ms", type=float, default=5.0, help="How long a batch waits for more frames.")
+    serve_parser.add_argument("--journal-dir", help="Journal games here so they survive restarts.")
+    serve_parser.set_defaults(func=serve)
+
+    simulate_parser = subparsers.add_parser("simulate", help="Send recorded frames from many simulated tables.")
+    simulate_parser.add_argument("--host", default="127.0.0.1")
+    simulate_parser.add_argument("--port", type=int, default=8765)
+    simulate_parser.add_argument("--source", required=True, help="Recorded video, image pattern or camera index.")
+    simulate_parser.add_argument("--tables", type=int, default=8)
+    simulate_parser.add_argument("--frames", type=int, default=50, help="Frames sent per table.")
+    simulate_parser.add_argument("--fps", type=float, default=5.0, help="Frames per second per table, 0 = no pause.")
+    simulate_parser.add_argument("--max-frames", type=int, default=100, help="Frames loaded from the source.")
+    simulate_parser.add_argument("--score-rounds", action="store_true", help="Score a round after every snapshot.")
+    simulate_parser.set_defaults(func=simulate)
+
+    args = parser.parse_args()
+    asyncio.run(args.func(args))
@@ -0,0 +1,645 @@
+"""
+Double-dummy solver for Belot trick play: with all four hands known, the points each team takes with best play.
+
+Players 0-3 sit in playing order, 0 and 2 are team 0, 1 and 3 team 1. Card points and trick order come from
+the game_logic tables of the game mode, the last trick is worth Game.last_take_points (10).
+Declarations are not included, they don't depend on the play.
+
+Trick rules:
+- Follow the led suit if possible. When the led suit is trump (every suit in all trumps),
+  play a card higher than the best one in the trick if possible.
+- In a trump suit game, a player who can't follow must trump unless the partner is winning the trick,
+  and must overtrump a trump already in the trick if possible; without a higher trump any card may be played.
+- In no trumps (and all trumps) a player who can't follow may play any card.
+
+The search is alpha-beta over single cards, compiled with numba (on first use, then cached on disk). A
+transposition table at trick boundaries is keyed on a hash of the four hand masks and the leader and stores a lower
+and an upper bound of the value. Cards of a suit with the same points and no card of another hand between them are
+equivalent and only the strongest is searched; the distinct cards per suit come from precomputed tables. A trick
+start is cut off by the points still to play and by the points the leader's team takes for sure by cashing the
+leader's top cards. Leads cash the cards no other hand can beat first, then give up the lead with the weakest card;
+follows take or save points first. solve() bisects the score range with null-window searches that share the table.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+from numba import njit
+
+from utils.game_logic import (
+    CARD_ORDER,
+    CARD_POINTS,
+    DECK_POINTS,
+    SUIT_SUBSET_POINTS,
+    SUITS,
+    TRUMP_SUIT_INDEX,
+    VALUES,
+    Card,
+    CardSet,
+    GameMode,
+)
+
+SUIT_BITS = [((1 << len(VALUES)) - 1) << (suit_index * len(VALUES)) for suit_index in range(len(SUITS))]
+# Fields of the rules array passed to the compiled search
+TRUMP_SUIT, TRUMP_BITS, RAISED_SUITS, LAST_TAKE_POINTS = range(4)
+# Fields of a ply on the search stack, and the steps of the search loop
+LEADER, SEAT, WINNER, ALPHA, BETA, ALPHA_START, BETA_START, BEST = range(8)
+BEST_MOVE, COUNT, INDEX, HAND, GAINED, SLOT, LOW, HIGH = range(8, 16)
+ENTER, NEXT, RETURN = range(3)
+STACK_PLIES = 40
+# Card id of a single-card mask, looked up by a de Bruijn multiplication
+_DE_BRUIJN = 0x077CB531
+_BIT_INDEX = np.zeros(32, dtype=np.int64)
+for _index in range(32):
+    _BIT_INDEX[((1 << _index) * _DE_BRUIJN & 0xFFFFFFFF) >> 27] = _index
+
+
+class SolveResult(NamedTuple):
+    team_points: tuple
+    nodes: int
+    seconds: float
+
+
+def _mask(cards):
+    if isinstance(cards, int):
+        return cards
+    return cards.mask if isinstance(cards, CardSet) else CardSet(cards).mask
+
+
+def _suit_pairs():
+    """Every pair of disjoint 8-bit subsets of a suit."""
+    pairs = []
+    for first in range(1 << len(VALUES)):
+        free = ~first & (1 << len(VALUES)) - 1
+        second = free
+        while True:
+            pairs.append((first, second))
+            if not second:
+                break
+            second = (second - 1) & free
+    return pairs
+
+
+@lru_cache(maxsize=None)
+def _suit_moves(suit_bits, suit_points):
+    """Distinct moves of one suit as bits, indexed by the legal cards' bits << 8 | the blocking cards' bits.
+
+    suit_bits are the bits of the suit's cards strongest first, suit_points their points. A legal card is left out
+    when the previous listed one has the same points and only own or played cards rank between them: both lead
+    to the same result. Blocking cards are the ones other players hold or played to the current trick.
+    """
+    table = np.zeros(1 << 2 * len(VALUES), dtype=np.int64)
+    for legal, blocking in _suit_pairs():
+        moves = 0
+        previous_points = None
+        blocked = False
+        for bit, points in zip(suit_bits, suit_points):
+            if blocking & bit:
+                blocked = True
+            elif legal & bit:
+                if previous_points == points and not blocked:
+                    continue
+                moves |= bit
+                previous_points, blocked = points, False
+        table[legal << len(VALUES) | blocking] = moves
+    return table
+
+
+@lru_cache(maxsize=None)
+def _run_lengths(suit_bits):
+    """Number of a player's top cards of one suit, indexed by the player's bits << 8 | the other cards' bits.
+
+    The run ends with the first card someone else holds.
+    """
+    table = np.zeros(1 << 2 * len(VALUES), dtype=np.int64)
+    for own, others in _suit_pairs():
+        length = 0
+        for bit in suit_bits:
+            if others & bit:
+                break
+            if own & bit:
+                length += 1
+        table[own << len(VALUES) | others] = length
+    return table
+
+
+@lru_cache(maxsize=None)
+def _played_points(bit_points, dearest):
+    """Points of the cheapest (or dearest) cards a player gives to rounds of one suit, indexed by the player's bits.
+
+    bit_points are the points of the suit's cards in bit order. Entry i is the total of i rounds; once the player
+    is out of the suit, nothing more is counted.
+    """
+    table = np.zeros((1 << len(VALUES), len(VALUES) + 1), dtype=np.int64)
+    for bits in range(1 << len(VALUES)):
+        held = sorted((points for bit, points in enumerate(bit_points) if bits >> bit & 1), reverse=dearest)
+        for rounds, points in enumerate(held, start=1):
+            table[bits, rounds] = table[bits, rounds - 1] + points
+        table[bits, len(held) + 1 :] = table[bits, len(held)]
+    return table
+
+
+@njit(cache=True)
+def _popcount(bits):
+    bits = bits - (bits >> 1 & 0x55555555)
+    bits = (bits & 0x33333333) + (bits >> 2 & 0x33333333)
+    return ((bits + (bits >> 4) & 0x0F0F0F0F) * 0x01010101 & 0xFFFFFFFF) >> 24
+
+
+@njit(cache=True)
+def _card_of(bit):
+    return _BIT_INDEX[(bit * _DE_BRUIJN & 0xFFFFFFFF) >> 27]
+
+
+@njit(cache=True)
+def _legal_bits(hand, seat, led_card, winning_card, winner, stronger, rules):
+    """Legal cards of a hand mask, seat cards are already in the trick."""
+    led_suit = led_card >> 3
+    follow = hand & 0xFF << 8 * led_suit
+    if follow:
+        if rules[RAISED_SUITS] >> led_suit & 1 and winning_card >> 3 == led_suit:
+            higher = follow & stronger[winning_card]
+            return higher if higher else follow
+        return follow
+    trumps = hand & rules[TRUMP_BITS]
+    # The partner played two cards before the current player
+    if not trumps or seat >= 2 and winner == seat - 2:
+        return hand
+    if winning_card >> 3 == rules[TRUMP_SUIT]:
+        higher = trumps & stronger[winning_card]
+        return higher if higher else hand
+    return trumps
+
+
+@njit(cache=True)
+def _remaining_points(left, subset_points, rules):
+    return (
+        subset_points[0, left & 0xFF]
+        + subset_points[1, left >> 8 & 0xFF]
+        + subset_points[2, left >> 16 & 0xFF]
+        + subset_points[3, left >> 24 & 0xFF]
+        + rules[LAST_TAKE_POINTS]
+    )
+
+
+@njit(cache=True)
+def _sure_points(hands, leader, left, remaining, run_lengths, cheapest, dearest, rules):
+    """Points the leader's team takes for sure by cashing the leader's top cards of suits that can't be trumped."""
+    lead_hand = hands[leader]
+    partner = hands[(leader + 2) & 3]
+    opponent_1 = hands[(leader + 1) & 3]
+    opponent_3 = hands[(leader + 3) & 3]
+    others = left ^ lead_hand
+    # Opponents who can trump a suit once they are out of it
+    trumping_1 = opponent_1 & rules[TRUMP_BITS] != 0
+    trumping_3 = opponent_3 & rules[TRUMP_BITS] != 0
+    sure = 0
+    cashed = 0
+    for suit_index in range(4):
+        shift = 8 * suit_index
+        own = lead_hand >> shift & 0xFF
+        if own:
+            rounds = run_lengths[suit_index, own << 8 | others >> shift & 0xFF]
+            if suit_index != rules[TRUMP_SUIT]:
+                if trumping_1:
+                    rounds = min(rounds, _popcount(opponent_1 >> shift & 0xFF))
+                if trumping_3:
+                    rounds = min(rounds, _popcount(opponent_3 >> shift & 0xFF))
+            if rounds:
+                # The top cards of a suit are also its dearest. The others follow suit while they can,
+                # the partner with its dearest cards.
+                sure += (
+                    dearest[suit_index, own, rounds]
+                    + dearest[suit_index, partner >> shift & 0xFF, rounds]
+                    + cheapest[suit_index, opponent_1 >> shift & 0xFF, rounds]
+                    + cheapest[suit_index, opponent_3 >> shift & 0xFF, rounds]
+                )
+                cashed += rounds
+    if cashed == _popcount(lead_hand):
+        # Every trick, the last one included
+        return remaining
+    return sure
+
+
+@njit(cache=True)
+def _last_trick(hands, leader, points, beats, rules):
+    """The final trick is forced: every player holds one card."""
+    best = _card_of(hands[leader])
+    taker = leader
+    total = points[best] + rules[LAST_TAKE_POINTS]
+    for offset in range(1, 4):
+        player = (leader + offset) & 3
+        card = _card_of(hands[player])
+        total += points[card]
+        if beats[card, best]:
+            best, taker = card, player
+    return total if taker & 1 == 0 else 0
+
+
+@njit(cache=True)
+def _hash(low, high, leader):
+    """Hash of a position: hands 0 and 1 (low), hands 2 and 3 (high) and the leader."""
+    # Each bit of a product only depends on the lower bits of its factors, the shifts mix in the upper ones
+    mixed = (low ^ high * 0x5851F42D4C957F2D ^ leader) * 0x2545F4914F6CDD1D
+    mixed = (mixed ^ mixed >> 32) * 0x1CE4E5B9BF58476D
+    return mixed ^ mixed >> 29
+
+
+@njit(cache=True)
+def _slot(keys, entries, low, high, leader):
+    """Table slot holding a position, or of the bucket's two slots the one to replace."""
+    index = _hash(low, high, leader) & (len(entries) - 2)
+    replace = index
+    for slot in range(index, index + 2):
+        entry = entries[slot]
+        if not entry:
+            replace = slot
+        elif keys[slot, 0] == low and keys[slot, 1] == high and entry >> 26 & 3 == leader:
+            return slot
+        elif entries[replace] and entry >> 28 & 15 < entries[replace] >> 28 & 15:
+            # Positions with fewer cards are cheaper to search again
+            replace = slot
+    return replace
+
+
+@njit(cache=True)
+def _sort_moves(moves, order, count):
+    for i in range(1, count):
+        move, key = moves[i], order[i]
+        j = i - 1
+        while j >= 0 and order[j] > key:
+            moves[j + 1], order[j + 1] = moves[j], order[j]
+            j -= 1
+        moves[j + 1], order[j + 1] = move, key
+
+
+@njit(cache=True)
+def _search(hands, leader, seat, trick, winner, alpha, beta, tables, state):
+    """Points team 0 takes from the start of the current trick on, seat cards (trick) are already played to it.
+
+    winner is the seat of the card winning the trick so far. Fail-soft: a value <= alpha is an upper bound,
+    a value >= beta a lower bound. The search runs on an explicit stack with one card per ply.
+    """
+    points, rank, stronger, beats, suit_moves, run_lengths, cheapest, dearest, subset_points, rules = tables
+    keys, entries, stack, moves, order, played, nodes = state
+    # The plies before the root hold the cards already in the trick
+    root = 3
+    for i in range(seat):
+        played[root - seat + i] = trick[i]
+    ply = root
+    stack[ply, LEADER], stack[ply, SEAT], stack[ply, WINNER] = leader, seat, winner
+    stack[ply, ALPHA], stack[ply, BETA] = alpha, beta
+    value = 0
+    step = ENTER
+    while True:
+        if step == ENTER:
+            nodes[0] += 1
+            leader, seat, winner = stack[ply, LEADER], stack[ply, SEAT], stack[ply, WINNER]
+            alpha, beta = stack[ply, ALPHA], stack[ply, BETA]
+            left = hands[0] | hands[1] | hands[2] | hands[3]
+            player = (leader + seat) & 3
+            hand = hands[player]
+            count = 0
+            step = RETURN
+            if seat == 0:
+                if not hand & (hand - 1):
+                    value = _last_trick(hands, leader, points, beats, rules) if hand else 0
+                    continue
+                if beta <= 0:
+                    value = 0
+                    continue
+                # Team 0 can't take more than what is left, which cuts most null-window searches short
+                value = _remaining_points(left, subset_points, rules)
+                if value <= alpha:
+                    continue
+                # Nor less than what the leader's team cashes, or more than what is left after the opponents cash
+                sure = _sure_points(hands, leader, left, value, run_lengths, cheapest, dearest, rules)
+                if player & 1:
+                    value -= sure
+                    if value <= alpha:
+                        continue
+                elif sure >= beta:
+                    value = sure
+                    continue
+
+                low = hands[0] | hands[1] << 32
+                high = hands[2] | hands[3] << 32
+                slot = _slot(keys, entries, low, high, leader)
+                entry = entries[slot]
+                best_first = -1
+                if entry and keys[slot, 0] == low and keys[slot, 1] == high and entry >> 26 & 3 == leader:
+                    value = entry & 0x3FF
+                    if value >= beta:
+                        continue
+                    value = entry >> 10 & 0x3FF
+                    if value <= alpha:
+                        continue
+                    best_first = (entry >> 20 & 63) - 1
+                stack[ply, SLOT], stack[ply, LOW], stack[ply, HIGH] = slot, low, high
+
+                blocking = left ^ hand
+                for suit_index in range(4):
+                    shift = 8 * suit_index
+                    bits = hand >> shift & 0xFF
+                    if bits:
+                        distinct = suit_moves[suit_index, bits << 8 | blocking >> shift & 0xFF] << shift
+                        while distinct:
+                            card = _card_of(distinct & -distinct)
+                            distinct &= distinct - 1
+                            moves[ply, count] = card
+                            # The table's best move, then winners strongest first, then the rest weakest first
+                            if card == best_first:
+                                order[ply, count] = -(1 << 40)
+                            elif stronger[card] & blocking:
+                                order[ply, count] = -rank[card]
+                            else:
+                                order[ply, count] = rank[card] - (1 << 30)
+                            count += 1
+            else:
+                winning_card = played[ply - seat + winner]
+                legal = _legal_bits(hand, seat, played[ply - seat], winning_card, winner, stronger, rules)
+                # Cards held by the other players or lying in the trick tell apart otherwise equivalent cards
+                blocking = left ^ hand
+                for i in range(ply - seat, ply):
+                    blocking |= 1 << played[i]
+                partner_winning = seat >= 2 and winner == seat - 2
+                for suit_index in range(4):
+                    shift = 8 * suit_index
+                    bits = legal >> shift & 0xFF
+                    if bits:
+                        distinct = suit_moves[suit_index, bits << 8 | blocking >> shift & 0xFF] << shift
+                        while distinct:
+                            card = _card_of(distinct & -distinct)
+                            distinct &= distinct - 1
+                            moves[ply, count] = card
+                            # Give points to a winning partner, else try taking the trick first, discard cheap
+                            # cards. Strongest first among equals.
+                            if partner_winning:
+                                order[ply, count] = -points[card] << 5 | rank[card]
+                            elif beats[card, winning_card]:
+                                order[ply, count] = -points[card] - 1000 << 5 | rank[card]
+                            else:
+                                order[ply, count] = points[card] << 5 | rank[card]
+                            count += 1
+
+            _sort_moves(moves[ply], order[ply], count)
+            stack[ply, HAND], stack[ply, COUNT], stack[ply, INDEX] = hand, count, 0
+            stack[ply, BEST] = -1 if player & 1 == 0 else 1 << 20
+            stack[ply, BEST_MOVE] = -1
+            stack[ply, ALPHA_START], stack[ply, BETA_START] = alpha, beta
+            step = NEXT
+
+        elif step == RETURN:
+            # value belongs to the node at ply, the parent takes it
+            if ply == root:
+                return value
+            ply -= 1
+            value += stack[ply, GAINED]
+            player = (stack[ply, LEADER] + stack[ply, SEAT]) & 3
+            card = played[ply]
+            if player & 1 == 0:
+                if value > stack[ply, BEST]:
+                    stack[ply, BEST], stack[ply, BEST_MOVE] = value, card
+                    stack[ply, ALPHA] = max(stack[ply, ALPHA], value)
+            elif value < stack[ply, BEST]:
+                stack[ply, BEST], stack[ply, BEST_MOVE] = value, card
+                stack[ply, BETA] = min(stack[ply, BETA], value)
+            if stack[ply, ALPHA] >= stack[ply, BETA]:
+                stack[ply, INDEX] = stack[ply, COUNT]
+            step = NEXT
+
+        else:
+            # Play the next move of the node at ply, or finish it
+            leader, seat, winner = stack[ply, LEADER], stack[ply, SEAT], stack[ply, WINNER]
+            player = (leader + seat) & 3
+            hand = stack[ply, HAND]
+            index = stack[ply, INDEX]
+            if index == stack[ply, COUNT]:
+                hands[player] = hand
+                value = stack[ply, BEST]
+                if seat == 0:
+                    slot, low, high = stack[ply, SLOT], stack[ply, LOW], stack[ply, HIGH]
+                    entry = entries[slot]
+                    # Keep the other bound from an earlier search of the position
+                    if entry and keys[slot, 0] == low and keys[slot, 1] == high and entry >> 26 & 3 == leader:
+                        lower, upper = entry & 0x3FF, entry >> 10 & 0x3FF
+                    else:
+                        lower, upper = 0, 0x3FF
+                    if value <= stack[ply, ALPHA_START]:
+                        upper = min(upper, value)
+                    elif value >= stack[ply, BETA_START]:
+                        lower = max(lower, value)
+                    else:
+                        lower = upper = value
+                    # Bits of an entry: lower and upper bound (10 each), best move + 1 (6), leader (2), the leader's
+                    # number of cards (4) and a used flag
+                    keys[slot, 0], keys[slot, 1] = low, high
+                    entries[slot] = (
+                        lower | upper << 10 | (stack[ply, BEST_MOVE] + 1) << 20 | leader << 26
+                        | _popcount(hand) << 28 | 1 << 32
+                    )
+                step = RETURN
+                continue
+
+            card = moves[ply, index]
+            stack[ply, INDEX] = index + 1
+            played[ply] = card
+            hands[player] = hand ^ 1 << card
+            winning_card = played[ply - seat + winner]
+            takes = beats[card, winning_card]
+            child = ply + 1
+            if seat == 3:
+                taker = player if takes else (leader + winner) & 3
+                gained = 0
+                if taker & 1 == 0:
+                    gained = points[played[ply - 3]] + points[played[ply - 2]] + points[played[ply - 1]] + points[card]
+                    if not hands[0] | hands[1] | hands[2] | hands[3]:
+                        gained += rules[LAST_TAKE_POINTS]
+                stack[ply, GAINED] = gained
+                stack[child, LEADER], stack[child, SEAT], stack[child, WINNER] = taker, 0, 0
+                stack[child, ALPHA] = stack[ply, ALPHA] - gained
+                stack[child, BETA] = stack[ply, BETA] - gained
+            else:
+                stack[ply, GAINED] = 0
+                stack[child, LEADER], stack[child, SEAT] = leader, seat + 1
+                stack[child, WINNER] = seat if takes else winner
+                stack[child, ALPHA], stack[child, BETA] = stack[ply, ALPHA], stack[ply, BETA]
+            ply = child
+            step = ENTER
+
+
+class BelotSolver:
+    def __init__(self, game_mode, last_take_points=10, table_bits=20):
+        """table_bits sets the transposition table size: 2 ** table_bits positions, 24 bytes each."""
+        self.game_mode = game_mode
+        self.last_take_points = last_take_points
+        self.points = CARD_POINTS[game_mode]
+        self.order = CARD_ORDER[game_mode]
+        self.total_points = DECK_POINTS[game_mode] + last_take_points
+        self.trump_suit = TRUMP_SUIT_INDEX[game_mode]
+        self.all_trumps = game_mode == GameMode.ALL_TRUMPS
+
+        cards = range(len(SUITS) * len(VALUES))
+        self._ordered = sorted(cards, key=lambda card: (self.order[card], card >> 3))
+        # beats[a][b]: card a takes the trick from the currently winning card b
+        self._beats = [[self._card_beats(a, b) for b in cards] for a in cards]
+        # Cards of the same suit ranked above a card
+        self._stronger = [
+            sum(1 << other for other in range(card & ~7, (card | 7) + 1) if self.order[other] < self.order[card])
+            for card in cards
+        ]
+        # Led suits that must be raised: the trump suit, every suit in all trumps
+        self._raised = [self.all_trumps or suit_index == self.trump_suit for suit_index in range(len(SUITS))]
+        self._trump_bits = SUIT_BITS[self.trump_suit] if self.trump_suit is not None else 0
+        self._tables = self._compiled_tables()
+        # Transposition table, ply stack, move buffers, played cards and node counter
+        self._state = (
+            np.zeros((1 << table_bits, 2), dtype=np.int64),
+            np.zeros(1 << table_bits, dtype=np.int64),
+            np.zeros((STACK_PLIES, 16), dtype=np.int64),
+            np.zeros((STACK_PLIES, len(VALUES)), dtype=np.int64),
+            np.zeros((STACK_PLIES, len(VALUES)), dtype=np.int64),
+            np.zeros(STACK_PLIES, dtype=np.int64),
+            np.zeros(1, dtype=np.int64),
+        )
+
+    def _compiled_tables(self):
+        suit_bits, suit_points, bit_points = [], [], []
+        for suit_index in range(len(SUITS)):
+            base = suit_index * len(VALUES)
+            # Cards of the suit strongest first
+            strongest = sorted(range(base, base + len(VALUES)), key=self.order.__getitem__)
+            suit_bits.append(tuple(1 << (card - base) for card in strongest))
+            suit_points.append(tuple(self.points[card] for card in strongest))
+            bit_points.append(tuple(self.points[base : base + len(VALUES)]))
+        rules = np.array(
+            [
+                -1 if self.trump_suit is None else self.trump_suit,
+                self._trump_bits,
+                sum(1 << suit_index for suit_index, raised in enumerate(self._raised) if raised),
+                self.last_take_points,
+            ],
+            dtype=np.int64,
+        )
+        return (
+            np.array(self.points, dtype=np.int64),
+            np.array([self._ordered.index(card) for card in range(len(self.points))], dtype=np.int64),
+            np.array(self._stronger, dtype=np.int64),
+            np.array(self._beats, dtype=np.int64),
+            np.stack([_suit_moves(bits, points) for bits, points in zip(suit_bits, suit_points)]),
+            np.stack([_run_lengths(bits) for bits in suit_bits]),
+            np.stack([_played_points(points, False) for points in bit_points]),
+            np.stack([_played_points(points, True) for points in bit_points]),
+            np.array(SUIT_SUBSET_POINTS[self.game_mode], dtype=np.int64),
+            rules,
+        )
+
+    def _card_beats(self, card, winning_card):
+        if card >> 3 == winning_card >> 3:
+            return self.order[card] < self.order[winning_card]
+        return self.trump_suit is not None and card >> 3 == self.trump_suit
+
+    def _winner(self, trick):
+        """Index in the trick of the card that currently wins it."""
+        best = 0
+        for i in range(1, len(trick)):
+            if self._beats[trick[i]][trick[best]]:
+                best = i
+        return best
+
+    def _legal_mask(self, hand, trick, winner):
+        if not trick:
+            return hand
+        led_suit = trick[0] >> 3
+        winning_card = trick[winner]
+        follow = hand & SUIT_BITS[led_suit]
+        if follow:
+            if self._raised[led_suit] and winning_card >> 3 == led_suit:
+                return follow & self._stronger[winning_card] or follow
+            return follow
+        trumps = hand & self._trump_bits
+        # The partner played two cards before the current player
+        if not trumps or len(trick) >= 2 and winner == len(trick) - 2:
+            return hand
+        if winning_card >> 3 == self.trump_suit:
+            return trumps & self._stronger[winning_card] or hand
+        return trumps
+
+    def legal_moves(self, hand, trick, winner=None):
+        """Legal cards (ids) for a hand mask given the cards of the trick so far, strongest first."""
+        if winner is None and trick:
+            winner = self._winner(trick)
+        legal = self._legal_mask(hand, trick, winner)
+        return [card for card in self._ordered if legal >> card & 1]
+
+    def _search(self, hands, leader, trick, winner, alpha, beta):
+        """Points team 0 takes from the start of the current trick on, see the compiled _search."""
+        cards = np.zeros(3, dtype=np.int64)
+        cards[: len(trick)] = trick
+        return int(_search(hands, leader, len(trick), cards, winner, alpha, beta, self._tables, self._state))
+
+    def _solve_exact(self, hands, leader):
+        """Bisect the score range with null-window searches, which cut off far more than one full-window search.
+        The transposition table carries the bounds from one search to the next."""
+        lower, upper = 0, self.total_points
+        while lower < upper:
+            beta = (lower + upper + 1) // 2
+            value = self._search(hands, leader, (), 0, beta - 1, beta)
+            if value < beta:
+                upper = value
+            else:
+                lower = value
+        return lower
+
+    def solve(self, hands, leader=0):
+        """Best-play points of both teams for four hands (Card lists, CardSets or masks), leader plays first."""
+        start = time.perf_counter()
+        nodes = self._state[-1]
+        nodes[0] = 0
+        masks = np.array([_mask(hand) for hand in hands], dtype=np.int64)
+        team_0 = self._solve_exact(masks, leader)
+        return SolveResult((team_0, self.total_points - team_0), int(nodes[0]), time.perf_counter() - start)
+
+    def evaluate_moves(self, hands, leader=0, trick=()):
+        """Team 0 points after each legal card of the player to move, e.g. to find mistakes in a played deal.
+
+        hands are the cards still held, trick the card ids already played to the current trick.
+        Returns {card: team 0 points from the start of the current trick on}.
+        """
+        masks = np.array([_mask(hand) for hand in hands], dtype=np.int64)
+        trick = list(trick)
+        player = (leader + len(trick)) % 4
+        values = {}
+        for card in self.legal_moves(int(masks[player]), trick):
+            masks[player] ^= 1 << card
+            trick.append(card)
+            if len(trick) == 4:
+                taker = (leader + self._winner(trick)) % 4
+                points = sum(self.points[played] for played in trick)
+                if not masks.any():
+                    points += self.last_take_points
+                gained = points if taker % 2 == 0 else 0
+                value = gained + self._search(masks, taker, (), 0, -1, self.total_points + 1)
+            else:
+                value = self._search(masks, leader, trick, self._winner(trick), -1, self.total_points + 1)
+            trick.pop()
+            masks[player] ^= 1 << card
+            values[Card.from_id(card)] = value
+        return values
+
+
+def _solve_deal(arguments):
+    game_mode, hands, leader = arguments
+    return BelotSolver(game_mode).solve(hands, leader).team_points
+
+
+def solve_deals(deals, game_mode, leader=0, workers=None, chunksize=4):
+    """Solve many deals (each four hand masks or card lists) in parallel; returns the team points of each."""
+    arguments = [(game_mode, [_mask(hand) for hand in hands], leader) for hands in deals]
+    # Compile the search (or load it from the cache) once here, forked workers inherit it
+    BelotSolver(game_mode, table_bits=4).solve([0, 0, 0, 0])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_solve_deal, arguments, chunksize=chunksize))
@@ -1,56 +1,194 @@
+import threading
 import time
 from collections import Counter
-from ultralytics import YOLO
-from utils.game_logic import Card, Suit, Value, Game, GameMode
+import numpy as np
+from utils.inference_backends import create_backend
+from utils.roi import detect_in_rois, motion_rois, motion_thumbnail, outside_regions
+from utils.snapshot_aggregator import SnapshotAggregator
+from utils.tracker import CardTracker, DetectionScheduler
+from utils.game_logic import Card, CardSet, Suit, Value, Game, GameMode
 
 
 class CardGameDetector:
-    def __init__(self, model_path, class_names):
-        self.model = YOLO(model_path, verbose=False)
-        self.class_names = class_names
+    def __init__(self, model_path, class_names, backend="ultralytics", **backend_options):
+        self.backend = create_backend(backend, model_path, class_names, **backend_options)
+        self.backend_name = backend
+        self.class_names = self.backend.class_names
+        # Card of every class index, None for classes of other cards (2-6); a Belot model has no such classes
+        self.class_cards = [self.parse_card(class_name) for class_name in self.class_names]
+        self._cards_by_name = dict(zip(self.class_names, self.class_cards))
+        # Class indices of every Belot card
+        self.card_classes = {}
+        for index, card in enumerate(self.class_cards):
+            if card is not None:
+                self.card_classes.setdefault(card.id, []).append(index)
+        # Backends keep per-call state (predictor, input buffers), so sessions sharing one detector take turns.
+        self._inference_lock = threading.Lock()
+
+    @property
+    def imgsz(self):
+        return self.backend.imgsz
+
+    def _predict(self, frames, classes=None):
+        with self._inference_lock:
+            return self.backend.predict(frames, classes)
+
+    def classes_for_cards(self, cards):
+        """Class indices of the given cards, e.g. PlayedCards.remaining, to limit detection to cards still possible.
+
+        Every other class, like the 2-6 cards the model also knows, is then never detected. Returns None when that
+        is every class of the model, e.g. the full deck with a 32 class Belot model, so no classes are filtered.
+        """
+        card_set = cards if isinstance(cards, CardSet) else CardSet(cards)
+        classes = sorted(index for card in card_set for index in self.card_classes.get(card.id, ()))
+        return None if len(classes) == len(self.class_names) else classes
+
+    def warmup(self):
+        """Run one dummy inference so the first real frame doesn't pay for graph setup."""
+        self._predict([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+    def detect_batch(self, frames, classes=None):
+        """Run a single batched forward pass and return the detections of every frame.
+
+        classes limits the detections to these class indices (see classes_for_cards), None detects all classes.
+        The onnx backend picks the best of the allowed classes for every box, so an excluded class never wins a box.
+        The ultralytics backend filters only after picking the best class of every box: a box whose best class is
+        excluded is dropped, even if an allowed class scores above the threshold too.
+        """
+        if len(frames) == 0:
+            return []
+        return self._predict(list(frames), classes)
+
+    def detect(self, frame, classes=None):
+        return self.detect_batch([frame], classes)[0]
+
+    def detect_rois(self, frames, rois, classes=None):
+        """Detect only inside the given (x1, y1, x2, y2) regions of every frame, all crops in one forward pass."""
+        if len(frames) == 0:
+            return []
+        return detect_in_rois(lambda crops: self._predict(crops, classes), frames, [rois] * len(frames))
+
+    def create_scheduler(self, detect_every=5, motion_threshold=6.0, played=None):
+        """Per-camera scheduler that runs this detector only every few frames or on scene changes.
+
+        With a PlayedCards (Game.track_round) fed as the round goes on, every detection is limited to the cards
+        that can still be on the table, so played cards are never detected again.
+        """
+        detect = self.detect
+        if played is not None:
+            def detect(frame):
+                return self.detect(frame, self.classes_for_cards(played.visible))
+        return DetectionScheduler(detect, CardTracker(), detect_every, motion_threshold)
+
+    def grab_frames(self, cap, num_frames=10, frame_spacing=0.0):
+        """Read up to num_frames frames into one preallocated (N, H, W, 3) uint8 batch."""
+        ret, first = cap.read()
+        if not ret:
+            return np.empty((0, 0, 0, 3), dtype=np.uint8)
+
+        batch = np.empty((num_frames,) + first.shape, dtype=first.dtype)
+        batch[0] = first
+        count = 1
+        while count < num_frames:
+            if frame_spacing > 0:
+                time.sleep(frame_spacing)
+            # Decode straight into the batch slot instead of allocating a new frame per read.
+            ret, frame = cap.read(batch[count])
+            if not ret or frame.shape != first.shape:
+                break
+            if not np.shares_memory(frame, batch[count]):
+                batch[count] = frame
+            count += 1
+        return batch[:count]
+
+    def snapshot(self, cap, num_frames=10, frame_spacing=0.0):
+        """Grab a burst of frames and detect cards in all of them with one batched inference.
+
+        Returns the frame batch and a list with the detections of each frame.
+        """
+        frames = self.grab_frames(cap, num_frames, frame_spacing)
+        return frames, self.detect_batch(frames)
+
+    def capture_snapshot(
+        self,
+        cap,
+        aggregator=None,
+        batch_size=2,
+        frame_spacing=0.0,
+        rois=None,
+        reference=None,
+        classes=None,
+        reference_detections=None,
+    ):
+        """Stream small batches of frames into an aggregator until the detected card set is stable.
+
+        rois limits detection to fixed regions of the frame. With a reference frame and its detections, e.g. the last
+        frame and detections of the previous snapshot, only the regions that changed since then are detected and the
+        reference detections outside them are kept. Without reference detections, or when nothing or most of the
+        frame changed, the whole frame (or all rois) is detected. classes limits the detected classes like in
+        detect_batch.
+        Returns the accepted class names, the number of frames used, the last frame read and its detections.
+        """
+        aggregator = aggregator or SnapshotAggregator()
+        regions = rois or None
+        kept = []
+        last_frame, last_detections = None, []
+        while not aggregator.done:
+            remaining = aggregator.max_frames - aggregator.frames
+            frames = self.grab_frames(cap, min(batch_size, remaining), frame_spacing)
+            if len(frames) == 0:
+                break
+            if last_frame is None and reference is not None and reference_detections is not None:
+                changed = motion_rois(motion_thumbnail(reference), frames[0], rois)
+                # An empty change still gets detected in full, a snapshot always looks at the table at least once
+                if changed:
+                    regions = changed
+                    kept = outside_regions(reference_detections, changed)
+            last_frame = frames[-1]
+            if regions is None:
+                batch_detections = self.detect_batch(frames, classes)
+            else:
+                batch_detections = self.detect_rois(frames, regions, classes)
+            for detections in batch_detections:
+                last_detections = kept + detections
+                if aggregator.add_frame(last_detections):
+                    break
+        return aggregator.cards(), aggregator.frames, last_frame, last_detections
 
     def aggregate_detections(self, detections):
+        # Accept both a flat list of class names and one list per frame
+        if detections and isinstance(detections[0], list):
+            detections = [class_name for frame in detections for class_name in frame]
         counts = Counter(detections)
-        print(counts)
         return [key for key, count in counts.items() if count >= 3]
 
     def capture_and_process_frames(self, cap, num_frames=10, interval=0.2):
-        all_detections = []
-        for _ in range(num_frames):
-            ret, frame = cap.read()
-            if ret:
-                results = self.model(frame)
-                frame_detections = []
-                for r in results:
-                    for box in r.boxes:
-                        cls = int(box.cls[0])
-                        frame_detections.append(self.class_names[cls])
-                all_detections.append(frame_detections)
-                time.sleep(interval)
-        detections = self.aggregate_detections(all_detections)
+        aggregator = SnapshotAggregator(max_frames=num_frames)
+        detections, _, _, _ = self.capture_snapshot(cap, aggregator, frame_spacing=interval)
         return detections
 
     def capture_a_frame(self, cap):
         ret, frame = cap.read()
         if ret:
-            results = self.model(frame)
-            frame_detections = []
-            for r in results:
-                for box in r.boxes:
-                    cls = int(box.cls[0])
-                    frame_detections.append(self.class_names[cls])
-            return frame_detections
+            return [detection.class_name for detection in self.detect(frame)]
         return []
 
     def parse_card(self, detected_card):
         value = detected_card[:-1]
         suit = detected_card[-1]
         try:
-            return Card(Value(value.upper()), Suit(suit))
+            return Card(Value(value.upper()), Suit(suit.lower()))
         except ValueError:
             return None
 
+    def cards_of_classes(self, class_indices):
+        """Cards of class indices, e.g. SnapshotAggregator.accepted_classes; classes of other cards are skipped."""
+        class_cards = self.class_cards
+        return [class_cards[index] for index in class_indices if class_cards[index] is not None]
+
     def parse_cards(self, detected_cards):
-        all_cards = [self.parse_card(card) for card in detected_cards]
+        # Class names of this model are looked up, others (e.g. from a label file) are parsed
+        cards_by_name = self._cards_by_name
+        all_cards = [cards_by_name[card] if card in cards_by_name else self.parse_card(card) for card in detected_cards]
         parsed_cards = [parsed_card for parsed_card in all_cards if parsed_card is not None]
         return parsed_cards
@@ -1,4 +1,32 @@
 MODEL_PATH = "../final_models/yolov8m_synthetic.pt"
+# 32 class model of the Belot deck (7 to A) trained with the "belot" preset of model_utils/train.py,
+# use it with MODEL_PATH = BELOT_MODEL_PATH and CLASS_NAMES = BELOT_CLASS_NAMES
+BELOT_MODEL_PATH = "../final_models/yolov8m_belot.pt"
+
+# Inference backend: "ultralytics" (torch, MODEL_PATH) or "onnx" (onnxruntime CPU, ONNX_MODEL_PATH)
+DETECTOR_BACKEND = "ultralytics"
+# Same exported model and label order as the iOS app
+ONNX_MODEL_PATH = "../../mobile_app/card_detector/assets/model.onnx"
+ONNX_LABELS_PATH = "../../mobile_app/card_detector/assets/model_labels.txt"
+# onnxruntime threads, 0 lets onnxruntime decide
+ONNX_INTRA_OP_THREADS = 0
+ONNX_INTER_OP_THREADS = 0
+
+# Snapshot capture: at most SNAPSHOT_FRAMES frames, read and detected SNAPSHOT_BATCH_SIZE at a time,
+# stopping early once every card reached SNAPSHOT_MIN_EVIDENCE summed confidence and the set is stable
+SNAPSHOT_FRAMES = 10
+SNAPSHOT_BATCH_SIZE = 2
+SNAPSHOT_MIN_EVIDENCE = 1.5
+SNAPSHOT_FRAME_SPACING = 0.05
+# Region-of-interest snapshots: (x1, y1, x2, y2) camera pixels to detect in, e.g. where the taken pile is placed;
+# empty = the whole frame. With SNAPSHOT_AUTO_ROI only what changed since the previous snapshot is detected.
+SNAPSHOT_ROIS = []
+SNAPSHOT_AUTO_ROI = False
+
+# Running games are journaled here, one snapshot + journal per table, and compacted every GAME_SNAPSHOT_EVERY records
+GAME_JOURNAL_DIR = "./game_journal"
+GAME_SNAPSHOT_EVERY = 64
+
 CLASS_NAMES = [
     "10c",
     "10d",
@@ -53,3 +81,39 @@ CLASS_NAMES = [
     "Qh",
     "Qs",
 ]
+
+# Class order of the Belot model, dataset_utils/mappings/belot_32.json
+BELOT_CLASS_NAMES = [
+    "10c",
+    "10d",
+    "10h",
+    "10s",
+    "7c",
+    "7d",
+    "7h",
+    "7s",
+    "8c",
+    "8d",
+    "8h",
+    "8s",
+    "9c",
+    "9d",
+    "9h",
+    "9s",
+    "Ac",
+    "Ad",
+    "Ah",
+    "As",
+    "Jc",
+    "Jd",
+    "Jh",
+    "Js",
+    "Kc",
+    "Kd",
+    "Kh",
+    "Ks",
+    "Qc",
+    "Qd",
+    "Qh",
+    "Qs",
+]
@@ -0,0 +1,9 @@
+from typing import NamedTuple, Optional, Tuple
+
+
+class Detection(NamedTuple):
+    class_index: int
+    class_name: str
+    confidence: float
+    box: Tuple[float, float, float, float]  # x1, y1, x2, y2 in frame pixels
+    track_id: Optional[int] = None  # set when the detection comes from utils.tracker
@@ -0,0 +1,90 @@
+"""
+Process-wide registry of loaded card detectors.
+
+Streamlit re-executes the whole script on every interaction, but imported modules stay in memory,
+so detectors kept here are loaded once per (model path, backend, class names, options) and shared by all sessions.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from utils.card_game_detector import CardGameDetector
+
+
+@dataclass
+class DetectorEntry:
+    detector: CardGameDetector
+    load_seconds: float
+    warmup_seconds: float
+
+
+_entries = {}
+_key_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _registry_key(model_path, backend, class_names, detector_options):
+    # Other labels or backend options (threads, imgsz) need their own detector
+    return (
+        os.path.abspath(model_path),
+        backend,
+        tuple(class_names) if class_names is not None else None,
+        tuple(sorted(detector_options.items())),
+    )
+
+
+def get_detector_entry(model_path, class_names, backend="ultralytics", warmup=True, **detector_options):
+    """Return the shared entry for the model, loading and warming it up on first use."""
+    key = _registry_key(model_path, backend, class_names, detector_options)
+    entry = _entries.get(key)
+    if entry is not None:
+        return entry
+
+    with _registry_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    # Only callers asking for the same model wait on each other; other models load in parallel.
+    with key_lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            return entry
+
+        start = time.perf_counter()
+        detector = CardGameDetector(model_path, class_names, backend=backend, **detector_options)
+        load_seconds = time.perf_counter() - start
+
+        warmup_seconds = 0.0
+        if warmup:
+            start = time.perf_counter()
+            detector.warmup()
+            warmup_seconds = time.perf_counter() - start
+
+        entry = DetectorEntry(detector, load_seconds, warmup_seconds)
+        _entries[key] = entry
+        return entry
+
+
+def get_detector(model_path, class_names, backend="ultralytics", warmup=True, **detector_options):
+    """Return the shared detector for the model, loading it on first use."""
+    return get_detector_entry(model_path, class_names, backend, warmup, **detector_options).detector
+
+
+def get_timings():
+    """Return load and warmup timings in seconds for every loaded detector."""
+    timings = {}
+    for (path, backend, _, options), entry in list(_entries.items()):
+        name = f"{path} [{backend}{''.join(f', {key}={value}' for key, value in options)}]"
+        if name in timings:
+            # Same model and options with other class names
+            name = f"{name} #{sum(1 for other in timings if other.startswith(name)) + 1}"
+        timings[name] = {"load_seconds": entry.load_seconds, "warmup_seconds": entry.warmup_seconds}
+    return timings
+
+
+def clear():
+    """Drop all loaded detectors, e.g. after replacing a model file on disk."""
+    with _registry_lock:
+        _entries.clear()
+        _key_locks.clear()
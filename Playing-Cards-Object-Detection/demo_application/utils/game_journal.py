@@ -0,0 +1,311 @@
+"""
+Durable storage for running games: an append-only journal per game plus periodic snapshots.
+
+Every scored round, revert, new game and game mode change is appended to the game's journal as a fixed-size
+20-byte record and fsynced before the call returns, so a scored round survives a crash of the server.
+Every snapshot_every records the live rounds are written to a snapshot and a new, empty journal generation
+is started. Recovery reads the snapshot and replays only the journal tail written after it.
+
+Files per game in the store directory:
+    <game_id>.snap       magic, journal generation, game mode, round count, one record per live round
+    <game_id>.<gen>.log  magic, records appended since the snapshot of that generation
+"""
+
+import os
+import re
+import struct
+import threading
+import zlib
+
+from utils.game_logic import GAME_MODES, MODE_INDEX, CardSet, Game
+
+JOURNAL_MAGIC = b"LBJ1"
+SNAPSHOT_MAGIC = b"LBS1"
+
+ROUND, REVERT, NEW_GAME, CHANGE_MODE = 1, 2, 3, 4
+
+# kind, game mode, taken card mask, team index, has taken last, bonuses, enemy bonuses
+_PAYLOAD = struct.Struct("<BBIB?ii")
+_CHECKSUM = struct.Struct("<I")
+RECORD_SIZE = _PAYLOAD.size + _CHECKSUM.size
+_SNAPSHOT_HEADER = struct.Struct("<4sIBI")
+
+_GAME_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def pack_record(kind, mode_index=0, taken_mask=0, team_index=0, has_taken_last=False, bonuses=0, enemy_bonuses=0):
+    payload = _PAYLOAD.pack(kind, mode_index, taken_mask, team_index, has_taken_last, bonuses, enemy_bonuses)
+    return payload + _CHECKSUM.pack(zlib.crc32(payload))
+
+
+def unpack_records(data):
+    """Decode consecutive records; stops at the first torn or corrupt one.
+
+    Returns the records and the number of bytes that were valid.
+    """
+    records = []
+    offset = 0
+    while offset + RECORD_SIZE <= len(data):
+        payload = data[offset : offset + _PAYLOAD.size]
+        (checksum,) = _CHECKSUM.unpack_from(data, offset + _PAYLOAD.size)
+        if zlib.crc32(payload) != checksum:
+            break
+        records.append(_PAYLOAD.unpack(payload))
+        offset += RECORD_SIZE
+    return records, offset
+
+
+def _fsync_directory(directory):
+    # Makes renames and newly created files durable; not supported on Windows
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class JournaledGame(Game):
+    """A Game whose state changes are journaled; behaves exactly like Game otherwise."""
+
+    def __init__(self, directory, game_id, snapshot_every=64, sync=True):
+        if not _GAME_ID_PATTERN.match(game_id):
+            raise ValueError(f"Invalid game id {game_id!r}, use letters, digits, '_' and '-'")
+        self.directory = directory
+        self.game_id = game_id
+        self.snapshot_every = snapshot_every
+        self.sync = sync
+        self._lock = threading.RLock()
+        self._journal_fd = None
+        self._generation = 0
+        self._records_since_snapshot = 0
+        # Packed records of the live rounds, pushed and popped together with the team hands
+        self._rounds = []
+        super().__init__()
+        self._recover()
+
+    # Paths and low-level file handling
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, f"{self.game_id}.snap")
+
+    def journal_path(self, generation):
+        return os.path.join(self.directory, f"{self.game_id}.{generation}.log")
+
+    def _open_journal(self, generation, valid_size=None):
+        path = self.journal_path(generation)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(fd).st_size
+        if size == 0:
+            os.write(fd, JOURNAL_MAGIC)
+            self._sync(fd)
+            _fsync_directory(self.directory)
+        elif valid_size is not None and size > valid_size:
+            # Drop a record torn by a crash mid-write, later appends must start on a record boundary
+            os.ftruncate(fd, valid_size)
+            self._sync(fd)
+        os.lseek(fd, 0, os.SEEK_END)
+        self._journal_fd = fd
+        self._generation = generation
+
+    def _sync(self, fd):
+        if self.sync:
+            os.fsync(fd)
+
+    def _append(self, record):
+        if self._journal_fd is None:
+            return
+        os.write(self._journal_fd, record)
+        self._sync(self._journal_fd)
+        self._records_since_snapshot += 1
+
+    def _maybe_compact(self):
+        # Called once the record is applied in memory, so the snapshot includes it
+        if self._journal_fd is not None and self._records_since_snapshot >= self.snapshot_every:
+            self.compact()
+
+    # Recovery
+
+    def _recover(self):
+        generation, records = 0, []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as file:
+                data = file.read()
+            magic, generation, mode_index, count = _SNAPSHOT_HEADER.unpack_from(data)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{self.snapshot_path} is not a game snapshot")
+            records, _ = unpack_records(data[_SNAPSHOT_HEADER.size :])
+            if len(records) != count:
+                raise ValueError(f"{self.snapshot_path} is truncated: {len(records)} of {count} rounds")
+            for record in records:
+                self._apply(record)
+            # Rounds replay in their own modes; the game continues in the mode active at the snapshot
+            Game.change_gamemode(self, GAME_MODES[mode_index])
+
+        journal_path = self.journal_path(generation)
+        tail, valid_size = [], None
+        if os.path.exists(journal_path):
+            with open(journal_path, "rb") as file:
+                data = file.read()
+            if data[: len(JOURNAL_MAGIC)] == JOURNAL_MAGIC:
+                tail, valid_bytes = unpack_records(data[len(JOURNAL_MAGIC) :])
+                valid_size = len(JOURNAL_MAGIC) + valid_bytes
+            else:
+                valid_size = 0
+        for record in tail:
+            self._apply(record)
+        self._records_since_snapshot = len(tail)
+        self._open_journal(generation, valid_size)
+
+    def _apply(self, record):
+        """Replay one record without journaling it again."""
+        kind, mode_index, taken_mask, team_index, has_taken_last, bonuses, enemy_bonuses = record
+        if kind == ROUND:
+            Game.change_gamemode(self, GAME_MODES[mode_index])
+            taken_cards = self.sort_cards(list(CardSet.from_mask(taken_mask)))
+            Game.add_current_round_points(self, taken_cards, team_index, has_taken_last, bonuses, enemy_bonuses)
+            self._rounds.append(pack_record(*record))
+        elif kind == REVERT:
+            self._revert()
+        elif kind == NEW_GAME:
+            Game.start_new_game(self)
+            self._rounds = []
+        elif kind == CHANGE_MODE:
+            Game.change_gamemode(self, GAME_MODES[mode_index])
+
+    def _revert(self):
+        if self.get_round() > 0:
+            Game.revert_last_round(self)
+            self._rounds.pop()
+
+    # Journaled Game API
+
+    def change_gamemode(self, game_mode):
+        with self._lock:
+            super().change_gamemode(game_mode)
+            self._append(pack_record(CHANGE_MODE, MODE_INDEX[game_mode]))
+            self._maybe_compact()
+
+    def add_current_round_points(
+        self,
+        taken_cards,
+        team_index=0,
+        has_taken_last=False,
+        bonuses_points=0,
+        enemy_bonuses_points=0,
+        other_cards=None,
+    ):
+        with self._lock:
+            # Checked before journaling, an invalid round must not be replayed on the next start.
+            # A valid other pile is the rest of the deck, so the taken mask alone replays the round.
+            self.validate_round(taken_cards, self.get_other_cards(taken_cards) if other_cards is None else other_cards)
+            record = pack_record(
+                ROUND,
+                MODE_INDEX[self.game_mode],
+                CardSet(taken_cards).mask,
+                team_index,
+                bool(has_taken_last),
+                int(bonuses_points),
+                int(enemy_bonuses_points),
+            )
+            # Durable before it becomes visible: a round shown as scored is never lost
+            self._append(record)
+            super().add_current_round_points(
+                taken_cards, team_index, has_taken_last, bonuses_points, enemy_bonuses_points, other_cards
+            )
+            self._rounds.append(record)
+            self._maybe_compact()
+
+    def revert_last_round(self):
+        with self._lock:
+            if self.get_round() <= 0:
+                return
+            self._append(pack_record(REVERT))
+            self._revert()
+            self._maybe_compact()
+
+    def start_new_game(self):
+        with self._lock:
+            self._append(pack_record(NEW_GAME))
+            super().start_new_game()
+            self._rounds = []
+            self._maybe_compact()
+
+    # Snapshots
+
+    def compact(self):
+        """Write the live rounds to a snapshot and start a new, empty journal generation."""
+        with self._lock:
+            generation = self._generation + 1
+            temporary_path = self.snapshot_path + ".tmp"
+            with open(temporary_path, "wb") as file:
+                header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, generation, MODE_INDEX[self.game_mode], len(self._rounds))
+                file.write(header)
+                file.write(b"".join(self._rounds))
+                file.flush()
+                self._sync(file.fileno())
+            # The snapshot switches recovery to the new generation atomically; a crash before this line
+            # recovers from the old snapshot and journal, which still hold every record.
+            os.replace(temporary_path, self.snapshot_path)
+            _fsync_directory(self.directory)
+
+            old_fd, old_generation = self._journal_fd, self._generation
+            self._open_journal(generation)
+            self._records_since_snapshot = 0
+            if old_fd is not None:
+                os.close(old_fd)
+                os.remove(self.journal_path(old_generation))
+
+    def close(self):
+        with self._lock:
+            if self._journal_fd is not None:
+                os.close(self._journal_fd)
+                self._journal_fd = None
+
+
+class GameStore:
+    """Journaled games of one directory, e.g. one per table, recovered lazily on first access."""
+
+    def __init__(self, directory, snapshot_every=64, sync=True):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.sync = sync
+        self._games = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def game_ids(self):
+        """Ids of all games stored in the directory."""
+        ids = set()
+        for name in os.listdir(self.directory):
+            if name.endswith(".snap") or name.endswith(".log"):
+                ids.add(name.split(".", 1)[0])
+        return sorted(ids)
+
+    def get(self, game_id):
+        with self._lock:
+            game = self._games.get(game_id)
+            if game is None:
+                game = JournaledGame(self.directory, game_id, self.snapshot_every, self.sync)
+                self._games[game_id] = game
+            return game
+
+    def close(self):
+        with self._lock:
+            for game in self._games.values():
+                game.close()
+            self._games = {}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_game_store(directory, **options):
+    """Process-wide store for the directory, shared by all Streamlit sessions like the detector registry."""
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = GameStore(key, **options)
+        return _stores[key]
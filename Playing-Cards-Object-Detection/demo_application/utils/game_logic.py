@@ -1,4 +1,7 @@
 from enum import Enum
+from typing import NamedTuple, Tuple
+
+import numpy as np
 
 
 class Suit(Enum):
@@ -72,24 +75,314 @@ class CardNonTrumpValue(Enum):
     ACE = 11
 
 
+SUITS = list(Suit)
+VALUES = list(Value)
+SUIT_ORDER = [Suit.SPADES, Suit.HEARTS, Suit.DIAMONDS, Suit.CLUBS]
+SUIT_SYMBOLS = {
+    Suit.SPADES: "♠️",
+    Suit.HEARTS: "♥️",
+    Suit.DIAMONDS: "♦️",
+    Suit.CLUBS: "♣️",
+}
+DECK_SIZE = len(SUITS) * len(VALUES)
+
+
+def card_id(value: Value, suit: Suit):
+    """Cards are numbered 0-31 as suit_index * 8 + value_index, in the order of the Suit and Value enums."""
+    return SUITS.index(suit) * len(VALUES) + VALUES.index(value)
+
+
 class Card:
+    __slots__ = ("id",)
+
     def __init__(self, value: Value, suit: Suit):
-        self.value = value
-        self.suit = suit
+        self.id = _CARD_IDS[value, suit]
+
+    @classmethod
+    def from_id(cls, card_id):
+        card = cls.__new__(cls)
+        card.id = card_id
+        return card
+
+    @property
+    def value(self):
+        return VALUES[self.id % len(VALUES)]
+
+    @property
+    def suit(self):
+        return SUITS[self.id // len(VALUES)]
 
     def __repr__(self):
-        return f"{self.value.value}{self._get_suit_symbol()}"
+        return _CARD_NAMES[self.id]
 
     def __str__(self):
-        return f"{self.value.value}{self._get_suit_symbol()}"
+        return _CARD_NAMES[self.id]
+
+    def __eq__(self, other):
+        return isinstance(other, Card) and self.id == other.id
+
+    def __hash__(self):
+        return self.id
 
     def _get_suit_symbol(self):
-        return {
-            Suit.SPADES: "♠️",
-            Suit.HEARTS: "♥️",
-            Suit.DIAMONDS: "♦️",
-            Suit.CLUBS: "♣️",
-        }[self.suit]
+        return SUIT_SYMBOLS[self.suit]
+
+
+_CARD_IDS = {(value, suit): card_id(value, suit) for suit in SUITS for value in VALUES}
+_CARD_NAMES = [f"{value.value}{SUIT_SYMBOLS[suit]}" for suit in SUITS for value in VALUES]
+
+
+def _build_mode_tables():
+    """Points and sort keys of every card id for every game mode, computed once at import time.
+
+    The sort key orders trumps first, then by SUIT_ORDER, then by trick order, i.e. what sort_cards produces.
+    """
+    points, sort_keys = {}, {}
+    for mode in GameMode:
+        mode_points, mode_keys = [], []
+        for suit in SUITS:
+            is_trump = mode == GameMode.ALL_TRUMPS or suit.value == mode.value
+            value_table = CardTrumpValue if is_trump else CardNonTrumpValue
+            order_table = CardTrumpOrder if is_trump else CardNonTrumpOrder
+            suit_group = 0 if suit.value == mode.value else 1
+            suit_rank = suit_group * len(SUITS) + SUIT_ORDER.index(suit)
+            for value in VALUES:
+                mode_points.append(value_table[value.name].value)
+                mode_keys.append(suit_rank * len(VALUES) + order_table[value.name].value)
+        points[mode] = tuple(mode_points)
+        sort_keys[mode] = tuple(mode_keys)
+    return points, sort_keys
+
+
+CARD_POINTS, CARD_SORT_KEYS = _build_mode_tables()
+# Trick order alone, 0 = strongest, like CardTrumpOrder / CardNonTrumpOrder
+CARD_ORDER = {mode: tuple(key % len(VALUES) for key in keys) for mode, keys in CARD_SORT_KEYS.items()}
+DECK_POINTS = {mode: sum(points) for mode, points in CARD_POINTS.items()}
+# Index in SUITS of the trump suit, None in all trumps and no trumps
+TRUMP_SUIT_INDEX = {
+    mode: next((index for index, suit in enumerate(SUITS) if suit.value == mode.value), None) for mode in GameMode
+}
+
+
+SUIT_MASK = (1 << len(VALUES)) - 1
+FULL_DECK_MASK = (1 << DECK_SIZE) - 1
+# Points of every 8-bit subset of one suit, per mode and suit: a card set costs four lookups
+SUIT_SUBSET_POINTS = {
+    mode: tuple(
+        tuple(
+            sum(points[suit_index * len(VALUES) + bit] for bit in range(len(VALUES)) if subset >> bit & 1)
+            for subset in range(SUIT_MASK + 1)
+        )
+        for suit_index in range(len(SUITS))
+    )
+    for mode, points in CARD_POINTS.items()
+}
+
+
+class CardSet:
+    """Set of cards as a 32-bit mask, bit i set for card id i."""
+
+    __slots__ = ("mask",)
+
+    def __init__(self, cards=()):
+        mask = 0
+        for card in cards:
+            mask |= 1 << (card if isinstance(card, int) else card.id)
+        self.mask = mask
+
+    @classmethod
+    def from_mask(cls, mask):
+        card_set = cls.__new__(cls)
+        card_set.mask = mask & FULL_DECK_MASK
+        return card_set
+
+    @classmethod
+    def full_deck(cls):
+        return cls.from_mask(FULL_DECK_MASK)
+
+    def __or__(self, other):
+        return CardSet.from_mask(self.mask | other.mask)
+
+    def __and__(self, other):
+        return CardSet.from_mask(self.mask & other.mask)
+
+    def __sub__(self, other):
+        return CardSet.from_mask(self.mask & ~other.mask)
+
+    def __invert__(self):
+        return CardSet.from_mask(~self.mask)
+
+    def __len__(self):
+        return bin(self.mask).count("1")
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __contains__(self, card):
+        return self.mask >> (card if isinstance(card, int) else card.id) & 1 == 1
+
+    def __iter__(self):
+        mask = self.mask
+        while mask:
+            low_bit = mask & -mask
+            yield Card.from_id(low_bit.bit_length() - 1)
+            mask ^= low_bit
+
+    def __eq__(self, other):
+        return isinstance(other, CardSet) and self.mask == other.mask
+
+    def __hash__(self):
+        return self.mask
+
+    def __repr__(self):
+        return f"CardSet({list(self)})"
+
+    def suit_mask(self, suit):
+        return self.mask >> (SUITS.index(suit) * len(VALUES)) & SUIT_MASK
+
+    def points(self, game_mode):
+        subset_points = SUIT_SUBSET_POINTS[game_mode]
+        mask = self.mask
+        return (
+            subset_points[0][mask & SUIT_MASK]
+            + subset_points[1][mask >> 8 & SUIT_MASK]
+            + subset_points[2][mask >> 16 & SUIT_MASK]
+            + subset_points[3][mask >> 24 & SUIT_MASK]
+        )
+
+
+def find_duplicates(cards):
+    """Cards that appear more than once, e.g. the same card detected twice."""
+    seen, duplicates = 0, 0
+    for card in cards:
+        bit = 1 << card.id
+        duplicates |= seen & bit
+        seen |= bit
+    return list(CardSet.from_mask(duplicates))
+
+
+# Declarations (bonuses), found from suit masks: bit i of a suit mask is VALUES[i], so runs of bits are sequences
+SEQUENCE_POINTS_BY_LENGTH = {3: 20, 4: 50, 5: 100}
+SEQUENCE_NAMES = {3: "tierce", 4: "quarte", 5: "quint"}
+CARRE_POINTS = {Value.JACK: 200, Value.NINE: 150, Value.ACE: 100, Value.TEN: 100, Value.KING: 100, Value.QUEEN: 100}
+BELOTE_POINTS = 20
+
+
+class Declaration(NamedTuple):
+    kind: str
+    points: int
+    cards: Tuple[Card, ...]
+
+
+def _sequences_of_mask(mask):
+    """(lowest bit, length) of the scoring sequences in one suit; runs over 5 cards split from the top,
+    so eight in a row are a quint and a tierce."""
+    sequences = []
+    bit = len(VALUES) - 1
+    while bit >= 0:
+        if not mask >> bit & 1:
+            bit -= 1
+            continue
+        top = bit
+        while bit >= 0 and mask >> bit & 1:
+            bit -= 1
+        length = top - bit
+        while length >= 3:
+            used = min(length, 5)
+            sequences.append((top - used + 1, used))
+            top -= used
+            length -= used
+    return tuple(sequences)
+
+
+SUIT_SEQUENCES = tuple(_sequences_of_mask(mask) for mask in range(SUIT_MASK + 1))
+SUIT_SEQUENCE_POINTS = tuple(
+    sum(SEQUENCE_POINTS_BY_LENGTH[length] for _, length in sequences) for sequences in SUIT_SEQUENCES
+)
+# Mask of values (bit per VALUES index) that can form a scoring carré, and the points of every subset of them
+_CARRE_VALUE_BITS = {VALUES.index(value): points for value, points in CARRE_POINTS.items()}
+CARRE_VALUE_MASK = sum(1 << bit for bit in _CARRE_VALUE_BITS)
+CARRE_SUBSET_POINTS = tuple(
+    sum(points for bit, points in _CARRE_VALUE_BITS.items() if subset >> bit & 1) for subset in range(SUIT_MASK + 1)
+)
+_BELOTE_MASK = 1 << VALUES.index(Value.KING) | 1 << VALUES.index(Value.QUEEN)
+
+
+def _submasks(mask):
+    submask = mask
+    while True:
+        yield submask
+        if submask == 0:
+            return
+        submask = (submask - 1) & mask
+
+
+def _belote_suits(game_mode):
+    if game_mode == GameMode.ALL_TRUMPS:
+        return range(len(SUITS))
+    if game_mode == GameMode.NO_TRUMPS:
+        return range(0)
+    return [SUITS.index(Suit(game_mode.value))]
+
+
+def _best_declarations(mask):
+    """Best carré choice for a card mask; a card counts in only one carré or sequence.
+
+    Returns (carré values mask, points of carrés + sequences).
+    """
+    suit_masks = [mask >> (suit_index * len(VALUES)) & SUIT_MASK for suit_index in range(len(SUITS))]
+    quads = suit_masks[0] & suit_masks[1] & suit_masks[2] & suit_masks[3] & CARRE_VALUE_MASK
+    best_carres, best_points = 0, -1
+    for carres in _submasks(quads):
+        sequences = sum(SUIT_SEQUENCE_POINTS[suit_mask & ~carres] for suit_mask in suit_masks)
+        points = CARRE_SUBSET_POINTS[carres] + sequences
+        if points > best_points:
+            best_carres, best_points = carres, points
+    return best_carres, best_points
+
+
+def declaration_points(cards, game_mode):
+    """Total points of the declarations in a hand: a few table lookups, cheap enough for every frame."""
+    if game_mode == GameMode.NO_TRUMPS:
+        return 0
+    mask = cards.mask if isinstance(cards, CardSet) else CardSet(cards).mask
+    points = _best_declarations(mask)[1]
+    for suit_index in _belote_suits(game_mode):
+        if mask >> (suit_index * len(VALUES)) & _BELOTE_MASK == _BELOTE_MASK:
+            points += BELOTE_POINTS
+    return points
+
+
+def find_declarations(cards, game_mode):
+    """Declarations in a hand (tierce/quarte/quint, carrés and belote), none in no trumps."""
+    if game_mode == GameMode.NO_TRUMPS:
+        return []
+    mask = cards.mask if isinstance(cards, CardSet) else CardSet(cards).mask
+    carres, _ = _best_declarations(mask)
+    declarations = []
+    for bit in range(len(VALUES) - 1, -1, -1):
+        if carres >> bit & 1:
+            carre_cards = tuple(Card.from_id(suit_index * len(VALUES) + bit) for suit_index in range(len(SUITS)))
+            declarations.append(Declaration("carre", _CARRE_VALUE_BITS[bit], carre_cards))
+    for suit_index in range(len(SUITS)):
+        suit_mask = mask >> (suit_index * len(VALUES)) & SUIT_MASK & ~carres
+        for low, length in SUIT_SEQUENCES[suit_mask]:
+            bits = range(low + length - 1, low - 1, -1)
+            sequence_cards = tuple(Card.from_id(suit_index * len(VALUES) + bit) for bit in bits)
+            declarations.append(Declaration(SEQUENCE_NAMES[length], SEQUENCE_POINTS_BY_LENGTH[length], sequence_cards))
+    for suit_index in _belote_suits(game_mode):
+        if mask >> (suit_index * len(VALUES)) & _BELOTE_MASK == _BELOTE_MASK:
+            belote_cards = (Card(Value.KING, SUITS[suit_index]), Card(Value.QUEEN, SUITS[suit_index]))
+            declarations.append(Declaration("belote", BELOTE_POINTS, belote_cards))
+    return declarations
+
+
+# Belot score is points / 10, rounded up from this last digit on; no trumps counts double
+ROUND_UP_DIGIT = {mode: 6 for mode in GameMode}
+ROUND_UP_DIGIT[GameMode.ALL_TRUMPS] = 4
+ROUND_UP_DIGIT[GameMode.NO_TRUMPS] = 5
+POINTS_MULTIPLIER = {mode: 1 for mode in GameMode}
+POINTS_MULTIPLIER[GameMode.NO_TRUMPS] = 2
 
 
 class EndHand:
@@ -104,26 +397,10 @@ class EndHand:
         self.belotscore = self.convert_points_to_belotscore() + bonuses_points
 
     def convert_points_to_belotscore(self):
-        total_points = self.points
-        if self.game_mode == GameMode.NO_TRUMPS:
-            total_points *= 2
-
-        last_digit = total_points % 10
+        total_points = self.points * POINTS_MULTIPLIER[self.game_mode]
         belotscore = total_points // 10
-
-        if self.game_mode == GameMode.ALL_TRUMPS:
-            print("All trumps")
-            if last_digit >= 4:
-                belotscore += 1
-        elif self.game_mode == GameMode.NO_TRUMPS:
-            print("No trumps")
-            if last_digit >= 5:
-                belotscore += 1
-        else:
-            print("Specific suit")
-            if last_digit >= 6:
-                belotscore += 1
-
+        if total_points % 10 >= ROUND_UP_DIGIT[self.game_mode]:
+            belotscore += 1
         return belotscore
 
 
@@ -159,14 +436,19 @@ class Game:
 
     def change_gamemode(self, game_mode):
         self.game_mode = game_mode
+        self._points = CARD_POINTS[game_mode]
+        self._order = CARD_ORDER[game_mode]
+        self._sort_keys = CARD_SORT_KEYS[game_mode]
         self.cards = self.sort_cards(self.cards)
 
     def generate_all_cards(self):
-        for suit in Suit:
-            for value in Value:
-                self.cards.append(Card(value, suit))
+        self.cards = [Card.from_id(card_id) for card_id in range(DECK_SIZE)]
 
     def get_card_gamevalue(self, card, trump_value_class=CardTrumpValue, non_trump_value_class=CardNonTrumpValue):
+        if trump_value_class is CardTrumpValue and non_trump_value_class is CardNonTrumpValue:
+            return self._points[card.id]
+        if trump_value_class is CardTrumpOrder and non_trump_value_class is CardNonTrumpOrder:
+            return self._order[card.id]
         if self.game_mode == GameMode.ALL_TRUMPS:
             return trump_value_class[card.value.name].value
         elif self.game_mode == GameMode.NO_TRUMPS:
@@ -177,51 +459,79 @@ class Game:
             return non_trump_value_class[card.value.name].value
 
     def sort_by_gamevalue(self, cards_to_sort):
-        cards_to_sort.sort(key=self.get_card_gamevalue, reverse=True)
+        points = self._points
+        cards_to_sort.sort(key=lambda card: points[card.id], reverse=True)
         return cards_to_sort
 
     def sort_by_ordervalue(self, cards_to_sort):
-        cards_to_sort.sort(key=lambda x: self.get_card_gamevalue(x, CardTrumpOrder, CardNonTrumpOrder))
+        order = self._order
+        cards_to_sort.sort(key=lambda card: order[card.id])
         return cards_to_sort
 
     def sort_by_suit(self, cards_to_sort):
-        suit_order = [Suit.SPADES, Suit.HEARTS, Suit.DIAMONDS, Suit.CLUBS]
-
-        def suit_sort_key(card):
-            if card.suit.value == self.game_mode.value:
-                return (0, suit_order.index(card.suit))
-            else:
-                return (1, suit_order.index(card.suit))
-
-        cards_to_sort.sort(key=suit_sort_key)
+        # Trump suit first, then SUIT_ORDER; the sort key holds the suit group above the trick order
+        sort_keys = self._sort_keys
+        cards_to_sort.sort(key=lambda card: sort_keys[card.id] // len(VALUES))
         return self.cards
 
     def sort_cards(self, cards_to_sort):
-        self.sort_by_ordervalue(cards_to_sort)
-        self.sort_by_suit(cards_to_sort)
-
+        sort_keys = self._sort_keys
+        cards_to_sort.sort(key=lambda card: sort_keys[card.id])
         return cards_to_sort
 
     def get_max_points(self):
-        return sum([self.get_card_gamevalue(card) for card in self.cards]) + self.last_take_points
+        return DECK_POINTS[self.game_mode] + self.last_take_points
 
     def get_points(self, taken_cards, has_taken_last=False):
-        return sum([self.get_card_gamevalue(card) for card in taken_cards]) + (
-            self.last_take_points if has_taken_last else 0
-        )
+        # A card counts once even if it was detected twice
+        card_set = taken_cards if isinstance(taken_cards, CardSet) else CardSet(taken_cards)
+        return card_set.points(self.game_mode) + (self.last_take_points if has_taken_last else 0)
+
+    def get_declarations(self, hand):
+        return find_declarations(hand, self.game_mode)
+
+    def get_declaration_points(self, hand):
+        return declaration_points(hand, self.game_mode)
 
     def get_other_cards(self, taken_cards):
-        return [card for card in self.cards if str(card) not in [str(taken_card) for taken_card in taken_cards]]
+        taken = CardSet(taken_cards)
+        return [card for card in self.cards if card not in taken]
+
+    def validate_round(self, taken_cards, other_cards):
+        """Raise ValueError unless both piles together are exactly the deck, without duplicates."""
+        problems = []
+        for name, cards in (("taken", taken_cards), ("other", other_cards)):
+            duplicates = find_duplicates(cards)
+            if duplicates:
+                problems.append(f"duplicate {name} cards: {duplicates}")
+        taken, other = CardSet(taken_cards), CardSet(other_cards)
+        if taken & other:
+            problems.append(f"cards in both piles: {list(taken & other)}")
+        missing = ~(taken | other)
+        if missing:
+            problems.append(f"missing cards: {list(missing)}")
+        if problems:
+            raise ValueError("Invalid round: " + "; ".join(problems))
 
     def add_current_round_points(
-        self, taken_cards, team_index=0, has_taken_last=False, bonuses_points=0, enemy_bonuses_points=0
+        self,
+        taken_cards,
+        team_index=0,
+        has_taken_last=False,
+        bonuses_points=0,
+        enemy_bonuses_points=0,
+        other_cards=None,
     ):
+        """Score a round from the taken cards and the other team's pile (the rest of the deck if not given)."""
+        # A card detected twice would otherwise be scored silently, nothing is recorded for an invalid round
+        enemy_cards = self.get_other_cards(taken_cards) if other_cards is None else other_cards
+        self.validate_round(taken_cards, enemy_cards)
+
         current_team_points = self.get_points(taken_cards, has_taken_last)
         current_team_hand = EndHand(taken_cards, current_team_points, self.game_mode, has_taken_last, bonuses_points)
         self.team_scores[team_index].update_round(current_team_hand)
 
         enemy_team_points = self.get_max_points() - current_team_points
-        enemy_cards = [card for card in self.cards if card not in taken_cards]
         enemy_team_hand = EndHand(
             enemy_cards, enemy_team_points, self.game_mode, not has_taken_last, enemy_bonuses_points
         )
@@ -248,3 +558,251 @@ class Game:
             team.hands.pop()
             team.belotscore_history.pop()
             team.total_belotscore = team.belotscore_history[-1] if team.belotscore_history else 0
+
+    def track_round(self, leader=0):
+        """Start tracking the cards of a round trick by trick in the current game mode."""
+        return PlayedCards(self.game_mode, leader)
+
+
+class PlayedCards:
+    """Cards played so far in a round, fed one card at a time as they appear on the table.
+
+    The played and remaining cards are 32-bit masks, so every event costs O(1). Players 0-3 play in order,
+    the winner of a trick leads the next one. Every card also tells what its player can't hold anymore:
+    - not following the led suit means a void in that suit,
+    - in a trump game, not trumping while the opponents win the trick means no trumps are left,
+    - playing under a trump (or under the best card of a led trump suit) that it had to beat means no
+      higher card of that suit is left.
+    """
+
+    def __init__(self, game_mode, leader=0):
+        self.game_mode = game_mode
+        self.leader = leader
+        self.played_mask = 0
+        # Cards each player can't hold anymore, as inferred from the trick rules
+        self.excluded_masks = [0, 0, 0, 0]
+        self.trick = []
+        self.tricks = []
+        self._order = CARD_ORDER[game_mode]
+        self._trump_suit = TRUMP_SUIT_INDEX[game_mode]
+        self._all_trumps = game_mode == GameMode.ALL_TRUMPS
+
+    @property
+    def played(self):
+        return CardSet.from_mask(self.played_mask)
+
+    @property
+    def remaining(self):
+        return CardSet.from_mask(FULL_DECK_MASK & ~self.played_mask)
+
+    @property
+    def visible(self):
+        """Cards that can be on the table now: the cards of the current trick and every card not played yet."""
+        trick_mask = sum(1 << card_id for card_id in self.trick)
+        return CardSet.from_mask(FULL_DECK_MASK & ~self.played_mask | trick_mask)
+
+    @property
+    def next_player(self):
+        return (self.leader + len(self.trick)) % 4
+
+    def possible_cards(self, player):
+        """Cards the player may still hold: not played yet and not excluded by the way they played."""
+        return CardSet.from_mask(FULL_DECK_MASK & ~self.played_mask & ~self.excluded_masks[player])
+
+    def voids(self, player):
+        """Suits the player has no cards of anymore."""
+        possible = self.possible_cards(player).mask
+        return [suit for i, suit in enumerate(SUITS) if not possible >> (i * len(VALUES)) & SUIT_MASK]
+
+    def _higher_cards(self, card_id):
+        # Cards of the same suit that beat card_id
+        suit = card_id // len(VALUES)
+        order = self._order
+        return sum(
+            1 << other
+            for other in range(suit * len(VALUES), (suit + 1) * len(VALUES))
+            if order[other] < order[card_id]
+        )
+
+    def _beats(self, card_id, winning_id):
+        if card_id // len(VALUES) == winning_id // len(VALUES):
+            return self._order[card_id] < self._order[winning_id]
+        return card_id // len(VALUES) == self._trump_suit
+
+    def play(self, card):
+        """Record the next card on the table; returns the winner of the trick once it is complete, else None.
+
+        Raises ValueError for a card that was already played, e.g. a misread label.
+        """
+        card_id = card if isinstance(card, int) else card.id
+        bit = 1 << card_id
+        if self.played_mask & bit:
+            raise ValueError(f"{Card.from_id(card_id)} was already played")
+
+        player = self.next_player
+        if self.trick:
+            self._exclude(player, card_id)
+        self.played_mask |= bit
+        self.trick.append(card_id)
+        if len(self.trick) < 4:
+            return None
+
+        winner = self.leader
+        winning_id = self.trick[0]
+        for offset, other in enumerate(self.trick[1:], 1):
+            if self._beats(other, winning_id):
+                winner, winning_id = (self.leader + offset) % 4, other
+        self.tricks.append((self.leader, self.trick))
+        self.trick = []
+        self.leader = winner
+        return winner
+
+    def play_trick(self, cards):
+        """Record a whole trick in playing order, starting with the leader; returns its winner."""
+        winner = None
+        for card in cards:
+            winner = self.play(card)
+        return winner
+
+    def _exclude(self, player, card_id):
+        led_suit = self.trick[0] // len(VALUES)
+        suit = card_id // len(VALUES)
+        winning_offset = 0
+        for offset in range(1, len(self.trick)):
+            if self._beats(self.trick[offset], self.trick[winning_offset]):
+                winning_offset = offset
+        winning_id = self.trick[winning_offset]
+        trump_winning = winning_id // len(VALUES) == self._trump_suit
+        excluded = 0
+
+        if suit != led_suit:
+            excluded |= SUIT_MASK << (led_suit * len(VALUES))
+            # The partner played two cards before; when they win the trick any card may be played
+            partner_winning = winning_offset == len(self.trick) - 2
+            if self._trump_suit is not None and not partner_winning and not self._beats(card_id, winning_id):
+                # Had to trump, or overtrump the opponents' trump
+                if trump_winning:
+                    excluded |= self._higher_cards(winning_id)
+                else:
+                    excluded |= SUIT_MASK << (self._trump_suit * len(VALUES))
+        elif (self._all_trumps or suit == self._trump_suit) and winning_id // len(VALUES) == suit:
+            if not self._beats(card_id, winning_id):
+                excluded |= self._higher_cards(winning_id)
+        self.excluded_masks[player] |= excluded
+
+
+# Batch scoring, e.g. to replay recorded games: rounds are given as arrays and scored with NumPy all at once.
+GAME_MODES = list(GameMode)
+MODE_INDEX = {mode: index for index, mode in enumerate(GAME_MODES)}
+_SUBSET_POINTS_TABLE = np.asarray([SUIT_SUBSET_POINTS[mode] for mode in GAME_MODES], dtype=np.int32)
+_DECK_POINTS_TABLE = np.asarray([DECK_POINTS[mode] for mode in GAME_MODES], dtype=np.int32)
+_ROUND_UP_TABLE = np.asarray([ROUND_UP_DIGIT[mode] for mode in GAME_MODES], dtype=np.int32)
+_MULTIPLIER_TABLE = np.asarray([POINTS_MULTIPLIER[mode] for mode in GAME_MODES], dtype=np.int32)
+
+
+def mode_indices(modes):
+    """GameMode values (or their indices in GAME_MODES) as an int array."""
+    if isinstance(modes, np.ndarray) and modes.dtype != object:
+        return modes.astype(np.intp, copy=False)
+    return np.fromiter((MODE_INDEX[mode] if isinstance(mode, GameMode) else mode for mode in modes), dtype=np.intp)
+
+
+def batch_points(modes, taken_masks):
+    """Points of the taken cards of every round, CardSet.points vectorized over rounds."""
+    modes = mode_indices(modes)
+    masks = np.asarray(taken_masks, dtype=np.int64)
+    points = np.zeros(masks.shape, dtype=np.int32)
+    for suit_index in range(len(SUITS)):
+        subsets = (masks >> (suit_index * len(VALUES))) & SUIT_MASK
+        points += _SUBSET_POINTS_TABLE[modes, suit_index, subsets]
+    return points
+
+
+def batch_belotscore(modes, points):
+    """EndHand.convert_points_to_belotscore for arrays of modes and points."""
+    modes = mode_indices(modes)
+    total_points = np.asarray(points, dtype=np.int32) * _MULTIPLIER_TABLE[modes]
+    return total_points // 10 + (total_points % 10 >= _ROUND_UP_TABLE[modes])
+
+
+def score_rounds(
+    modes, taken_masks, has_taken_last, team_index=0, bonuses_points=0, enemy_bonuses_points=0, last_take_points=10
+):
+    """Belot score of both teams for every round, like Game.add_current_round_points.
+
+    taken_masks are CardSet masks of the cards taken by the team at team_index (0 or 1, scalar or per round),
+    has_taken_last says whether that team took the last trick. Bonuses are per round or scalars.
+    Returns an (n_rounds, 2) array with the belot score of team 0 and team 1.
+    """
+    modes = mode_indices(modes)
+    has_taken_last = np.asarray(has_taken_last, dtype=bool)
+    points = batch_points(modes, taken_masks) + np.where(has_taken_last, last_take_points, 0)
+    enemy_points = _DECK_POINTS_TABLE[modes] + last_take_points - points
+
+    team_score = batch_belotscore(modes, points) + np.asarray(bonuses_points, dtype=np.int32)
+    enemy_score = batch_belotscore(modes, enemy_points) + np.asarray(enemy_bonuses_points, dtype=np.int32)
+
+    team_index = np.broadcast_to(np.asarray(team_index, dtype=bool), modes.shape)
+    scores = np.empty((len(modes), 2), dtype=np.int64)
+    scores[:, 0] = np.where(team_index, enemy_score, team_score)
+    scores[:, 1] = np.where(team_index, team_score, enemy_score)
+    return scores
+
+
+def belotscore_histories(round_scores, game_ids=None):
+    """Cumulative score histories like TeamScore.belotscore_history: (n_rounds + 1, 2), starting at 0.
+
+    With game_ids (one per round, rounds of a game contiguous) the totals restart at every new game and a
+    list of per-game histories is returned instead.
+    """
+    round_scores = np.asarray(round_scores)
+    if game_ids is None:
+        histories = np.zeros((len(round_scores) + 1, 2), dtype=np.int64)
+        np.cumsum(round_scores, axis=0, out=histories[1:])
+        return histories
+
+    game_ids = np.asarray(game_ids)
+    if len(game_ids) == 0:
+        return []
+    starts = np.flatnonzero(np.r_[True, game_ids[1:] != game_ids[:-1]])
+    totals = np.cumsum(round_scores, axis=0)
+    # Running total before each game's first round, subtracted from all rounds of that game
+    before = np.vstack([np.zeros((1, 2), dtype=totals.dtype), totals])[starts]
+    game_of_round = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(game_ids)]))
+    game_totals = totals - before[game_of_round]
+    zero = np.zeros((1, 2), dtype=totals.dtype)
+    return [np.vstack([zero, game]) for game in np.split(game_totals, starts[1:])]
+
+
+_SEQUENCE_POINTS_TABLE = np.asarray(SUIT_SEQUENCE_POINTS, dtype=np.int32)
+_CARRE_POINTS_TABLE = np.asarray(CARRE_SUBSET_POINTS, dtype=np.int32)
+# Carré choices worth trying: a dealt hand has 8 cards, so at most two carrés
+_CARRE_CHOICES = [
+    subset for subset in range(SUIT_MASK + 1) if subset & ~CARRE_VALUE_MASK == 0 and bin(subset).count("1") <= 2
+]
+
+
+def batch_declaration_points(modes, hand_masks):
+    """declaration_points for arrays of modes and 8-card hand masks, e.g. to check entered bonuses in replays.
+
+    Bonuses entered for a round above the declaration points of both hands together cannot be right.
+    """
+    modes = mode_indices(modes)
+    masks = np.asarray(hand_masks, dtype=np.int64)
+    suit_masks = [(masks >> (suit_index * len(VALUES))) & SUIT_MASK for suit_index in range(len(SUITS))]
+    quads = suit_masks[0] & suit_masks[1] & suit_masks[2] & suit_masks[3]
+
+    best = np.zeros(masks.shape, dtype=np.int32)
+    for carres in _CARRE_CHOICES:
+        sequences = sum(_SEQUENCE_POINTS_TABLE[suit_mask & ~carres] for suit_mask in suit_masks)
+        points = _CARRE_POINTS_TABLE[carres] + sequences
+        np.maximum(best, np.where(quads & carres == carres, points, 0), out=best)
+
+    for mode in GAME_MODES:
+        suits = _belote_suits(mode)
+        if not suits:
+            continue
+        belote = sum((suit_masks[suit_index] & _BELOTE_MASK) == _BELOTE_MASK for suit_index in suits)
+        best += np.where(modes == MODE_INDEX[mode], belote * BELOTE_POINTS, 0).astype(np.int32)
+    best[modes == MODE_INDEX[GameMode.NO_TRUMPS]] = 0
+    return best
@@ -0,0 +1,172 @@
+"""
+Inference backends used by CardGameDetector.
+
+Every backend takes a list of BGR frames and returns one list of Detection tuples per frame,
+with boxes in the pixel coordinates of the original frame.
+The heavy runtimes are imported lazily, so the ONNX backend works without torch installed.
+"""
+
+import cv2
+import numpy as np
+
+from utils.detection import Detection
+from utils.yolo_decode import decode_yolo
+
+LETTERBOX_FILL = 114  # Ultralytics default padding colour, matches OnnxCardDetector.swift
+
+
+def load_labels(labels_path):
+    """Read a label file with one class name per line, e.g. assets/model_labels.txt."""
+    with open(labels_path, "r", encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def letterbox_into(frame, out, canvas=None):
+    """Letterbox a BGR frame into out (3, S, S) as normalized RGB; return (scale, pad_x, pad_y)."""
+    imgsz = out.shape[-1]
+    if canvas is None:
+        canvas = np.empty((imgsz, imgsz, 3), dtype=np.uint8)
+    height, width = frame.shape[:2]
+    scale = min(imgsz / width, imgsz / height)
+    new_width, new_height = int(round(width * scale)), int(round(height * scale))
+    pad_x = int(round((imgsz - new_width) / 2 - 0.1))
+    pad_y = int(round((imgsz - new_height) / 2 - 0.1))
+
+    canvas[:] = LETTERBOX_FILL
+    canvas[pad_y : pad_y + new_height, pad_x : pad_x + new_width] = cv2.resize(
+        frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR
+    )
+    np.multiply(canvas[..., ::-1].transpose(2, 0, 1), np.float32(1 / 255), out=out)
+    return scale, pad_x, pad_y
+
+
+class UltralyticsBackend:
+    def __init__(self, model_path, class_names, imgsz=640):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path, verbose=False)
+        self.class_names = class_names if class_names is not None else list(self.model.names.values())
+        self.imgsz = imgsz
+
+    def _to_detections(self, result):
+        boxes = result.boxes
+        xyxy = boxes.xyxy.cpu().numpy()
+        confidences = boxes.conf.cpu().numpy()
+        class_indices = boxes.cls.cpu().numpy().astype(int)
+        return [
+            Detection(cls, self.class_names[cls], float(conf), tuple(float(v) for v in box))
+            for cls, conf, box in zip(class_indices, confidences, xyxy)
+        ]
+
+    def predict(self, frames, classes=None):
+        if classes is not None and len(classes) == 0:
+            return [[] for _ in frames]
+        # ultralytics filters classes after picking the best class of every box, so those boxes are dropped, not
+        # re-labeled with the best allowed class like decode_yolo does
+        results = self.model(list(frames), imgsz=self.imgsz, verbose=False, classes=classes)
+        return [self._to_detections(result) for result in results]
+
+
+class OnnxBackend:
+    """Runs the exported YOLOv8 ONNX model with onnxruntime on CPU, like the iOS app does."""
+
+    def __init__(
+        self,
+        model_path,
+        class_names,
+        imgsz=640,
+        intra_op_threads=0,
+        inter_op_threads=0,
+        conf_threshold=0.25,
+        iou_threshold=0.45,
+        max_detections=50,
+        agnostic_nms=True,
+    ):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # 0 lets onnxruntime pick the number of physical cores
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+
+        batch_dim, _, height_dim, _ = model_input.shape
+        # Exports are usually static (1, 3, 640, 640); dynamic dimensions come back as strings.
+        self.imgsz = height_dim if isinstance(height_dim, int) else imgsz
+        self.max_batch = batch_dim if isinstance(batch_dim, int) else None
+
+        if class_names is None:
+            # Without a label file, name the classes by index; the output has 4 box channels + one per class
+            num_channels = min(dim for dim in self.session.get_outputs()[0].shape[1:] if isinstance(dim, int))
+            class_names = [str(i) for i in range(num_channels - 4)]
+        self.class_names = class_names
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_detections = max_detections
+        self.agnostic_nms = agnostic_nms
+
+        # Reused across calls: the letterbox canvas and the float32 NCHW input tensor.
+        self._canvas = np.full((self.imgsz, self.imgsz, 3), LETTERBOX_FILL, dtype=np.uint8)
+        self._input = np.empty((self.max_batch or 1, 3, self.imgsz, self.imgsz), dtype=np.float32)
+
+    def _input_buffer(self, batch_size):
+        if self._input.shape[0] < batch_size:
+            self._input = np.empty((batch_size, 3, self.imgsz, self.imgsz), dtype=np.float32)
+        return self._input[:batch_size]
+
+    def _letterbox_into(self, frame, out):
+        return letterbox_into(frame, out, self._canvas)
+
+    def _decode(self, output, letterbox, frame_shape, classes=None):
+        boxes, confidences, class_indices = decode_yolo(
+            output,
+            num_classes=len(self.class_names),
+            conf_threshold=self.conf_threshold,
+            iou_threshold=self.iou_threshold,
+            max_detections=self.max_detections,
+            agnostic=self.agnostic_nms,
+            letterbox=letterbox,
+            image_shape=frame_shape,
+            classes=classes,
+        )
+        return [
+            Detection(int(cls), self.class_names[cls], float(conf), tuple(float(v) for v in box))
+            for cls, conf, box in zip(class_indices, confidences, boxes)
+        ]
+
+    def _run(self, frames, classes=None):
+        # A static batch dimension must be filled completely; unused slots are ignored by zip below.
+        inputs = self._input_buffer(self.max_batch or len(frames))
+        letterboxes = [self._letterbox_into(frame, inputs[i]) for i, frame in enumerate(frames)]
+        outputs = self.session.run([self.output_name], {self.input_name: inputs})[0]
+        return [
+            self._decode(output, letterbox, frame.shape, classes)
+            for output, letterbox, frame in zip(outputs, letterboxes, frames)
+        ]
+
+    def predict(self, frames, classes=None):
+        if self.max_batch is None:
+            return self._run(frames, classes)
+        detections = []
+        for start in range(0, len(frames), self.max_batch):
+            detections.extend(self._run(frames[start : start + self.max_batch], classes))
+        return detections
+
+
+BACKENDS = {
+    "ultralytics": UltralyticsBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def create_backend(backend, model_path, class_names, **options):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {tuple(BACKENDS)}")
+    return BACKENDS[backend](model_path, class_names, **options)
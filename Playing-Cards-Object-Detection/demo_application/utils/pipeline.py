@@ -0,0 +1,170 @@
+"""
+Threaded capture -> inference -> render pipeline for the live demo.
+
+The capture thread keeps only the newest frame, so frames never queue up and go stale,
+and the inference thread always works on the most recent one.
+Rendering happens on the caller's thread (OpenCV windows must be driven from the main thread)
+and always draws a frame together with the detections computed for that very frame.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+import cv2
+
+
+class LatestSlot:
+    """Single-item mailbox: put() overwrites, get() waits for an item newer than the last one seen."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self._sequence = 0
+        self._closed = False
+
+    def put(self, item):
+        with self._condition:
+            self._item = item
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def get(self, after=0, timeout=None):
+        """Return (sequence, item) for the first item newer than `after`, or (after, None) on timeout/close."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence > after or self._closed, timeout)
+            if self._sequence <= after:
+                return after, None
+            return self._sequence, self._item
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class RollingAverage:
+    def __init__(self, smoothing=0.9):
+        self.smoothing = smoothing
+        self.value = None
+
+    def add(self, sample):
+        self.value = sample if self.value is None else self.smoothing * self.value + (1 - self.smoothing) * sample
+        return self.value
+
+
+@dataclass
+class CapturedFrame:
+    image: object
+    captured_at: float
+    capture_ms: float
+
+
+@dataclass
+class InferenceResult:
+    frame: CapturedFrame
+    detections: list
+    inference_ms: float
+    finished_at: float = field(default_factory=time.perf_counter)
+
+
+class CaptureThread(threading.Thread):
+    def __init__(self, cap, frame_interval=0.0, max_failures=30):
+        super().__init__(daemon=True, name="capture")
+        self.cap = cap
+        # Only used for video files, so they play at their own frame rate instead of as fast as possible
+        self.frame_interval = frame_interval
+        self.max_failures = max_failures
+        self.frames = LatestSlot()
+        self.stopped = threading.Event()
+        self.error = None
+
+    def run(self):
+        failures = 0
+        next_frame_at = time.perf_counter()
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            success, image = self.cap.read()
+            if not success or image is None or getattr(image, "size", 0) == 0:
+                failures += 1
+                if failures >= self.max_failures:
+                    self.error = "Stopping after repeated frame capture failures."
+                    break
+                continue
+            failures = 0
+            now = time.perf_counter()
+            self.frames.put(CapturedFrame(image, now, (now - start) * 1000))
+
+            if self.frame_interval > 0:
+                next_frame_at += self.frame_interval
+                time.sleep(max(0.0, next_frame_at - time.perf_counter()))
+        self.stopped.set()
+        self.frames.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class InferenceThread(threading.Thread):
+    def __init__(self, frames, predict):
+        super().__init__(daemon=True, name="inference")
+        self.frames = frames
+        self.predict = predict
+        self.results = LatestSlot()
+        self.stopped = threading.Event()
+
+    def run(self):
+        seen = 0
+        while not self.stopped.is_set():
+            seen, frame = self.frames.get(after=seen, timeout=0.5)
+            if frame is None:
+                continue
+            start = time.perf_counter()
+            detections = self.predict(frame.image)
+            self.results.put(InferenceResult(frame, detections, (time.perf_counter() - start) * 1000))
+        self.results.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class PipelineStats:
+    """Per-stage latencies and end-to-end FPS for the on-screen HUD."""
+
+    def __init__(self):
+        self.capture_ms = RollingAverage()
+        self.inference_ms = RollingAverage()
+        self.render_ms = RollingAverage()
+        self.latency_ms = RollingAverage()
+        self.fps = RollingAverage()
+        self._last_displayed = None
+
+    def record(self, result, render_ms):
+        now = time.perf_counter()
+        self.capture_ms.add(result.frame.capture_ms)
+        self.inference_ms.add(result.inference_ms)
+        self.render_ms.add(render_ms)
+        self.latency_ms.add((now - result.frame.captured_at) * 1000)
+        if self._last_displayed is not None:
+            self.fps.add(1 / max(now - self._last_displayed, 1e-6))
+        self._last_displayed = now
+
+    def lines(self):
+        def fmt(average):
+            return "-" if average.value is None else f"{average.value:.1f}"
+
+        return [
+            f"FPS: {fmt(self.fps)}",
+            f"capture: {fmt(self.capture_ms)} ms",
+            f"inference: {fmt(self.inference_ms)} ms",
+            f"render: {fmt(self.render_ms)} ms",
+            f"end-to-end: {fmt(self.latency_ms)} ms",
+        ]
+
+
+def draw_hud(img, lines, origin=(10, 60), line_height=22):
+    x, y = origin
+    for i, line in enumerate(lines):
+        position = (x, y + i * line_height)
+        cv2.putText(img, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 3)
+        cv2.putText(img, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 1)
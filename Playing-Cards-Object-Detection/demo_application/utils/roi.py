@@ -0,0 +1,214 @@
+"""
+Region-of-interest inference: run the detector on crops of the frame instead of on the whole frame.
+
+Regions are given by the user (fixed table areas, e.g. where the taken pile is placed) or found by a motion mask
+that compares the frame with a reference frame. Every crop is letterboxed on its own, so a card in a 1080p/4K frame
+keeps its resolution instead of being downscaled together with the whole table, and all crops go through the model
+in one batch. Boxes are mapped back to full-frame coordinates.
+"""
+
+import cv2
+import numpy as np
+
+
+def parse_roi(value):
+    """Parse "x1,y1,x2,y2" in pixels into a tuple of ints."""
+    x1, y1, x2, y2 = (int(float(v)) for v in value.split(","))
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"Invalid region {value!r}, expected x1,y1,x2,y2 with x2 > x1 and y2 > y1")
+    return x1, y1, x2, y2
+
+
+def clip_roi(roi, frame_shape):
+    height, width = frame_shape[:2]
+    x1, y1, x2, y2 = roi
+    return max(0, x1), max(0, y1), min(width, x2), min(height, y2)
+
+
+def roi_area(roi):
+    x1, y1, x2, y2 = roi
+    return max(0, x2 - x1) * max(0, y2 - y1)
+
+
+def intersect(a, b):
+    return max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+
+
+def expand_roi(roi, margin, frame_shape, square=True):
+    """Grow a region by a margin relative to its size and clip it to the frame.
+
+    Square regions letterbox into the square model input without padding, so none of the input is wasted.
+    """
+    x1, y1, x2, y2 = roi
+    width, height = x2 - x1, y2 - y1
+    grow_x, grow_y = width * margin, height * margin
+    if square:
+        side = max(width + 2 * grow_x, height + 2 * grow_y)
+        grow_x, grow_y = (side - width) / 2, (side - height) / 2
+    expanded = (int(x1 - grow_x), int(y1 - grow_y), int(np.ceil(x2 + grow_x)), int(np.ceil(y2 + grow_y)))
+    return clip_roi(expanded, frame_shape)
+
+
+def merge_rois(rois):
+    """Merge overlapping regions until none overlap, so no card is detected twice."""
+    rois = list(rois)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rois)):
+            for j in range(i + 1, len(rois)):
+                if roi_area(intersect(rois[i], rois[j])) > 0:
+                    a, b = rois[i], rois.pop(j)
+                    rois[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    merged = True
+                    break
+            if merged:
+                break
+    return rois
+
+
+def motion_thumbnail(frame, width=320):
+    """Small blurred grayscale copy of a frame for the motion mask."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    height = max(1, round(gray.shape[0] * width / gray.shape[1]))
+    return cv2.GaussianBlur(cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA), (5, 5), 0)
+
+
+def changed_regions(reference, thumbnail, frame_shape, threshold=25, min_area=0.002, margin=0.15):
+    """Regions (full-frame pixels) where two motion thumbnails differ.
+
+    threshold is the per-pixel grayscale difference that counts as a change and min_area the smallest
+    changed area, as a fraction of the frame, that is not treated as noise.
+    """
+    mask = cv2.threshold(cv2.absdiff(reference, thumbnail), threshold, 255, cv2.THRESH_BINARY)[1]
+    mask = cv2.dilate(mask, None, iterations=2)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    scale = frame_shape[1] / thumbnail.shape[1]
+    min_pixels = min_area * thumbnail.shape[0] * thumbnail.shape[1]
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w * h < min_pixels:
+            continue
+        roi = (int(x * scale), int(y * scale), int((x + w) * scale), int((y + h) * scale))
+        regions.append(expand_roi(roi, margin, frame_shape))
+    return merge_rois(regions)
+
+
+def offset_detection(detection, roi):
+    x, y = roi[0], roi[1]
+    x1, y1, x2, y2 = detection.box
+    return detection._replace(box=(x1 + x, y1 + y, x2 + x, y2 + y))
+
+
+def outside_regions(detections, regions):
+    """The detections whose box does not touch any of the regions, e.g. cards that stayed where they were."""
+    return [
+        detection
+        for detection in detections
+        if not any(roi_area(intersect(tuple(int(v) for v in detection.box), region)) > 0 for region in regions)
+    ]
+
+
+def detect_in_rois(predict, frames, rois_per_frame):
+    """Detect in the regions of every frame with a single batched predict call.
+
+    predict takes a list of images and returns one detection list per image, like the inference backends.
+    Returns one list of full-frame detections per frame; frames without regions get no detections.
+    """
+    crops, owners = [], []
+    for index, (frame, rois) in enumerate(zip(frames, rois_per_frame)):
+        for roi in rois:
+            x1, y1, x2, y2 = clip_roi(roi, frame.shape)
+            if x2 > x1 and y2 > y1:
+                crops.append(frame[y1:y2, x1:x2])
+                owners.append((index, (x1, y1, x2, y2)))
+
+    detections = [[] for _ in frames]
+    if not crops:
+        return detections
+    for (index, roi), crop_detections in zip(owners, predict(crops)):
+        detections[index].extend(offset_detection(detection, roi) for detection in crop_detections)
+    return detections
+
+
+def motion_rois(reference, frame, rois=None, max_area=0.5, **motion_options):
+    """Regions to detect in after the scene changed from reference to frame.
+
+    Returns None when the whole frame (or all of the fixed rois) should be processed: without a reference or
+    when the change covers more than max_area of it, e.g. the camera moved. Fixed rois limit where changes count.
+    """
+    if reference is None:
+        return None
+    thumbnail = motion_thumbnail(frame)
+    if thumbnail.shape != reference.shape:
+        return None
+    regions = changed_regions(reference, thumbnail, frame.shape, **motion_options)
+    if rois:
+        clipped = (intersect(region, roi) for region in regions for roi in rois)
+        regions = [region for region in clipped if roi_area(region)]
+    limit = sum(roi_area(roi) for roi in rois) if rois else frame.shape[0] * frame.shape[1]
+    if sum(roi_area(region) for region in regions) > max_area * limit:
+        return None
+    return regions
+
+
+class RoiDetector:
+    """Detects cards in fixed regions and/or only where the table changed since the last detection.
+
+    With auto=True, detections outside the changed regions are kept from the previous frames
+    and only the changed regions are detected again.
+    """
+
+    def __init__(self, predict, rois=None, auto=False, max_area=0.5, **motion_options):
+        self.predict = predict
+        self.rois = list(rois or [])
+        self.auto = auto
+        self.max_area = max_area
+        self.motion_options = motion_options
+        self.last_regions = []
+        self._reference = None
+        self._detections = []
+        self.full_frames = 0
+        self.roi_frames = 0
+        self.skipped_frames = 0
+
+    def _full_rois(self, frame):
+        return self.rois or [(0, 0, frame.shape[1], frame.shape[0])]
+
+    def process(self, frame):
+        """Return the full-frame detections for the frame."""
+        if not self.auto:
+            self.last_regions = self._full_rois(frame)
+            self.roi_frames += 1
+            return detect_in_rois(self.predict, [frame], [self.last_regions])[0]
+
+        regions = motion_rois(self._reference, frame, self.rois, self.max_area, **self.motion_options)
+        if regions is not None and not regions:
+            # Nothing changed: keep the reference, so slow changes add up and get detected eventually
+            self.skipped_frames += 1
+            self.last_regions = []
+            return self._detections
+
+        if regions is None:
+            self.full_frames += 1
+            regions = self._full_rois(frame)
+            kept = []
+        else:
+            self.roi_frames += 1
+            kept = outside_regions(self._detections, regions)
+        self._detections = kept + detect_in_rois(self.predict, [frame], [regions])[0]
+        self._reference = motion_thumbnail(frame)
+        self.last_regions = regions
+        return self._detections
+
+    def reset(self):
+        self._reference = None
+        self._detections = []
+        self.last_regions = []
+
+
+def draw_rois(img, rois, color=(0, 200, 255)):
+    for x1, y1, x2, y2 in rois:
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 1)
@@ -0,0 +1,92 @@
+"""
+Incremental, confidence-weighted aggregation of snapshot detections.
+
+Frames are fed one at a time. Every card class collects the confidence it was detected with in each frame,
+and the snapshot can stop as soon as the set of accepted cards is stable instead of always reading 10 frames.
+Deck constraints resolve conflicts: a card exists only once, so a class counts at most once per frame,
+and one spot on the table holds one card, so overlapping boxes with different labels keep the most confident one.
+"""
+
+import numpy as np
+
+from utils.yolo_decode import pairwise_iou
+
+
+class SnapshotAggregator:
+    def __init__(self, min_evidence=1.5, reject_rate=0.3, min_frames=2, stable_frames=1, max_frames=10, overlap_iou=0.5):
+        # Summed confidence a card needs to be accepted, e.g. 1.5 = two frames at 0.75
+        self.min_evidence = min_evidence
+        # Unaccepted cards seen in more than this share of frames keep the snapshot going
+        self.reject_rate = reject_rate
+        self.min_frames = min_frames
+        # Consecutive frames that must leave the accepted set unchanged before stopping
+        self.stable_frames = stable_frames
+        self.max_frames = max_frames
+        self.overlap_iou = overlap_iou
+        self.evidence = {}
+        self.sightings = {}
+        # Class index of every class name seen, so accepted cards map straight to the model's classes
+        self.class_indices = {}
+        self.frames = 0
+        self._accepted = frozenset()
+        self._unchanged = 0
+
+    def _resolve_frame(self, detections):
+        """Apply the deck constraints to one frame; return {class_name: confidence}."""
+        if not detections:
+            return {}
+        detections = sorted(detections, key=lambda detection: detection.confidence, reverse=True)
+        boxes = np.asarray([detection.box for detection in detections], dtype=np.float32)
+        overlaps = pairwise_iou(boxes) > self.overlap_iou
+
+        frame = {}
+        kept = []
+        for i, detection in enumerate(detections):
+            # A weaker box on the same spot with another label is a misread of the kept card
+            if any(overlaps[i, k] and detections[k].class_name != detection.class_name for k in kept):
+                continue
+            kept.append(i)
+            frame.setdefault(detection.class_name, detection.confidence)
+            self.class_indices[detection.class_name] = detection.class_index
+        return frame
+
+    def add_frame(self, detections):
+        """Add one frame of detections; return True once the snapshot is stable or max_frames is reached."""
+        self.frames += 1
+        for class_name, confidence in self._resolve_frame(detections).items():
+            self.evidence[class_name] = self.evidence.get(class_name, 0.0) + confidence
+            self.sightings[class_name] = self.sightings.get(class_name, 0) + 1
+
+        accepted = frozenset(self.cards())
+        self._unchanged = self._unchanged + 1 if accepted == self._accepted else 0
+        self._accepted = accepted
+        return self.done
+
+    def cards(self):
+        return [class_name for class_name, evidence in self.evidence.items() if evidence >= self.min_evidence]
+
+    def accepted_classes(self):
+        """Class indices of the accepted cards."""
+        return [self.class_indices[class_name] for class_name in self.cards()]
+
+    @property
+    def undecided(self):
+        """Cards seen often enough that more frames could still accept them."""
+        return [
+            class_name
+            for class_name, sightings in self.sightings.items()
+            if self.evidence[class_name] < self.min_evidence and sightings / self.frames > self.reject_rate
+        ]
+
+    @property
+    def stable(self):
+        return (
+            self.frames >= self.min_frames
+            and bool(self._accepted)
+            and self._unchanged >= self.stable_frames
+            and not self.undecided
+        )
+
+    @property
+    def done(self):
+        return self.frames >= self.max_frames or self.stable
@@ -25,6 +25,7 @@ class Texts:
                 "team_a_last_10": "Team A won last 10?",
                 "update_scores": "Update Scores",
                 "scores_updated": "Scores updated successfully!",
+                "invalid_round": "The detected cards are not a valid round, please take the snapshot again.",
                 "revert_last_round": "Revert last round",
                 "start_new_game": "Start new game",
                 "new_game_started": "New game started successfully!",
@@ -52,6 +53,7 @@ class Texts:
                 "team_a_last_10": "Отбор А спечели последно 10?",
                 "update_scores": "Добавяне на резултата",
                 "scores_updated": "Резултатите са обновени успешно!",
+                "invalid_round": "Разпознатите карти не са валиден рунд, моля снимайте отново.",
                 "revert_last_round": "Отмени резултат",
                 "start_new_game": "Започване на нова игра",
                 "new_game_started": "Нова игра започната успешно!",
@@ -0,0 +1,193 @@
+"""
+Multi-object tracking of card detections across frames.
+
+CardTracker matches detections to tracks by IoU (falling back to centroid distance), keeps stable track ids,
+votes on each track's label weighted by confidence and smooths its confidence.
+DetectionScheduler runs the full detector only every k frames or when the scene changed noticeably,
+and propagates the tracks in between, which is enough for cards lying on a table.
+"""
+
+import itertools
+
+import cv2
+import numpy as np
+
+from utils.detection import Detection
+from utils.yolo_decode import iou_matrix
+
+
+class Track:
+    def __init__(self, track_id, detection, confidence_smoothing):
+        self.track_id = track_id
+        self.box = np.asarray(detection.box, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.confidence = detection.confidence
+        self.confidence_smoothing = confidence_smoothing
+        self.votes = {}
+        self.names = {}
+        self.hits = 0
+        self.misses = 0
+        self._vote(detection)
+
+    def _vote(self, detection):
+        self.votes[detection.class_index] = self.votes.get(detection.class_index, 0.0) + detection.confidence
+        self.names[detection.class_index] = detection.class_name
+        self.hits += 1
+
+    def update(self, detection, frames_elapsed):
+        box = np.asarray(detection.box, dtype=np.float32)
+        self.velocity = (box - self.box) / max(frames_elapsed, 1)
+        self.box = box
+        self.confidence = (
+            self.confidence_smoothing * self.confidence + (1 - self.confidence_smoothing) * detection.confidence
+        )
+        self.misses = 0
+        self._vote(detection)
+
+    def propagate(self, damping=0.5):
+        self.box = self.box + self.velocity
+        self.velocity *= damping
+
+    @property
+    def class_index(self):
+        return max(self.votes, key=self.votes.get)
+
+    def to_detection(self):
+        class_index = self.class_index
+        return Detection(
+            class_index, self.names[class_index], float(self.confidence), tuple(float(v) for v in self.box), self.track_id
+        )
+
+
+class CardTracker:
+    def __init__(
+        self,
+        iou_threshold=0.3,
+        centroid_threshold=0.5,
+        max_misses=3,
+        max_display_misses=1,
+        min_hits=1,
+        confidence_smoothing=0.6,
+    ):
+        self.iou_threshold = iou_threshold
+        # Fallback for fast moves: centroid distance relative to the track's box size
+        self.centroid_threshold = centroid_threshold
+        # Counted in detection passes: tracks survive max_misses passes without a match,
+        # and stay visible for max_display_misses of them so a single missed detection doesn't flicker.
+        self.max_misses = max_misses
+        self.max_display_misses = max_display_misses
+        self.min_hits = min_hits
+        self.confidence_smoothing = confidence_smoothing
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._frames_since_update = 0
+
+    def _match(self, detections):
+        """Greedy one-to-one matching, best IoU first; returns (pairs, unmatched detection indices)."""
+        if not self.tracks or not detections:
+            return [], list(range(len(detections)))
+
+        track_boxes = np.stack([track.box for track in self.tracks])
+        detection_boxes = np.asarray([detection.box for detection in detections], dtype=np.float32)
+        scores = iou_matrix(track_boxes, detection_boxes)
+
+        track_centers = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+        detection_centers = (detection_boxes[:, :2] + detection_boxes[:, 2:]) / 2
+        track_sizes = np.maximum(track_boxes[:, 2:] - track_boxes[:, :2], 1).max(axis=1)
+        distances = np.linalg.norm(track_centers[:, None] - detection_centers, axis=2) / track_sizes[:, None]
+        # Centroid matches rank below every IoU match
+        centroid_scores = np.where(distances < self.centroid_threshold, -distances, -np.inf)
+        scores = np.where(scores >= self.iou_threshold, scores, centroid_scores)
+
+        pairs = []
+        matched_tracks, matched_detections = set(), set()
+        for flat in np.argsort(-scores, axis=None):
+            t, d = np.unravel_index(flat, scores.shape)
+            if not np.isfinite(scores[t, d]):
+                break
+            if t in matched_tracks or d in matched_detections:
+                continue
+            pairs.append((t, d))
+            matched_tracks.add(t)
+            matched_detections.add(d)
+        unmatched = [d for d in range(len(detections)) if d not in matched_detections]
+        return pairs, unmatched
+
+    def update(self, detections):
+        """Feed a full detection pass and return the confirmed tracks as detections."""
+        frames_elapsed = self._frames_since_update + 1
+        self._frames_since_update = 0
+        pairs, unmatched = self._match(detections)
+        matched = set()
+        for t, d in pairs:
+            self.tracks[t].update(detections[d], frames_elapsed)
+            matched.add(t)
+        for t, track in enumerate(self.tracks):
+            if t not in matched:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        for d in unmatched:
+            self.tracks.append(Track(next(self._ids), detections[d], self.confidence_smoothing))
+        return self.current()
+
+    def propagate(self):
+        """Advance all tracks one frame without a detection pass."""
+        self._frames_since_update += 1
+        for track in self.tracks:
+            track.propagate()
+        return self.current()
+
+    def current(self):
+        return [
+            track.to_detection()
+            for track in self.tracks
+            if track.hits >= self.min_hits and track.misses <= self.max_display_misses
+        ]
+
+    def reset(self):
+        self.tracks = []
+        self._frames_since_update = 0
+
+
+def motion_score(previous, current):
+    """Mean absolute grayscale difference of two small frames, 0-255."""
+    return float(cv2.absdiff(previous, current).mean())
+
+
+class DetectionScheduler:
+    """Runs detection every detect_every frames or on scene changes, and tracks in between."""
+
+    def __init__(self, detect, tracker=None, detect_every=5, motion_threshold=6.0, motion_size=(64, 48)):
+        self.detect = detect
+        self.tracker = tracker or CardTracker()
+        self.detect_every = detect_every
+        self.motion_threshold = motion_threshold
+        self.motion_size = motion_size
+        self._reference = None
+        self._frames_since_detection = 0
+        self.detection_frames = 0
+        self.tracked_frames = 0
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.motion_size, interpolation=cv2.INTER_AREA)
+
+    def process(self, frame):
+        """Return the detections for the frame, running the detector only when needed."""
+        thumbnail = self._thumbnail(frame)
+        self._frames_since_detection += 1
+        due = self._reference is None or self._frames_since_detection >= self.detect_every
+        if not due and motion_score(self._reference, thumbnail) < self.motion_threshold:
+            self.tracked_frames += 1
+            return self.tracker.propagate()
+
+        # Compare later frames with the one the detector last saw, so slow drifts add up and trigger it too
+        self._reference = thumbnail
+        self._frames_since_detection = 0
+        self.detection_frames += 1
+        return self.tracker.update(self.detect(frame))
+
+    @property
+    def detection_ratio(self):
+        total = self.detection_frames + self.tracked_frames
+        return self.detection_frames / total if total else 0.0
@@ -0,0 +1,172 @@
+"""
+Vectorized NumPy decoding of raw YOLOv8 outputs.
+
+Mirrors decodeYolo in mobile_app/card_detector/ios/Runner/OnnxCardDetector.swift:
+the same accepted output layouts, probability handling, confidence filtering, box conversion and greedy NMS,
+so both decoders can be checked against the same golden outputs (see demo_application/decode_parity.py).
+"""
+
+import numpy as np
+
+EMPTY_BOXES = np.zeros((0, 4), dtype=np.float32)
+
+
+def _empty():
+    return EMPTY_BOXES, np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+
+
+def to_channel_major(output, num_classes=None):
+    """Return a (channels, predictions) view of the output and whether it carries an objectness channel.
+
+    Accepts (1, 4+nc, N), (1, 5+nc, N), (1, N, 4+nc), (1, N, 5+nc) and the same shapes without the batch axis.
+    Without num_classes the smaller axis is taken as the channel axis.
+    """
+    output = np.asarray(output, dtype=np.float32)
+    if output.ndim == 3:
+        output = output[0]
+    if output.ndim != 2:
+        raise ValueError(f"Unsupported YOLO output shape {output.shape}")
+
+    rows, cols = output.shape
+    if num_classes is None:
+        return (output if rows <= cols else output.T), False
+    if rows in (4 + num_classes, 5 + num_classes):
+        return output, rows == 5 + num_classes
+    if cols in (4 + num_classes, 5 + num_classes):
+        return output.T, cols == 5 + num_classes
+    raise ValueError(f"YOLO output shape {output.shape} does not match {num_classes} classes")
+
+
+def _probabilities(raw):
+    # Some exports output logits, YOLOv8 exports already output probabilities; don't sigmoid those again.
+    if raw.size == 0 or (raw.min() >= 0 and raw.max() <= 1):
+        return raw
+    return np.where((raw >= 0) & (raw <= 1), raw, 1 / (1 + np.exp(-raw)))
+
+
+# Above this many candidates the full IoU matrix gets too large and NMS compares one row at a time
+PAIRWISE_NMS_LIMIT = 1024
+
+
+def box_iou(box, boxes):
+    """IoU of one xyxy box against an (M, 4) array of xyxy boxes."""
+    inter_w = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    inter_h = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    inter = inter_w * inter_h
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-6)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """(M, K) IoU matrix between two arrays of xyxy boxes."""
+    inter_w = np.clip(
+        np.minimum(boxes_a[:, None, 2], boxes_b[:, 2]) - np.maximum(boxes_a[:, None, 0], boxes_b[:, 0]), 0, None
+    )
+    inter_h = np.clip(
+        np.minimum(boxes_a[:, None, 3], boxes_b[:, 3]) - np.maximum(boxes_a[:, None, 1], boxes_b[:, 1]), 0, None
+    )
+    inter = inter_w * inter_h
+    areas_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    areas_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return inter / np.maximum(areas_a[:, None] + areas_b - inter, 1e-6)
+
+
+def pairwise_iou(boxes):
+    """(M, M) IoU matrix of an (M, 4) array of xyxy boxes."""
+    return iou_matrix(boxes, boxes)
+
+
+def nms(boxes, scores, iou_threshold=0.45, max_detections=50, class_ids=None):
+    """Greedy NMS, returns the indices of kept boxes ordered by descending score.
+
+    With class_ids, boxes of different classes never suppress each other (per-class NMS),
+    otherwise it is class-agnostic like the iOS decoder.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if class_ids is not None:
+        # Shift every class into its own disjoint region so one pass handles all classes.
+        offset = boxes.max() - boxes.min() + 1
+        boxes = boxes + (class_ids * offset)[:, None].astype(boxes.dtype)
+
+    order = np.argsort(-scores, kind="stable")
+    boxes = boxes[order]
+    # Small candidate sets get one vectorized IoU matrix, so the greedy pass only reads precomputed rows.
+    overlaps = pairwise_iou(boxes) > iou_threshold if len(order) <= PAIRWISE_NMS_LIMIT else None
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        if len(keep) >= max_detections:
+            break
+        if overlaps is not None:
+            suppressed |= overlaps[i]
+        else:
+            suppressed[i + 1 :] |= box_iou(boxes[i], boxes[i + 1 :]) > iou_threshold
+    return order[keep]
+
+
+def unletterbox(boxes, scale, pad_x, pad_y, image_shape):
+    """Map xyxy boxes from letterboxed model space back to the original image and clip them to it."""
+    height, width = image_shape[:2]
+    boxes = (boxes - np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)) / scale
+    return boxes.clip(0, np.array([width, height, width, height], dtype=np.float32))
+
+
+def decode_yolo(
+    output,
+    num_classes=None,
+    conf_threshold=0.25,
+    iou_threshold=0.45,
+    max_detections=50,
+    agnostic=True,
+    letterbox=None,
+    image_shape=None,
+    classes=None,
+):
+    """Decode one raw YOLOv8 output into (boxes xyxy, scores, class_ids) after NMS.
+
+    letterbox is (scale, pad_x, pad_y) as produced during preprocessing; together with image_shape
+    the boxes are returned in original image pixels, otherwise in model input space.
+    classes limits the decoding to these class indices, e.g. the cards that can still appear; the other classes
+    neither produce boxes nor win the argmax of a box.
+    """
+    predictions, has_objectness = to_channel_major(output, num_classes)
+    class_probabilities = predictions[5:] if has_objectness else predictions[4:]
+    if classes is not None:
+        classes = np.asarray(classes, dtype=np.int64)
+        class_probabilities = class_probabilities[classes]
+    class_probabilities = _probabilities(class_probabilities)
+    if class_probabilities.shape[0] == 0:
+        return _empty()
+
+    best = class_probabilities.max(axis=0)
+    if has_objectness:
+        best = best * _probabilities(predictions[4])
+    candidates = np.flatnonzero((best >= conf_threshold) & (best > 0))
+    if candidates.size == 0:
+        return _empty()
+
+    xywh = predictions[:4, candidates].T
+    positive = (xywh[:, 2] > 0) & (xywh[:, 3] > 0)
+    candidates, xywh = candidates[positive], xywh[positive]
+    if candidates.size == 0:
+        return _empty()
+
+    class_ids = class_probabilities[:, candidates].argmax(axis=0)
+    if classes is not None:
+        class_ids = classes[class_ids]
+    scores = best[candidates]
+
+    boxes = np.empty((len(candidates), 4), dtype=np.float32)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = boxes[:, :2] + xywh[:, 2:]
+
+    keep = nms(boxes, scores, iou_threshold, max_detections, None if agnostic else class_ids)
+    boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+    if letterbox is not None and image_shape is not None:
+        boxes = unletterbox(boxes, *letterbox, image_shape)
+    return boxes, scores, class_ids
@@ -0,0 +1,227 @@
+"""
+Benchmarks detection speed over a matrix of models/backends, input sizes, batch sizes and thread counts.
+
+Frames come from a recorded video, an image folder or a single image and are decoded up front, so only inference
+(preprocessing, forward pass, decoding and NMS) is timed. Every configuration runs in a fresh process, which keeps
+peak RSS and thread settings of one run from leaking into the next. Results are written to JSON and can be compared
+against an earlier run, e.g. to check yolov8m_tuned against yolov8m_synthetic or a new export against the old one.
+
+The backend follows the model file: *.pt runs with ultralytics/torch, *.onnx with onnxruntime on CPU.
+
+    python model_utils/benchmark.py --source recording.mp4 \\
+        --models final_models/yolov8m_synthetic.pt final_models/yolov8m_synthetic.onnx \\
+        --imgsz 320 480 640 --batch 1 4 --threads 1 4
+    python model_utils/benchmark.py --source data/real_dataset/test/images --compare runs/benchmarks/old.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+project_root = Path(__file__).resolve().parents[1]
+# The inference backends live with the demo application
+sys.path.insert(0, str(project_root / "demo_application"))
+
+from utils.inference_backends import create_backend, load_labels  # noqa: E402
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+DEFAULT_OUTPUT_DIR = project_root / "runs" / "benchmarks"
+
+
+def _parse_source(value: str):
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return value
+
+
+def load_frames(source, max_frames):
+    """Decode up to max_frames BGR frames from a video file, camera index, image folder or single image."""
+    source = _parse_source(source)
+    if isinstance(source, str) and Path(source).is_dir():
+        paths = sorted(path for path in Path(source).iterdir() if path.suffix.lower() in IMAGE_EXTENSIONS)
+        frames = [cv2.imread(str(path)) for path in paths[:max_frames]]
+    elif isinstance(source, str) and Path(source).suffix.lower() in IMAGE_EXTENSIONS:
+        frames = [cv2.imread(source)]
+    else:
+        cap = cv2.VideoCapture(source)
+        frames = []
+        while len(frames) < max_frames:
+            success, frame = cap.read()
+            if not success:
+                break
+            frames.append(frame)
+        cap.release()
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        raise SystemExit(f"No frames could be read from {source!r}")
+    return frames
+
+
+def backend_for(model_path):
+    return "onnx" if Path(model_path).suffix.lower() == ".onnx" else "ultralytics"
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_configuration(config):
+    """Benchmark one configuration; runs inside a dedicated worker process."""
+    backend = backend_for(config["model"])
+    options = {"imgsz": config["imgsz"]}
+    if backend == "onnx":
+        options["intra_op_threads"] = config["threads"]
+    elif config["threads"] > 0:
+        import torch
+
+        torch.set_num_threads(config["threads"])
+
+    labels = load_labels(config["labels"]) if config["labels"] else None
+    start = time.perf_counter()
+    model = create_backend(backend, config["model"], labels, **options)
+    load_seconds = time.perf_counter() - start
+
+    result = {**config, "backend": backend, "load_seconds": load_seconds}
+    if model.imgsz != config["imgsz"]:
+        return {**result, "skipped": f"model has a static {model.imgsz}px input"}
+
+    frames = load_frames(config["source"], config["max_frames"])
+    batch_size = config["batch"]
+
+    def batch_at(i):
+        return [frames[(i * batch_size + j) % len(frames)] for j in range(batch_size)]
+
+    for i in range(config["warmup"]):
+        model.predict(batch_at(i))
+
+    latencies = []
+    detections = 0
+    total_start = time.perf_counter()
+    for i in range(config["iterations"]):
+        batch = batch_at(i)
+        start = time.perf_counter()
+        outputs = model.predict(batch)
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections += sum(len(frame_detections) for frame_detections in outputs)
+    total_seconds = time.perf_counter() - total_start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        **result,
+        "latency_ms": {"mean": float(np.mean(latencies)), "p50": p50, "p95": p95, "p99": p99},
+        "latency_per_frame_ms": float(p50 / batch_size),
+        "throughput_fps": config["iterations"] * batch_size / total_seconds,
+        "detections_per_frame": detections / (config["iterations"] * batch_size),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def configuration_key(result):
+    return (Path(result["model"]).name, result["imgsz"], result["batch"], result["threads"])
+
+
+def describe(result):
+    name, imgsz, batch, threads = configuration_key(result)
+    return f"{name:<32} {result['backend']:<11} imgsz={imgsz:<4} batch={batch:<3} threads={threads:<3}"
+
+
+def print_results(results, baseline=None):
+    baseline_by_key = {configuration_key(result): result for result in (baseline or []) if "latency_ms" in result}
+    for result in results:
+        if "skipped" in result:
+            print(f"{describe(result)} skipped: {result['skipped']}")
+            continue
+        latency = result["latency_ms"]
+        line = (
+            f"{describe(result)} p50 {latency['p50']:7.1f} ms  p95 {latency['p95']:7.1f} ms  "
+            f"p99 {latency['p99']:7.1f} ms  {result['throughput_fps']:6.1f} FPS  {result['peak_rss_mb']:6.0f} MB"
+        )
+        previous = baseline_by_key.get(configuration_key(result))
+        if previous is not None:
+            change = (latency["p50"] / previous["latency_ms"]["p50"] - 1) * 100
+            line += f"  p50 {change:+.1f}% vs baseline"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproducible inference benchmark across backends and settings.")
+    parser.add_argument("--source", required=True, help="Video file, camera index, image folder or image.")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=[str(project_root / "final_models" / "yolov8m_synthetic.pt")],
+        help="Model files; *.pt run with ultralytics/torch, *.onnx with onnxruntime.",
+    )
+    parser.add_argument("--labels", help="Label file for ONNX models (defaults to class indices).")
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[320, 480, 640])
+    parser.add_argument("--batch", type=int, nargs="+", default=[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="0 = runtime default.")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--max-frames", type=int, default=200, help="Frames decoded from the source.")
+    parser.add_argument("--output", help=f"Result JSON (default: {DEFAULT_OUTPUT_DIR}/<timestamp>.json).")
+    parser.add_argument("--compare", help="Earlier result JSON to compare p50 latencies against.")
+    args = parser.parse_args()
+
+    configurations = [
+        {
+            "model": str(Path(model).resolve()),
+            "imgsz": imgsz,
+            "batch": batch,
+            "threads": threads,
+            "source": args.source,
+            "labels": args.labels,
+            "warmup": args.warmup,
+            "iterations": args.iterations,
+            "max_frames": args.max_frames,
+        }
+        for model in args.models
+        for imgsz in args.imgsz
+        for batch in args.batch
+        for threads in args.threads
+    ]
+
+    results = []
+    # A fresh spawned process per configuration: clean peak RSS, thread pools and no cached graphs
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_configuration, configurations):
+            print_results([result])
+            results.append(result)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+        print("\nCompared with", args.compare)
+        print_results(results, baseline)
+
+    output = Path(args.output) if args.output else DEFAULT_OUTPUT_DIR / f"{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "source": args.source,
+        "results": results,
+    }
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2, default=float)
+    print(f"\nResults written to {output}")
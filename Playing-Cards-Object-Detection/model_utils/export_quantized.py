@@ -0,0 +1,290 @@
+"""
+Exports a trained model to ONNX and quantized variants and reports accuracy against CPU latency and size.
+
+Variants:
+- fp32: the plain ultralytics ONNX export, the reference for the others.
+- fp16: weights and activations in float16, inputs/outputs stay float32 (needs onnxconverter-common).
+- int8_dynamic: int8 weights, activations quantized at runtime; no calibration data needed.
+- int8_static: int8 weights and activations, calibrated on a seeded sample of the real training images
+  letterboxed exactly like at inference time. The Detect head stays in float by default, quantizing the
+  box regression costs most of the accuracy and little of the runtime.
+
+Every variant runs the val.py test split (mAP50, mAP50-95) and the benchmark.py latency measurement on CPU.
+The report (JSON + markdown) marks the variants within the mAP50-95 budget and names the fastest of them.
+Next to the variants, model_labels.txt lists the class names of the model for the onnx backend and the iOS app.
+
+    python model_utils/export_quantized.py --model final_models/yolov8m_tuned.pt --imgsz 640 --max-map-drop 0.01
+"""
+
+import argparse
+import json
+import multiprocessing
+import re
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from benchmark import IMAGE_EXTENSIONS, run_configuration
+
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root / "demo_application"))
+
+from utils.inference_backends import letterbox_into  # noqa: E402
+
+DATASET_NAME = 'real_dataset'
+VARIANTS = ["fp32", "fp16", "int8_dynamic", "int8_static"]
+DEFAULT_OUTPUT_DIR = project_root / "runs" / "quantized"
+
+
+def sample_images(image_dir, count, seed=0):
+    paths = sorted(path for path in Path(image_dir).iterdir() if path.suffix.lower() in IMAGE_EXTENSIONS)
+    if not paths:
+        raise SystemExit(f"No images found in {image_dir}")
+    rng = np.random.default_rng(seed)
+    return [paths[i] for i in sorted(rng.choice(len(paths), size=min(count, len(paths)), replace=False))]
+
+
+class LetterboxCalibrationReader:
+    """Feeds letterboxed calibration images to onnxruntime's static quantization one at a time."""
+
+    def __init__(self, image_paths, input_name, imgsz):
+        self.image_paths = list(image_paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._index = 0
+
+    def get_next(self):
+        while self._index < len(self.image_paths):
+            frame = cv2.imread(str(self.image_paths[self._index]))
+            self._index += 1
+            if frame is None:
+                continue
+            tensor = np.empty((1, 3, self.imgsz, self.imgsz), dtype=np.float32)
+            letterbox_into(frame, tensor[0])
+            return {self.input_name: tensor}
+        return None
+
+    def rewind(self):
+        self._index = 0
+
+
+def detect_head_nodes(model):
+    """Names of the nodes in the last /model.N/ block, the Detect layer of an ultralytics export."""
+    pattern = re.compile(r"^/model\.(\d+)/")
+    blocks = {node.name: int(match.group(1)) for node in model.graph.node if (match := pattern.match(node.name))}
+    if not blocks:
+        return []
+    head = max(blocks.values())
+    return [name for name, block in blocks.items() if block == head]
+
+
+def write_labels(names, labels_path):
+    """Label file in the class order of the model, upper case like assets/model_labels.txt of the iOS app."""
+    with open(labels_path, "w", encoding="utf-8") as file:
+        file.writelines(f"{names[index].upper()}\n" for index in sorted(names))
+
+
+def export_fp32(model_path, imgsz, output_dir):
+    if Path(model_path).suffix.lower() == ".onnx":
+        exported = model_path
+    else:
+        from ultralytics import YOLO
+
+        model = YOLO(model_path)
+        exported = model.export(format="onnx", imgsz=imgsz, simplify=True)
+        write_labels(model.names, output_dir / "model_labels.txt")
+    target = output_dir / "fp32.onnx"
+    shutil.copyfile(exported, target)
+    return target
+
+
+def export_fp16(fp32_path, output_path):
+    import onnx
+    from onnxconverter_common import float16
+
+    model = float16.convert_float_to_float16(onnx.load(str(fp32_path)), keep_io_types=True)
+    onnx.save(model, str(output_path))
+
+
+def export_int8_dynamic(fp32_path, output_path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(fp32_path), str(output_path), weight_type=QuantType.QUInt8)
+
+
+def export_int8_static(fp32_path, output_path, calibration_images, imgsz, quantize_head=False):
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    # Shape inference and graph folding first, as recommended for static quantization.
+    # The export has static shapes, so the symbolic pass (and its sympy dependency) isn't needed.
+    prepared_path = output_path.with_name("int8_static_prepared.onnx")
+    quant_pre_process(str(fp32_path), str(prepared_path), skip_symbolic_shape=True)
+    model = onnx.load(str(prepared_path))
+
+    reader = LetterboxCalibrationReader(calibration_images, model.graph.input[0].name, imgsz)
+    quantize_static(
+        str(prepared_path),
+        str(output_path),
+        reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=[] if quantize_head else detect_head_nodes(model),
+    )
+    prepared_path.unlink()
+
+
+def validate(model_path, data, imgsz):
+    """Run the val.py test split on an exported model; returns (mAP50, mAP50-95)."""
+    from ultralytics import YOLO
+
+    metrics = YOLO(str(model_path), task="detect").val(data=data, imgsz=imgsz, batch=1, device="cpu", plots=False)
+    return float(metrics.box.map50), float(metrics.box.map)
+
+
+def measure_latency(model_path, imgsz, args):
+    config = {
+        "model": str(model_path),
+        "imgsz": imgsz,
+        "batch": 1,
+        "threads": args.threads,
+        "source": args.latency_source,
+        "labels": None,
+        "warmup": args.warmup,
+        "iterations": args.iterations,
+        "max_frames": args.iterations,
+    }
+    # Same fresh-process measurement as benchmark.py, so the numbers are comparable with its runs
+    with multiprocessing.get_context("spawn").Pool(processes=1, maxtasksperchild=1) as pool:
+        return pool.apply(run_configuration, (config,))
+
+
+def summarize(rows, max_map_drop):
+    reference = next((row for row in rows if row["variant"] == "fp32" and row.get("map50_95") is not None), None)
+    for row in rows:
+        if reference is None or row.get("map50_95") is None:
+            row["within_budget"] = None
+            continue
+        row["map50_95_drop"] = reference["map50_95"] - row["map50_95"]
+        row["within_budget"] = row["map50_95_drop"] <= max_map_drop
+
+    candidates = [row for row in rows if row.get("within_budget") and row.get("latency_p50_ms") is not None]
+    return min(candidates, key=lambda row: row["latency_p50_ms"])["variant"] if candidates else None
+
+
+def markdown_report(rows, recommended, max_map_drop):
+    def fmt(value, pattern):
+        return "-" if value is None else pattern.format(value)
+
+    lines = [
+        f"Accuracy budget: mAP50-95 drop <= {max_map_drop:.3f} against fp32",
+        "",
+        "| Variant | Size (MB) | mAP50 | mAP50-95 | Drop | p50 (ms) | p95 (ms) | FPS | Within budget |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        budget = {True: "yes", False: "no", None: "-"}[row.get("within_budget")]
+        lines.append(
+            f"| {row['variant']} | {fmt(row.get('size_mb'), '{:.1f}')} | {fmt(row.get('map50'), '{:.3f}')} "
+            f"| {fmt(row.get('map50_95'), '{:.3f}')} | {fmt(row.get('map50_95_drop'), '{:+.3f}')} "
+            f"| {fmt(row.get('latency_p50_ms'), '{:.1f}')} | {fmt(row.get('latency_p95_ms'), '{:.1f}')} "
+            f"| {fmt(row.get('throughput_fps'), '{:.1f}')} | {budget} |"
+        )
+    lines += ["", f"Fastest within budget: {recommended or 'none'}"]
+    lines += [f"- {row['variant']} failed: {row['error']}" for row in rows if row.get("error")]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export FP16/INT8 ONNX variants and compare accuracy and latency.")
+    parser.add_argument("--model", default=str(project_root / "final_models" / "yolov8m_tuned.pt"))
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=VARIANTS)
+    parser.add_argument("--data", default=str(project_root / "data" / DATASET_NAME / "test.yaml"))
+    parser.add_argument(
+        "--calibration-images", default=str(project_root / "data" / DATASET_NAME / "train" / "images")
+    )
+    parser.add_argument("--calibration-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quantize-head", action="store_true", help="Also quantize the Detect head (int8_static).")
+    parser.add_argument(
+        "--latency-source",
+        default=str(project_root / "data" / DATASET_NAME / "test" / "images"),
+        help="Video, image folder or image used for the latency measurement.",
+    )
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads, 0 = default.")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--skip-validation", action="store_true", help="Only measure size and latency.")
+    parser.add_argument("--max-map-drop", type=float, default=0.01, help="Allowed mAP50-95 drop against fp32.")
+    parser.add_argument("--output-dir", help=f"Default: {DEFAULT_OUTPUT_DIR}/<model>_<imgsz>")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir or DEFAULT_OUTPUT_DIR / f"{Path(args.model).stem}_{args.imgsz}")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    fp32_path = export_fp32(args.model, args.imgsz, output_dir)
+    exporters = {
+        "fp16": lambda path: export_fp16(fp32_path, path),
+        "int8_dynamic": lambda path: export_int8_dynamic(fp32_path, path),
+        "int8_static": lambda path: export_int8_static(
+            fp32_path,
+            path,
+            sample_images(args.calibration_images, args.calibration_size, args.seed),
+            args.imgsz,
+            args.quantize_head,
+        ),
+    }
+
+    rows = []
+    for variant in ["fp32"] + [variant for variant in args.variants if variant != "fp32"]:
+        path = output_dir / f"{variant}.onnx"
+        row = {"variant": variant, "path": str(path)}
+        rows.append(row)
+        try:
+            if variant != "fp32":
+                print(f"Exporting {variant}...")
+                exporters[variant](path)
+            row["size_mb"] = path.stat().st_size / (1024 * 1024)
+            if not args.skip_validation:
+                row["map50"], row["map50_95"] = validate(path, args.data, args.imgsz)
+            latency = measure_latency(path, args.imgsz, args)
+            row["latency_p50_ms"] = float(latency["latency_ms"]["p50"])
+            row["latency_p95_ms"] = float(latency["latency_ms"]["p95"])
+            row["throughput_fps"] = latency["throughput_fps"]
+            row["peak_rss_mb"] = latency["peak_rss_mb"]
+        except Exception as e:
+            # One failing variant (e.g. a missing converter) shouldn't discard the others
+            row["error"] = f"{type(e).__name__}: {e}"
+            print(f"{variant} failed: {row['error']}")
+
+    recommended = summarize(rows, args.max_map_drop)
+    report = markdown_report(rows, recommended, args.max_map_drop)
+    print()
+    print(report)
+
+    with open(output_dir / "report.md", "w") as file:
+        file.write(f"# Quantization report for {Path(args.model).name} at {args.imgsz}px\n\n{report}\n")
+    with open(output_dir / "report.json", "w") as file:
+        json.dump(
+            {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "model": args.model,
+                "imgsz": args.imgsz,
+                "data": args.data,
+                "max_map_drop": args.max_map_drop,
+                "recommended": recommended,
+                "variants": rows,
+            },
+            file,
+            indent=2,
+        )
+    print(f"\nReport written to {output_dir}")
@@ -1,8 +1,23 @@
 """
 Performs training with the specified pretrained model and dataset yaml configuration file.
+
+With PRESET = 'belot', BASE_MODEL is fine-tuned into a 32 class model of the Belot deck (7 to A). Relabel the
+dataset first with dataset_utils/transform_labels_in_dateset.py --mapping mappings/belot_32.json; the class names of
+the yaml configuration are taken from the same mapping file.
+
+With PACKED_DATASET_DIR set, the dataset is read from the shards of dataset_utils/pack_dataset.py (a few large
+sequential reads instead of thousands of small files on network storage) and unpacked to a fresh directory under
+LOCAL_DATASET_ROOT on a local disk before training.
 """
+import json
+import os
+import sys
+
 from ultralytics import YOLO
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dataset_utils'))
+
+from pack_dataset import materialize_packed_dataset  # noqa: E402
 
 DATASET_NAME = 'real_dataset'
 BASE_MODEL = 'yolov8m_synthetic.pt'
@@ -12,8 +27,52 @@ DATASET_CONFIGURATION_PATH = f'./data/{DATASET_NAME}/data.yaml'
 PRETRAINED_MODEL_PATH = f'../final_models/{BASE_MODEL}'
 SAVE_DIR = f'../runs'
 
+# NOTE: Set to e.g. f'./data/packed/{DATASET_NAME}' to train from packed shards
+PACKED_DATASET_DIR = None
+# Every packed dataset is unpacked into its own, freshly emptied directory below this one
+LOCAL_DATASET_ROOT = '/tmp/luckboxer_unpacked'
+WORKERS = 1
+
+# NOTE: Set to 'belot' to train the Belot deck model
+PRESET = None
+MAPPINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dataset_utils', 'mappings')
+PRESETS = {
+    'belot': {'mapping': os.path.join(MAPPINGS_DIR, 'belot_32.json'), 'name': 'yolov8m_belot'},
+}
+
+
+def preset_configuration(configuration_path, mapping_path, preset):
+    """Copy of the yaml configuration with the class names of the mapping file; returns its path."""
+    import yaml
+
+    with open(configuration_path, 'r') as file:
+        config = yaml.safe_load(file)
+    with open(mapping_path, 'r') as file:
+        class_names = json.load(file)['new_class_names']
+    config.update(names=class_names, nc=len(class_names))
+    # Next to the original, so the relative train/val paths still resolve
+    preset_path = os.path.join(os.path.dirname(configuration_path), f'data_{preset}.yaml')
+    with open(preset_path, 'w') as file:
+        yaml.safe_dump(config, file)
+    return preset_path
+
+
 if __name__ == "__main__":
     model = YOLO(PRETRAINED_MODEL_PATH)
 
-    model.train(data=DATASET_CONFIGURATION_PATH, imgsz=640,
-                epochs=10, workers=1, save_dir=SAVE_DIR)
+    data = DATASET_CONFIGURATION_PATH
+    workers = WORKERS
+    if PACKED_DATASET_DIR:
+        data = materialize_packed_dataset(PACKED_DATASET_DIR, LOCAL_DATASET_ROOT)
+        # Local files no longer wait on the network, so more loader workers pay off
+        workers = max(WORKERS, min(8, os.cpu_count() or 1))
+
+    options = {}
+    if PRESET:
+        preset = PRESETS[PRESET]
+        data = preset_configuration(data, preset['mapping'], PRESET)
+        # The detection head is rebuilt for the new number of classes, the backbone keeps the pretrained weights
+        options['name'] = preset['name']
+
+    model.train(data=data, imgsz=640,
+                epochs=10, workers=workers, save_dir=SAVE_DIR, **options)
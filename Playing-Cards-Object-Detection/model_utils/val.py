@@ -4,13 +4,30 @@ Executes the latest running model on the test set.
 The test set must be defined in the yaml configuration file as a 'val' set.
 Make sure the path to the model includes the 'train' directory and not 'train2', 3, etc.
 Changed it if needed.
+
+With PACKED_DATASET_DIR set, the test split is unpacked from the shards of dataset_utils/pack_dataset.py like in
+train.py, and a yaml configuration naming it as the 'val' set is written for it.
 """
+import os
+import sys
 
 from ultralytics import YOLO
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dataset_utils'))
+
+from pack_dataset import materialize_packed_dataset  # noqa: E402
+
 DATASET_NAME = 'real_dataset'
 
+# NOTE: Set to e.g. f'./data/packed/{DATASET_NAME}' to evaluate on packed shards
+PACKED_DATASET_DIR = None
+LOCAL_DATASET_ROOT = '/tmp/luckboxer_unpacked'
+
 if __name__ == "__main__":
     model = YOLO('../runs/detect/train/weights/best.pt')
 
-    metrics = model.val(data=f'./data/{DATASET_NAME}/test.yaml')
+    data = f'./data/{DATASET_NAME}/test.yaml'
+    if PACKED_DATASET_DIR:
+        data = materialize_packed_dataset(PACKED_DATASET_DIR, LOCAL_DATASET_ROOT, splits=['test'], val_split='test')
+
+    metrics = model.val(data=data)